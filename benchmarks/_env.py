@@ -0,0 +1,23 @@
+"""Shared setup for the benchmarks and the tests.
+
+Puts the repository on `sys.path`, so that the benchmark scripts can import
+    `petal`. Importing `petal` loads config.yml from the working directory;
+    Where there is none, such as in a fresh checkout, this moves to a scratch
+    directory holding a copy of the example config instead.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+if not os.path.exists("config.yml"):
+    scratch = tempfile.mkdtemp(prefix="petal-")
+    shutil.copy(
+        os.path.join(ROOT, "_exampleconfig.yml"), os.path.join(scratch, "config.yml")
+    )
+    os.chdir(scratch)
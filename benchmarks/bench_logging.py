@@ -0,0 +1,74 @@
+"""Per-call cost of Peacock logging, before and after the queued backend.
+
+The old Peacock formatted, folded and printed every message with a flush, on
+    the calling thread. The queued Peacock only checks the level and puts a
+    record on a queue; a background thread does the rest. Output goes to
+    /dev/null here, so that the terminal does not dominate either figure.
+
+Run:
+    python benchmarks/bench_logging.py [calls]
+"""
+
+import os
+import sys
+from datetime import datetime as dt
+from time import perf_counter
+
+import _env  # noqa: F401
+from colorama import Fore
+
+from petal import grasslands
+
+
+class OldPeacock(object):
+    """The synchronous `Peacock.f` of the baseline."""
+
+    def timestamp(self):
+        return "[{}]".format(str(dt.utcnow())[:-7])
+
+    def f(self, func="basic", message=""):
+        print(
+            Fore.MAGENTA
+            + "[FUNC/{}] ".format(func.upper())
+            + self.timestamp()
+            + " "
+            + message.encode("ascii", "ignore").decode("ascii")
+            + Fore.RESET,
+            flush=True,
+        )
+
+
+def measure(log, calls: int) -> float:
+    start = perf_counter()
+    for i in range(calls):
+        log.f("Bench", f"Message number {i} from a busy handler")
+    return perf_counter() - start
+
+
+def main(calls: int = 50_000):
+    real = sys.stdout
+    with open(os.devnull, "w") as null:
+        sys.stdout = null
+        try:
+            old = measure(OldPeacock(), calls)
+
+            grasslands.plumage.level = grasslands.INFO
+            new = measure(grasslands.Peacock(), calls)
+            start = perf_counter()
+            grasslands.plumage.close()
+            drain = perf_counter() - start
+
+            grasslands.plumage.level = grasslands.WARN
+            dropped = measure(grasslands.Peacock(), calls)
+        finally:
+            sys.stdout = real
+
+    print(f"{calls:,} calls of Peacock.f")
+    print(f"  before, synchronous:    {old / calls * 1e6:7.2f} us per call")
+    print(f"  after, queued:          {new / calls * 1e6:7.2f} us per call")
+    print(f"  after, below the level: {dropped / calls * 1e6:7.2f} us per call")
+    print(f"  background drain after the last call: {drain * 1e3:.1f} ms")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:2]))
@@ -0,0 +1,107 @@
+"""Per-invocation cost of parsing Command Options, before and after OptionSchema.
+
+The old `parse_from_hinting` called `get_type_hints` on the Command Method,
+    rebuilt the Getopt specification from it, and converted every value with
+    `check_types`, on every invocation. The new one looks up an OptionSchema
+    compiled when the Command was indexed. Both run Getopt over the same lines.
+    `check_types` prints boolean flags, so output goes to /dev/null here.
+
+Run:
+    python benchmarks/bench_options.py [calls]
+"""
+
+import getopt
+import os
+import sys
+from time import perf_counter
+from typing import get_type_hints, Optional
+
+import _env  # noqa: F401
+
+from petal.etc import check_types, OptionSchema
+from petal.types import Args, Src
+
+
+async def cmd_example(
+    args: Args,
+    src: Src,
+    _reason: str = None,
+    _duration: Optional[int] = None,
+    _ratio: float = 1.0,
+    _silent: bool = False,
+    _d: int = 0,
+    _v: bool = False,
+    **_,
+):
+    pass
+
+
+LINES = [
+    ["123456789012345678"],
+    ["123456789012345678", "--reason", "spam", "--duration", "7"],
+    ["-v", "-d", "3", "--silent", "--ratio", "0.5", "someone", "else"],
+]
+
+
+def old_parse(cline, func):
+    """The Option handling of the old `parse_from_hinting`."""
+    hints = get_type_hints(func)
+    shorts = ""
+    longs = []
+    for opt_name, opt_type in hints.items():
+        if not opt_name.startswith("_"):
+            continue
+        opt_name = opt_name[1:].replace("_", "-")
+        if len(opt_name) == 1:
+            if opt_type != bool:
+                opt_name += ":"
+            shorts += opt_name
+        else:
+            if opt_type != bool:
+                opt_name += "="
+            longs.append(opt_name)
+
+    o, a = getopt.getopt(cline, shorts, longs)
+    return a, check_types({k: v for k, v in o}, hints)
+
+
+def new_parse(cline, schema):
+    """The Option handling of `parse_from_hinting` with a compiled schema."""
+    o, a = getopt.getopt(cline, schema.shorts, schema.longs)
+    return a, schema.convert(o)
+
+
+def measure(func, target, calls: int) -> float:
+    start = perf_counter()
+    for i in range(calls):
+        func(LINES[i % len(LINES)], target)
+    return perf_counter() - start
+
+
+def main(calls: int = 30_000):
+    schema = OptionSchema(cmd_example)
+
+    real = sys.stdout
+    with open(os.devnull, "w") as null:
+        sys.stdout = null
+        try:
+            for line in LINES:
+                assert old_parse(line, cmd_example) == new_parse(line, schema), line
+            old = measure(old_parse, cmd_example, calls)
+            new = measure(new_parse, schema, calls)
+        finally:
+            sys.stdout = real
+
+    start = perf_counter()
+    for _ in range(1_000):
+        OptionSchema(cmd_example)
+    compiled = (perf_counter() - start) / 1_000
+
+    print(f"{calls:,} invocations of a Command with six Options")
+    print(f"  before, hints every call: {old / calls * 1e6:7.2f} us per call")
+    print(f"  after, compiled schema:   {new / calls * 1e6:7.2f} us per call")
+    print(f"  compiling the schema once: {compiled * 1e6:.2f} us")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:2]))
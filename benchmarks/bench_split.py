@@ -0,0 +1,76 @@
+"""Throughput of `etc.split`, before and after the regex tokenizer.
+
+The old `split` ran two `shlex.shlex` scanners over every line, reading one
+    character at a time. The new one reads runs of characters with regular
+    expressions. Both are timed over the same mix of short commands and long
+    lines with quotes and comments.
+
+Run:
+    python benchmarks/bench_split.py [passes]
+"""
+
+import shlex
+import sys
+from time import perf_counter
+
+import _env  # noqa: F401
+
+from petal.etc import split
+
+
+def old_split(line):
+    """The `split()` of before, built on `shlex.shlex`."""
+    tokens = shlex.shlex(line, posix=False)
+    tokens.quotes += "`"
+    tokens.whitespace_split = True
+    tokens.whitespace += ","
+    tokens.commenters = ";"
+
+    original = shlex.shlex(line, posix=False)
+    original.quotes += "`"
+    original.whitespace_split = True
+    original.whitespace = ""
+    original.commenters = ";"
+
+    return list(tokens), original.read_token()
+
+
+LINES = [
+    "help",
+    "ping",
+    "help -s commands; @person, this is where to see the list",
+    "ban 123456789012345678 --reason 'spamming links in #general' -d 7",
+    "event --title \"Movie night\" --when `2026-10-18 20:00` --channel general",
+    " ".join(f"word{i}," for i in range(200)) + "; and a comment",
+    "say " + "'quoted text, with commas' " * 40,
+]
+
+
+def measure(func, passes: int) -> float:
+    start = perf_counter()
+    for _ in range(passes):
+        for line in LINES:
+            func(line)
+    return perf_counter() - start
+
+
+def main(passes: int = 2_000):
+    for line in LINES:
+        assert split(line) == old_split(line), line
+
+    old = measure(old_split, passes)
+    new = measure(split, passes)
+    calls = passes * len(LINES)
+    chars = passes * sum(map(len, LINES))
+
+    print(f"{calls:,} calls of split, {chars / 1e6:.1f} M characters")
+    for name, spent in (("before, shlex:", old), ("after, regex: ", new)):
+        print(
+            f"  {name} {calls / spent:10,.0f} lines/s"
+            f"  {chars / spent / 1e6:6.2f} M chars/s"
+        )
+    print(f"  speedup: {old / new:.1f}x")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:2]))
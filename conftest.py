@@ -0,0 +1,3 @@
+"""Run the tests against the same scratch config as the benchmarks."""
+
+import benchmarks._env  # noqa: F401
@@ -8,6 +8,7 @@ import asyncio
 import random
 import re
 import time
+from collections import Counter
 from datetime import datetime, timedelta
 from difflib import unified_diff
 from itertools import dropwhile
@@ -25,24 +26,35 @@ from typing import (
 )
 
 import discord
-from requests import post
 
 from petal import grasslands
+from petal.archive import Archive
 from petal.commands import CommandRouter as Commands
 from petal.commands.core import CommandPending
 from petal.config import cfg
-from petal.dbhandler import DBHandler
+from petal.dbhandler import AsyncDBHandler, ts
 from petal.etc import mash, filter_members_with_role, timestr
-from petal.exceptions import TunnelHobbled, TunnelSetupError
-from petal.tunnel import Tunnel
+from petal.exceptions import OutboxFull, TunnelHobbled, TunnelSetupError
+from petal.fanout import FanOut
+from petal.modlog import LogBatch
+from petal.outbox import Outbox, Priority
+from petal.runtime import Runtime
+from petal.scheduler import Scheduler
+from petal.tunnel import Tunnel, TunnelRouter
 from petal.types import PetalClientABC, Src
 from petal.util import questions
+from petal.util import cdn
+from petal.util.audit import AuditCache
 from petal.util.cdn import get_avatar
 from petal.util.embeds import Color, membership_card
 from petal.util.fmt import escape, mask, mono, mono_block, userline
+from petal.util.http import http
 from petal.util.grammar import pluralize
 from petal.util.minecraft import Minecraft
 from petal.util.numbers import word_number
+from petal.util.subindex import SubscriptionIndex
+from petal.util.waiters import WaiterRegistry
+from petal.util.wordfilter import WordFilter
 
 short_time: timedelta = timedelta(seconds=10)
 log = grasslands.Peacock()
@@ -56,12 +68,6 @@ with open("version_info.sh", "r") as f:
 grasslands.version = version
 
 
-def first_role_named(name: str, guild: discord.Guild):
-    for role in guild.roles:
-        if role.name == name:
-            return role
-
-
 class Petal(PetalClientABC):
     logLock = False
 
@@ -74,20 +80,40 @@ class Petal(PetalClientABC):
             log.info("Client object initialized")
 
         self.config = cfg
+        logconf = self.config.doc.get("logging") or {}
+        grasslands.configure(logconf.get("level"), logconf.get("json"))
+
         self.startup = datetime.utcnow()
         self.startup_unix = self.startup.timestamp()
 
-        self.db = DBHandler(self.config)
+        # Blocking database calls remain available through `db` while callers
+        #   are migrated onto the awaitable `adb`. Both share one pool.
+        self.adb = AsyncDBHandler(self.config)
+        self.db = self.adb.sync
 
         self.minecraft = Minecraft(self)
         self.commands = Commands(self)
         self.commands.version = version
 
+        self.archive: Optional[Archive] = Archive.from_config(self.config)
+        self.audit = AuditCache(horizon=short_time)
         self.loop_tasks: List[asyncio.Future] = []
+        self.outbox = Outbox.from_config(self.config)
+        self.memberlog = LogBatch.from_config(self, "logChannel", Priority.MEMBERSHIP)
+        self.modlog = LogBatch.from_config(self, "modChannel", Priority.MODERATION)
         self.potential_typo = {}
+        self.scheduler = Scheduler()
+        self.ban_task: Optional[asyncio.Future] = None
+        self.jobs_loaded: bool = False
+        self.subscriptions = SubscriptionIndex()
         self.session_id = hex(mash(datetime.utcnow(), digits=5, base=16)).upper()
         self.tempBanFlag = False
-        self.tunnels = []
+        self.tunnels = TunnelRouter(self)
+        self.waiters = WaiterRegistry()
+
+        self.rt: Runtime = Runtime.build(self.config)
+        self.word_filter = WordFilter.from_config(self.config)
+        self.config.listen(self.on_config)
 
         self.dev_mode = devmode
         log.info("Configuration object initalized")
@@ -109,6 +135,65 @@ class Petal(PetalClientABC):
         else:
             return 0
 
+    async def close(self):
+        try:
+            await self.flush_activity()
+        except Exception as e:
+            log.err(f"Could not flush activity on shutdown: {type(e).__name__}: {e}")
+        self.memberlog.flush()
+        self.modlog.flush()
+        await self.outbox.flush()
+        await cdn.close()
+        await http.close()
+        if self.archive:
+            self.archive.close()
+        await super().close()
+
+    def dispatch(self, event: str, *args, **kwargs):
+        self.waiters.dispatch(event, args)
+        super().dispatch(event, *args, **kwargs)
+
+    def wait_for(self, event: str, *, check=None, timeout=None):
+        """Wait for an event, as `discord.Client.wait_for`. Messages and
+            Reactions are waited for through the Waiter Registry, which only
+            tries the Checks that declare matching IDs.
+        """
+        if self.waiters.handles(event):
+            return self.waiters.wait_for(event, check, timeout)
+        return super().wait_for(event, check=check, timeout=timeout)
+
+    def on_config(self, event: str):
+        self.refresh_runtime()
+        if event == "load":
+            self.word_filter = WordFilter.from_config(self.config)
+            log.f("config", f"Word filter rebuilt with {len(self.word_filter)} words")
+
+            self.memberlog.flush()
+            self.modlog.flush()
+            self.memberlog = LogBatch.from_config(
+                self, "logChannel", Priority.MEMBERSHIP
+            )
+            self.modlog = LogBatch.from_config(self, "modChannel", Priority.MODERATION)
+
+    def refresh_runtime(self):
+        """Rebuild the precomputed Config values and swap them in."""
+        guild = self.get_guild(self.config.get("mainServer"))
+        self.rt = Runtime.build(self.config, guild)
+
+    async def on_guild_role_create(self, role: discord.Role):
+        if role.guild.id == self.config.get("mainServer"):
+            self.refresh_runtime()
+
+    async def on_guild_role_delete(self, role: discord.Role):
+        if role.guild.id == self.config.get("mainServer"):
+            self.refresh_runtime()
+
+    async def on_guild_role_update(self, before: discord.Role, after: discord.Role):
+        if before.name != after.name and after.guild.id == self.config.get(
+            "mainServer"
+        ):
+            self.refresh_runtime()
+
     @property
     def uptime(self):
         return datetime.utcnow() - self.startup
@@ -159,7 +244,9 @@ class Petal(PetalClientABC):
                     log.info(f"{name} coroutine finished.")
                     break
 
-        self.loop_tasks.append(self.loop.create_task(run()))
+        task = self.loop.create_task(run())
+        self.loop_tasks.append(task)
+        return task
 
     async def status_loop(self):
         interv = 32
@@ -210,6 +297,22 @@ class Petal(PetalClientABC):
             self.config.save()
             await asyncio.sleep(interval)
 
+    async def activity_loop(self):
+        if not self.db.useDB:
+            return
+        interval = self.config.doc.get("activityInterval", 10)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush_activity()
+            except Exception as e:
+                # The activity is kept, and retried on the next flush.
+                log.err(f"Could not flush activity: {type(e).__name__}: {e}")
+
+    async def flush_activity(self):
+        """Write all buffered Member activity to the database in one batch."""
+        await self.adb.flush_activity()
+
     async def ask_patch_loop(self):
         if self.dev_mode:
             return
@@ -222,46 +325,80 @@ class Petal(PetalClientABC):
             await asyncio.sleep(interval)
 
     async def ban_loop(self):
-        # if self.dev_mode:
-        #     return
-        mainguild: discord.Guild = self.get_guild(self.config.get("mainServer"))
-        interval = self.config.get("unbanInterval")
-        log.f("BANS", f"Checking for temp unbans (Interval: {interval})")
-        await asyncio.sleep(interval)
-        while True:
-            epoch = int(time.time())
-            log.f("BANS", "Now Timestamp: " + str(epoch))
-
-            for entry in await mainguild.bans():
-                user = entry.user
-                # log.f("UNBANS", m.name + "({})".format(m.id))
-                ban_expiry: int = int(
-                    self.db.get_attribute(user, "banExpires", verbose=False) or 0
+        """Load pending unbans and reminders from the database, then run each
+            one as it comes due. They are only loaded the first time; Any
+            scheduled since are already in the Scheduler.
+        """
+        if self.db.useDB and not self.jobs_loaded:
+            self.jobs_loaded = True
+            for entry in await self.adb.get_tempbans():
+                self.schedule_unban(entry["uid"], int(entry["banExpires"]))
+            for entry in await self.adb.get_reminders():
+                self.schedule_reminder(entry)
+
+        log.f("BANS", f"{len(self.scheduler)} scheduled jobs pending")
+        await self.scheduler.run()
+
+    def schedule_unban(self, uid: str, expires: float):
+        uid = str(uid)
+
+        async def unban():
+            mainguild: discord.Guild = self.main_guild
+            try:
+                await mainguild.unban(
+                    discord.Object(id=int(uid)), reason="Tempban Expired"
                 )
+            except discord.NotFound:
+                log.f("BANS", f"{uid} is no longer banned.")
+            except discord.Forbidden:
+                log.f("BANS", f"Lacking permission to unban {uid}.")
+                return
+            except discord.HTTPException as e:
+                retry = self.config.doc.get("unbanInterval", 600)
+                log.f("BANS", f"FAILED to unban {uid}, retrying in {retry}s: {e}")
+                self.schedule_unban(uid, time.time() + retry)
+                return
+            else:
+                log.f("BANS", f"Unbanned {uid}")
 
-                if not ban_expiry or not self.db.get_attribute(user, "tempBanned"):
-                    continue
-
-                if ban_expiry <= int(epoch):
-                    log.f(f"{ban_expiry} compared to {epoch}")
-                    print(flush=True)
-                    try:
-                        await mainguild.unban(user, reason="Tempban Expired")
-                    except discord.Forbidden:
-                        log.f("BANS", f"Lacking permission to unban {user.id}.")
-                    except discord.HTTPException as e:
-                        log.f("BANS", f"FAILED to unban {user.id}: {e}")
-                    else:
-                        self.db.update_member(user, {"banned": False})
-                        log.f("BANS", f"Unbanned {user.name} ({user.id}) ")
-                else:
-                    log.f(
-                        "BANS",
-                        f"{user.name} ({user.id}) has {int(ban_expiry) - epoch} seconds left",
-                    )
-                await asyncio.sleep(0.5)
+            await self.adb.update_member(uid, {"banned": False, "tempBanned": False})
 
-            await asyncio.sleep(interval)
+        self.scheduler.schedule(expires, ("unban", uid), unban)
+
+    def schedule_reminder(self, entry: dict, attempt: int = 0):
+        async def remind():
+            try:
+                user = self.get_user(entry["author"]) or await self.fetch_user(
+                    entry["author"]
+                )
+                await user.send(entry["content"])
+            except (discord.Forbidden, discord.NotFound) as e:
+                # It will never be deliverable, so do not keep trying.
+                log.f("REMIND", f"Dropping reminder for {entry['author']}: {e}")
+            except discord.HTTPException as e:
+                retry = min(60 * 2 ** attempt, 3600)
+                log.f(
+                    "REMIND",
+                    f"FAILED to remind {entry['author']}, retrying in {retry}s: {e}",
+                )
+                self.schedule_reminder(
+                    dict(entry, ts=time.time() + retry), attempt + 1
+                )
+                return
+            await self.adb.delete_reminder(entry["_id"])
+
+        self.scheduler.schedule(entry["ts"], ("reminder", entry["_id"]), remind)
+
+    async def add_reminder(self, author, content: str, when):
+        result = await self.adb.add_reminder(author, content, when)
+        self.schedule_reminder(
+            {
+                "_id": result.inserted_id,
+                "ts": ts(when),
+                "author": author.id,
+                "content": content,
+            }
+        )
 
     async def member_stats_update_loop(self):
         interval = 30
@@ -279,7 +416,7 @@ class Petal(PetalClientABC):
                 "value2": len(filter_members_with_role(guild.members, member_role)),
             }
             url = self.config.get("iftttEvent")
-            response = post(url, body)
+            response = await http.post(url, data=body)
             if response.status_code == 200:
                 log.debug("Successfully pushed data to IFTTT")
             else:
@@ -289,9 +426,65 @@ class Petal(PetalClientABC):
                 )
             await asyncio.sleep(interval)
 
+    async def refresh_subscriptions(self):
+        self.subscriptions.rebuild(
+            await self.adb.subs.find({}, {"code": 1, "name": 1}).to_list(None)
+        )
+        log.f("subs", f"Indexed {len(self.subscriptions)} subscriptions")
+
+    async def subscription_loop(self):
+        """Keep the subscription index in step with the database. Changes are
+            watched for where the database supports it, and polled otherwise.
+        """
+        from pymongo.errors import OperationFailure
+
+        await self.refresh_subscriptions()
+        try:
+            async with self.adb.subs.watch() as stream:
+                async for _ in stream:
+                    await self.refresh_subscriptions()
+        except OperationFailure:
+            # Change streams are only available on replica sets.
+            interval = self.config.doc.get("subscriptionRefresh", 300)
+            while True:
+                await asyncio.sleep(interval)
+                await self.refresh_subscriptions()
+
+    async def resume_deliveries(self):
+        """Finish any subscription notification runs that were cut short.
+
+        This runs on every connection, so only runs of other sessions are taken
+            up, and each is claimed first. Runs of this session, including
+            resumed ones, are still going, and must not be sent twice.
+        """
+        for run in await self.adb.get_unfinished_deliveries(self.session_id):
+            if not await self.adb.claim_delivery(run, self.session_id):
+                continue
+            guild = self.get_guild(run["guild"])
+            channel = self.get_channel(run["channel"])
+            sub = await self.adb.subs.find_one({"code": run["code"]})
+            if guild is None or channel is None or sub is None:
+                await self.adb.finish_delivery(run["_id"])
+                continue
+
+            log.f("FanOut", f"Resuming notification run for {run['code']!r}")
+            summary = await FanOut(
+                self,
+                dict(sub, members=run["members"]),
+                guild,
+                channel,
+                run_id=run["_id"],
+                results=run.get("results"),
+                concurrency=self.config.doc.get("notifyConcurrency", 8),
+            ).run()
+            await self.send_message(
+                None, channel, f"Resumed an interrupted notification run. {summary}"
+            )
+
     async def close_tunnels_to(self, channel):
         """Given a Channel, remove it from any/all Tunnels connecting to it."""
-        for t in self.tunnels:
+        t = self.tunnels.get(channel.id)
+        if t:
             await t.drop(channel)
 
     async def dig_tunnel(self, origin, *channels: List[int], anon=False):
@@ -300,20 +493,17 @@ class Petal(PetalClientABC):
         which to report back in case of problems. All subsequent Positional
         Arguments are Integer IDs.
         """
-        new = Tunnel(self, origin, *channels, anon)
+        new = Tunnel(self, origin, *channels, anonymous=anon)
         try:
-            tunnel_coro = new.activate()
+            await new.activate()
         except TunnelSetupError:
             return False
         else:
-            self.tunnels.append(new)
-            await tunnel_coro
+            return True
 
     def get_tunnel(self, channel):
-        """Given a Channel, return the first Tunnel connected to it, if any."""
-        for t in self.tunnels:
-            if channel in t.connected:
-                return t
+        """Given a Channel, return the Tunnel connected to it, if any."""
+        return self.tunnels.get(channel.id)
 
     async def kill_tunnel(self, t: Tunnel):
         """Given a Tunnel, kill it. Duh."""
@@ -324,8 +514,7 @@ class Petal(PetalClientABC):
         """Given a dead Tunnel, remove it from the Client Tunnels."""
         if t.active:
             raise TunnelHobbled("Cannot Remove a Tunnel which is still active.")
-        while t in self.tunnels:
-            self.tunnels.remove(t)
+        self.tunnels.remove(t)
 
     async def on_member_ban(self, member):
         print("Giving database a chance to sync...")
@@ -357,16 +546,27 @@ class Petal(PetalClientABC):
         )
         log.info(f"Prefix: {self.config.prefix}")
         log.info(f"SelfBot: {not bool(self.config.useToken)}")
+        self.refresh_runtime()
 
         self.register_loop(self.status_loop, "Gamestatus", restart=True)
         self.register_loop(self.save_loop, "Autosave", restart=True)
-        self.register_loop(self.ban_loop, "Auto-unban", restart=True)
+        self.register_loop(self.activity_loop, "Activity", restart=True)
+        if self.ban_task is None or self.ban_task.done():
+            # Reconnecting must not start a second Scheduler on the same jobs.
+            self.ban_task = self.register_loop(
+                self.ban_loop, "Auto-unban", restart=True
+            )
         self.register_loop(
             self.member_stats_update_loop, "Daily Stats Update", restart=True
         )
 
         if self.config.get("dbconf") is not None:
+            self.register_loop(self.adb.prepare, "Database indexing")
             self.register_loop(self.ask_patch_loop, "MOTD", restart=True)
+            self.register_loop(self.resume_deliveries, "Notification resume")
+            self.register_loop(
+                self.subscription_loop, "Subscription index", restart=True
+            )
         else:
             log.warn(
                 "No dbconf configuration in config.yml, motd features are disabled"
@@ -393,9 +593,10 @@ class Petal(PetalClientABC):
             return
 
         elif isinstance(response, BaseException):
-            await src.channel.send(
-                f"Command Yielded an Exception: {type(response).__name__}"
-                + (f": {response}" if str(response) else "")
+            await self.outbox.send(
+                src.channel,
+                content=f"Command Yielded an Exception: {type(response).__name__}"
+                + (f": {response}" if str(response) else ""),
             )
 
         elif isinstance(
@@ -498,7 +699,7 @@ class Petal(PetalClientABC):
                 vals.update(response)
                 await to_edit.edit(**vals)
             else:
-                await src.channel.send(**response)
+                await self.outbox.send(src.channel, **response)
 
         elif isinstance(response, discord.Embed):
             # If the response is an Embed, simply show it as normal.
@@ -506,7 +707,7 @@ class Petal(PetalClientABC):
             if to_edit:
                 await to_edit.edit(content=None, embed=response)
             else:
-                await src.channel.send(embed=response)
+                await self.outbox.send(src.channel, embed=response)
 
         elif isinstance(response, str):
             # Same with String.
@@ -559,7 +760,8 @@ class Petal(PetalClientABC):
                         name="Exception Traceback",
                         value=mono_block(format_exc()),
                         inline=False,
-                    )
+                    ),
+                    wait=False,
                 )
 
     async def send_message(
@@ -569,10 +771,15 @@ class Petal(PetalClientABC):
         message: str = None,
         *,
         embed: discord.Embed = None,
+        priority: int = Priority.REPLY,
+        wait: bool = True,
         **_,
     ) -> Optional[discord.Message]:
         """
         Overload on the send_message function
+
+        The Message is sent through the Outbox. With `wait` False, it is only
+            queued, and None is returned at once.
         """
         if not message and not embed:
             # Without a message to send, dont even try; it would just error
@@ -583,11 +790,10 @@ class Petal(PetalClientABC):
         if (
             author is not None
             and not set(message) <= afters & {"`"}
-            and self.db.get_member(author) is not None
-            and self.db.get_attribute(author, "ac")
+            and await self.adb.get_attribute(author, "ac", verbose=False)
         ):
             try:
-                ac = random.choice(list(self.db.ac.find()))["ending"]
+                ac = random.choice(await self.adb.ac.find().to_list(None))["ending"]
                 blocks = ""
                 msg = message
 
@@ -610,51 +816,57 @@ class Petal(PetalClientABC):
 
         if self.dev_mode:
             message = f"[DEV]  {message}  [DEV]"
+        if not wait:
+            self.outbox.post(channel, priority, content=message, embed=embed)
+            return None
         try:
-            return await channel.send(content=message, embed=embed)
-        except (discord.errors.Forbidden, discord.errors.InvalidArgument) as e:
+            return await self.outbox.send(
+                channel, priority, content=message, embed=embed
+            )
+        except (
+            discord.errors.Forbidden,
+            discord.errors.InvalidArgument,
+            OutboxFull,
+        ) as e:
             log.err(
                 f"Message could not be sent in #{channel.name}/{channel.id}:"
                 f"\n    {message!r}\n    ({type(e).__name__}) {e}"
             )
 
-    async def log_membership(
-        self, content: str = None, *, embed: discord.Embed = None
+    async def _log_to(
+        self,
+        key: str,
+        priority: int,
+        content: Optional[str],
+        embed: Optional[discord.Embed],
+        wait: bool,
     ) -> Optional[discord.Message]:
-        channel: discord.abc.Messageable = self.get_channel(
-            self.config.get("logChannel", 0)
-        )
+        channel: discord.abc.Messageable = self.get_channel(self.config.get(key, 0))
         if not channel:
-            log.err("Cannot post message to 'logChannel'.")
+            log.err(f"Cannot post message to {key!r}.")
             return None
-        else:
-            if content is not None and embed is not None:
-                return await channel.send(content, embed=embed)
-            elif content is not None:
-                return await channel.send(content)
-            elif embed is not None:
-                return await channel.send(embed=embed)
-            else:
-                return None
+        elif content is None and embed is None:
+            return None
+
+        kwargs = {"content": content, "embed": embed}
+        if not wait:
+            self.outbox.post(channel, priority, **kwargs)
+            return None
+        return await self.outbox.send(channel, priority, **kwargs)
+
+    async def log_membership(
+        self, content: str = None, *, embed: discord.Embed = None, wait: bool = True
+    ) -> Optional[discord.Message]:
+        return await self._log_to(
+            "logChannel", Priority.MEMBERSHIP, content, embed, wait
+        )
 
     async def log_moderation(
-        self, content: str = None, *, embed: discord.Embed = None
+        self, content: str = None, *, embed: discord.Embed = None, wait: bool = True
     ) -> Optional[discord.Message]:
-        channel: discord.abc.Messageable = self.get_channel(
-            self.config.get("modChannel", 0)
+        return await self._log_to(
+            "modChannel", Priority.MODERATION, content, embed, wait
         )
-        if not channel:
-            log.err("Cannot post message to 'modChannel'.")
-            return None
-        else:
-            if content is not None and embed is not None:
-                return await channel.send(content, embed=embed)
-            elif content is not None:
-                return await channel.send(content)
-            elif embed is not None:
-                return await channel.send(embed=embed)
-            else:
-                return None
 
     async def embed(
         self,
@@ -668,10 +880,7 @@ class Petal(PetalClientABC):
         if not channel:
             raise RuntimeError("Channel not provided.")
 
-        if content is not None:
-            return await channel.send(content=content, embed=embedded)
-        else:
-            return await channel.send(embed=embedded)
+        return await self.outbox.send(channel, content=content, embed=embedded)
 
     async def on_member_join(self, member):
         """To be called When a new member joins the server"""
@@ -746,7 +955,12 @@ class Petal(PetalClientABC):
                     inline=False,
                 )
 
-        await self.log_membership(embed=card)
+        self.memberlog.add(
+            card,
+            "Member Joined",
+            f"{member.mention} `{escape(userline(member))}`",
+            collapse=True,
+        )
 
     async def on_member_remove(self, member):
         """To be called when a member leaves"""
@@ -771,38 +985,30 @@ class Petal(PetalClientABC):
                     inline=False,
                 )
 
-        await self.log_membership(embed=card)
+        self.memberlog.add(
+            card,
+            "Member Left",
+            f"{member.mention} `{escape(userline(member))}`",
+            collapse=True,
+        )
 
     async def on_message_delete(self, message: discord.Message):
         try:
-            if message.channel.id in self.config.get(
-                "ignoreChannels", []
-            ) or not isinstance(message.channel, discord.TextChannel):
+            if message.channel.id in self.rt.ignore_channels or not isinstance(
+                message.channel, discord.TextChannel
+            ):
                 return
 
             now = datetime.utcnow()
             guild: discord.Guild = message.guild
 
-            executor = None
-            reason = None
-            try:
-                async for record in guild.audit_logs(
-                    limit=10,
-                    after=now - short_time,
-                    oldest_first=False,
-                    action=discord.AuditLogAction.message_delete,
-                ):
-                    if (
-                        record.target == message.author
-                        and record.extra.channel.id == message.channel.id
-                    ):
-                        executor = record.user
-                        reason = record.reason
-                        break
-            except (discord.Forbidden, discord.HTTPException):
-                can_audit = False
-            else:
-                can_audit = True
+            can_audit, record, ambiguous = await self.audit.find(
+                guild,
+                discord.AuditLogAction.message_delete,
+                (message.author.id, message.channel.id),
+            )
+            executor = record and record.user
+            reason = record and record.reason
 
             em = (
                 discord.Embed(
@@ -839,7 +1045,14 @@ class Petal(PetalClientABC):
                 )
 
             if can_audit:
-                if executor is None:
+                if ambiguous:
+                    em.add_field(
+                        name="Deleter",
+                        value="Unknown; More than one Moderator could have"
+                        " deleted this Message.",
+                        inline=False,
+                    )
+                elif executor is None:
                     em.add_field(
                         name="Deleter",
                         value="Message was probably deleted by __the Author__.",
@@ -882,10 +1095,188 @@ class Petal(PetalClientABC):
 
             em.add_field(name="Time of Deletion", value=timestr(now))
 
-            await self.log_moderation(embed=em)
+            self.modlog.add(
+                em,
+                "Message Deleted",
+                f"{message.author.mention} in {message.channel.mention}:"
+                f" {escape(message.content[:80]) or '(no text)'}",
+            )
         except discord.errors.HTTPException:
             return
 
+    async def on_raw_bulk_message_delete(
+        self, payload: discord.RawBulkMessageDeleteEvent
+    ):
+        """Log a bulk deletion, such as a purge, as one entry. Individual
+            deletions are not dispatched for these.
+        """
+        if payload.guild_id is None or payload.channel_id in self.rt.ignore_channels:
+            return
+
+        guild: discord.Guild = self.get_guild(payload.guild_id)
+        channel: discord.TextChannel = self.get_channel(payload.channel_id)
+        if guild is None or channel is None:
+            return
+
+        if self.archive:
+            self.archive.delete(payload.message_ids)
+
+        now = datetime.utcnow()
+        n = len(payload.message_ids)
+        cached: List[discord.Message] = payload.cached_messages
+        can_audit, record, ambiguous = await self.audit.find(
+            guild, discord.AuditLogAction.message_bulk_delete, channel.id, n
+        )
+
+        em = discord.Embed(
+            title="Messages Purged",
+            description=f"{word_number(n).capitalize()} ({n})"
+            f" {pluralize(n, 'Message')} deleted at once in {channel.mention}.",
+            colour=Color.message_delete,
+        )
+
+        if cached:
+            authors = Counter(m.author.id for m in cached)
+            members = {m.author.id: m.author for m in cached}
+            lines = [
+                f"{members[uid].mention} `{escape(userline(members[uid]))}`: {count}"
+                for uid, count in authors.most_common(10)
+            ]
+            if len(authors) > 10:
+                lines.append(f"...and {len(authors) - 10} more.")
+            em.add_field(name="Authors", value="\n".join(lines), inline=False)
+        if len(cached) < n:
+            em.add_field(
+                name="Uncached",
+                value=f"{n - len(cached)} of the Messages were not cached; Their"
+                f" authors and content are unknown.",
+                inline=False,
+            )
+
+        if not can_audit:
+            em.add_field(
+                name="Deleter",
+                value="Insufficient Permissions to find Deleter.",
+                inline=False,
+            )
+        elif ambiguous:
+            em.add_field(
+                name="Deleter",
+                value="Unknown; More than one purge could account for these"
+                " Messages.",
+                inline=False,
+            )
+        elif record is not None:
+            em.add_field(
+                name="Deleter",
+                value=f"Messages were probably deleted by:"
+                f"\n`{escape(userline(record.user))}`"
+                f"\n{record.user.mention}",
+                inline=False,
+            )
+            if record.reason is not None:
+                em.add_field(
+                    name="Reason for Deletion", value=record.reason, inline=False
+                )
+
+        em.add_field(
+            name="Channel", value=f"`#{channel.name}`\n{channel.mention}"
+        ).add_field(name="Guild", value=guild.name).add_field(
+            name="Time of Deletion", value=timestr(now)
+        )
+
+        self.modlog.add(em, "Messages Purged", f"{n} in {channel.mention}")
+
+    async def on_raw_message_edit(self, payload: discord.RawMessageUpdateEvent):
+        # Raw, so that edits to Messages no longer cached are archived too.
+        if self.archive and "content" in payload.data:
+            self.archive.edit(payload.message_id, payload.data["content"])
+
+    async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent):
+        """Mark a deletion in the Archive. If the Message was too old to be
+            cached, `on_message_delete` will not see it, so log it from the
+            Archive instead, if it is there.
+        """
+        if not self.archive:
+            return
+        self.archive.delete([payload.message_id])
+
+        if (
+            payload.cached_message is not None
+            or payload.guild_id is None
+            or payload.channel_id in self.rt.ignore_channels
+        ):
+            return
+        guild: discord.Guild = self.get_guild(payload.guild_id)
+        channel: discord.TextChannel = self.get_channel(payload.channel_id)
+        found = await self.archive.get(payload.message_id)
+        if guild is None or channel is None or found is None:
+            return
+
+        can_audit, record, ambiguous = await self.audit.find(
+            guild, discord.AuditLogAction.message_delete, (found.author, channel.id)
+        )
+        em = discord.Embed(
+            title="Message Deleted (from Archive)",
+            description=f"A Message by <@{found.author}> was deleted. It was no"
+            f" longer cached; This is its content as last archived.",
+            colour=Color.message_delete,
+        ).set_footer(text=f"{found.author_name} / {found.author}")
+
+        if found.content:
+            em.add_field(name="Content", value=escape(found.content), inline=False)
+        if found.attachments:
+            n = found.attachments
+            em.add_field(
+                name="Attachments",
+                value=f"Message had {word_number(n)} ({n})"
+                f" {pluralize(n, 'Attachment')}.",
+                inline=False,
+            )
+
+        if not can_audit:
+            em.add_field(
+                name="Deleter",
+                value="Insufficient Permissions to find Deleter.",
+                inline=False,
+            )
+        elif ambiguous:
+            em.add_field(
+                name="Deleter",
+                value="Unknown; More than one Moderator could have deleted this"
+                " Message.",
+                inline=False,
+            )
+        elif record is None:
+            em.add_field(
+                name="Deleter",
+                value="Message was probably deleted by __the Author__.",
+                inline=False,
+            )
+        else:
+            em.add_field(
+                name="Deleter",
+                value=f"Message was probably deleted by:"
+                f"\n`{escape(userline(record.user))}`"
+                f"\n{record.user.mention}",
+                inline=False,
+            )
+
+        em.add_field(
+            name="Channel", value=f"`#{channel.name}`\n{channel.mention}"
+        ).add_field(name="Guild", value=guild.name).add_field(
+            name="Time of Creation", value=timestr(found.created_at)
+        ).add_field(
+            name="Time of Deletion", value=timestr()
+        )
+
+        self.modlog.add(
+            em,
+            "Message Deleted",
+            f"<@{found.author}> in {channel.mention}:"
+            f" {escape(found.content[:80]) or '(no text)'}",
+        )
+
     async def on_message_edit(self, before: Src, after: Src):
         if (
             Petal.logLock
@@ -893,8 +1284,8 @@ class Petal(PetalClientABC):
             or not isinstance(before.channel, discord.TextChannel)
             or after.content == ""
             or before.content == after.content
-            or before.guild.id in self.config.get("ignoreServers")
-            or before.channel.id in self.config.get("ignoreChannels")
+            or before.guild.id in self.rt.ignore_servers
+            or before.channel.id in self.rt.ignore_channels
         ):
             return
 
@@ -952,15 +1343,15 @@ class Petal(PetalClientABC):
 
         em.add_field(name="Time of Edit", value=timestr())
 
-        try:
-            await self.log_moderation(embed=em)
-        except discord.errors.HTTPException:
-            log.warn(
-                "HTTP 400 error from the edit statement. "
-                + "Usually it's safe to ignore it"
-            )
+        self.modlog.add(
+            em,
+            "Message Edited",
+            f"{before.author.mention} in {before.channel.mention}:"
+            f" {escape(after.content[:80])}",
+        )
 
     async def on_member_update(self, before: discord.Member, after: discord.Member):
+        self.tunnels.forget(after.id)
         if Petal.logLock:
             return
 
@@ -1002,8 +1393,14 @@ class Petal(PetalClientABC):
                     inline=False,
                 )
 
-            await self.log_moderation(
-                embed=em.add_field(name="Timestamp", value=timestr(), inline=False)
+            self.modlog.add(
+                em.add_field(name="Timestamp", value=timestr(), inline=False),
+                "Roles Updated",
+                f"{after.mention}: "
+                + " ".join(
+                    [f"+{role.mention}" for role in gain]
+                    + [f"-{role.mention}" for role in lost]
+                ),
             )
 
         if before.nick != after.nick:
@@ -1020,7 +1417,12 @@ class Petal(PetalClientABC):
                 .set_footer(text=userline(after))
             )
 
-            await self.log_moderation(embed=em)
+            self.modlog.add(
+                em,
+                "Nickname Change",
+                f"{after.mention}: {escape(before.nick)} → {escape(after.nick)}",
+                collapse=True,
+            )
 
     async def on_user_update(self, before: discord.User, after: discord.User):
         if before.name != after.name:
@@ -1037,7 +1439,12 @@ class Petal(PetalClientABC):
                 .set_footer(text=userline(after))
             )
 
-            await self.log_moderation(embed=em)
+            self.modlog.add(
+                em,
+                "Username Change",
+                f"{after.mention}: {escape(before.name)} → {escape(after.name)}",
+                collapse=True,
+            )
 
         if before.avatar_url != after.avatar_url:
             em = (
@@ -1052,7 +1459,7 @@ class Petal(PetalClientABC):
                 .set_image(url=get_avatar(after))
             )
 
-            await self.log_moderation(embed=em)
+            self.modlog.add(em, "Avatar Change", f"{after.mention}")
 
     # async def on_voice_state_update(self, before, after):
     #
@@ -1118,30 +1525,23 @@ class Petal(PetalClientABC):
         content = message.content.strip()
         try:
             if isinstance(message.channel, discord.TextChannel):
-                self.db.update_member(
-                    message.author,
-                    {
-                        "aliases": message.author.name,
-                        "guilds": message.guild.id,
-                        "last_message_channel": message.channel.id,
-                        "last_active": message.created_at,
-                        "last_message": message.created_at,
-                    },
-                    type=1,
-                )
-                m_count = self.db.get_attribute(message.author, "message_count")
-                if m_count is not None:
-                    self.db.update_member(
-                        message.author,
-                        {"message_count": m_count + 1},
-                    )
+                if self.db.useDB:
+                    self.db.activity.record(message)
+                if self.archive and not (
+                    message.channel.id in self.rt.ignore_channels
+                    or message.guild.id in self.rt.ignore_servers
+                ):
+                    self.archive.record(message)
         except Exception as e:
             log.err("{} on Message: {}".format(type(e).__name__, str(e)))
 
+        self.tunnels.route(message)
+
+        rt = self.rt
         if (
             message.author == self.user
-            or message.content == self.config.prefix
-            or message.author.id in self.config.blacklist
+            or message.content == rt.prefix
+            or message.author.id in rt.blacklist
         ):
             return
 
@@ -1149,10 +1549,9 @@ class Petal(PetalClientABC):
             # Potential here to autoban tag spammers.
             pass
 
-        for word in message.content.split():
-            if message.channel.id in self.config.get("ignoreChannels"):
-                break
-            if word in self.config.wordFilter:
+        if self.word_filter and message.channel.id not in rt.ignore_channels:
+            hits = self.word_filter.scan(message.content)
+            if hits:
                 embed = discord.Embed(
                     title="Word Filter Hit",
                     description="At least one filtered word was detected",
@@ -1166,34 +1565,38 @@ class Petal(PetalClientABC):
                 embed.add_field(name="Channel", value=message.channel.name)
                 embed.add_field(name="Guild", value=message.guild.name)
                 embed.add_field(name="Content", value=message.content)
-                embed.add_field(name="Detected word", value=word, inline=False)
+                embed.add_field(
+                    name=pluralize(len(hits), "Detected word"),
+                    value="\n".join(
+                        f"{mono(message.content[h.start : h.end])} matched"
+                        f" {mono(h.word)} at {h.start}-{h.end}"
+                        for h in hits[:10]
+                    ),
+                    inline=False,
+                )
                 embed.add_field(name="Timestamp", value=timestr(), inline=False)
                 embed.set_thumbnail(url=message.author.avatar_url)
-                await self.log_moderation(embed=embed)
-                break
+                self.modlog.add(
+                    embed,
+                    "Word Filter Hit",
+                    f"{message.author.mention} in {message.channel.mention}: "
+                    + ", ".join(sorted({mono(h.word) for h in hits})),
+                )
 
-        role_member = first_role_named(
-            self.config.get("roleGrant")["role"], self.main_guild
-        )
+        grant = rt.role_grant
         if (
-            role_member
-            and message.channel.id == self.config.get("roleGrant")["chan"]
-            and role_member not in message.author.roles
+            grant
+            and grant.role
+            and message.channel.id == grant.channel
+            and grant.role not in message.author.roles
         ):
             try:
-                if self.config.get("roleGrant")["ignorecase"]:
-                    check = re.compile(
-                        self.config.get("roleGrant")["regex"], re.IGNORECASE
-                    )
-                else:
-                    check = re.compile(self.config.get("roleGrant")["regex"])
-
-                if check.match(message.content):
+                if grant.regex.match(message.content):
                     await self.send_message(
-                        None, message.channel, self.config.get("roleGrant")["response"]
+                        None, message.channel, grant.response, wait=False
                     )
                     await message.author.add_roles(
-                        role_member, reason="Message matched the Agreement regex."
+                        grant.role, reason="Message matched the Agreement regex."
                     )
                     log.member(
                         message.author.name
@@ -1213,7 +1616,7 @@ class Petal(PetalClientABC):
                 )
                 raise e
 
-        if not self.config.pm and isinstance(
+        if not rt.accept_pms and isinstance(
             message.channel, discord.abc.PrivateChannel
         ):
             if not message.author == self.user:
@@ -1226,14 +1629,19 @@ class Petal(PetalClientABC):
                 )
             return
 
-        replies = self.config.get("autoreplies") or {}
-        if content in replies:
+        if content in rt.autoreplies:
             if not message.author == self.user:
-                reply = replies.get(content, "").format(
+                reply = rt.autoreplies.get(content, "").format(
                     user=message.author, self=self.user
                 )
                 if reply:
-                    await self.send_message(None, message.channel, reply)
+                    await self.send_message(
+                        None,
+                        message.channel,
+                        reply,
+                        priority=Priority.BULK,
+                        wait=False,
+                    )
             return
 
         # For now, do all the above checks and then run/route it.
@@ -0,0 +1,319 @@
+"""Local archive of the Messages Petal sees.
+
+Discord only keeps a small cache of recent Messages in memory, so the content
+    of an older Message is gone once it is deleted, and reading history means
+    paging through the API. When enabled, every Message in a Guild Channel is
+    also written to an SQLite database, with an FTS5 index over its content, and
+    the archive can answer those questions locally.
+
+Messages are never rewritten: An edit adds a revision, and a deletion only
+    marks the Message as deleted. Writes are put on a queue and committed in
+    batches by a background thread, so that recording a Message never waits on
+    the disk. Messages older than the retention period are dropped.
+"""
+
+import asyncio
+import queue
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from time import sleep, time
+from typing import Any, Iterable, List, NamedTuple, Optional, Tuple
+
+import discord
+
+from .grasslands import Peacock
+
+log = Peacock()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    guild INTEGER NOT NULL,
+    channel INTEGER NOT NULL,
+    author INTEGER NOT NULL,
+    author_name TEXT NOT NULL,
+    content TEXT NOT NULL,
+    attachments INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL,
+    edited REAL,
+    deleted REAL
+);
+CREATE INDEX IF NOT EXISTS messages_author ON messages (author, created);
+CREATE INDEX IF NOT EXISTS messages_channel ON messages (channel, created);
+CREATE INDEX IF NOT EXISTS messages_created ON messages (created);
+
+CREATE TABLE IF NOT EXISTS revisions (
+    message INTEGER NOT NULL REFERENCES messages (id) ON DELETE CASCADE,
+    content TEXT NOT NULL,
+    edited REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS revisions_message ON revisions (message);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5 (
+    content, content='messages', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS messages_ai AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_ad AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, content)
+        VALUES ('delete', old.id, old.content);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_au AFTER UPDATE OF content ON messages BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, content)
+        VALUES ('delete', old.id, old.content);
+    INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content);
+END;
+"""
+
+FIELDS = (
+    "id",
+    "guild",
+    "channel",
+    "author",
+    "author_name",
+    "content",
+    "attachments",
+    "created",
+    "edited",
+    "deleted",
+)
+COLUMNS = ", ".join(FIELDS)
+
+
+class ArchivedMessage(NamedTuple):
+    id: int
+    guild: int
+    channel: int
+    author: int
+    author_name: str
+    content: str
+    attachments: int
+    created: float
+    edited: Optional[float]
+    deleted: Optional[float]
+
+    @property
+    def created_at(self) -> datetime:
+        return datetime.utcfromtimestamp(self.created)
+
+    @property
+    def jump_url(self) -> str:
+        return f"https://discord.com/channels/{self.guild}/{self.channel}/{self.id}"
+
+
+def epoch(when: datetime = None) -> float:
+    """Convert a naive UTC datetime, as Discord gives, to a Unix timestamp."""
+    return (when or datetime.utcnow()).replace(tzinfo=timezone.utc).timestamp()
+
+
+def fts_query(text: str) -> str:
+    """Quote every word of a search, so that user input is never parsed as FTS5
+        query syntax. The words must all appear, in any order.
+    """
+    return " ".join('"{}"'.format(w.replace('"', '""')) for w in text.split())
+
+
+class Archive(object):
+    def __init__(self, path: str, *, retention_days: float = 90, interval: float = 1):
+        """
+        :param path: The SQLite database file.
+        :param retention_days: Drop Messages older than this. Zero keeps
+            everything.
+        :param interval: Seconds to let writes gather before committing them.
+        """
+        self.path: str = path
+        self.retention: float = retention_days * 86400
+        self.interval: float = interval
+
+        self.queue: "queue.SimpleQueue[Optional[Tuple[str, Any]]]" = queue.SimpleQueue()
+        self.written: int = 0
+
+        self._db = self._connect()
+        self._db.executescript(SCHEMA)
+        self._reader = self._connect()
+        self._read_lock = threading.Lock()
+
+        self._thread = threading.Thread(target=self.run, name="Archive", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def from_config(cls, config) -> Optional["Archive"]:
+        """Return an Archive if the Config enables one, otherwise None."""
+        opts = config.doc.get("archive") or {}
+        if not opts.get("enabled"):
+            return None
+        return cls(
+            opts.get("path", "archive.sqlite3"),
+            retention_days=opts.get("retentionDays", 90),
+            interval=opts.get("interval", 1),
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute("PRAGMA foreign_keys=ON")
+        return db
+
+    # Writing. These only queue the change, and return at once.
+
+    def record(self, message: discord.Message):
+        self.queue.put(
+            (
+                "record",
+                (
+                    message.id,
+                    message.guild.id,
+                    message.channel.id,
+                    message.author.id,
+                    str(message.author),
+                    message.content,
+                    len(message.attachments),
+                    epoch(message.created_at),
+                ),
+            )
+        )
+
+    def edit(self, message_id: int, content: str, edited: datetime = None):
+        self.queue.put(("edit", (message_id, content, epoch(edited))))
+
+    def delete(self, message_ids: Iterable[int]):
+        now = time()
+        self.queue.put(("delete", [(now, mid) for mid in message_ids]))
+
+    def close(self):
+        """Commit everything still queued, and stop the thread."""
+        if self._thread.is_alive():
+            self.queue.put(None)
+            self._thread.join(10)
+        self._db.close()
+        self._reader.close()
+
+    def run(self):
+        last_purge = 0
+        while True:
+            batch = [self.queue.get()]
+            if self.interval:
+                # Let a burst of writes arrive, to commit them all at once.
+                sleep(self.interval)
+            try:
+                while True:
+                    batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            try:
+                self.write([op for op in batch if op is not None])
+                if self.retention and time() - last_purge > 3600:
+                    last_purge = time()
+                    self.purge(last_purge - self.retention)
+            except sqlite3.Error as e:
+                log.err(f"Archive write FAILED: {type(e).__name__}: {e}")
+
+            if None in batch:
+                return
+
+    def write(self, batch: List[Tuple[str, Any]]):
+        with self._db:
+            for op, data in batch:
+                if op == "record":
+                    self._db.execute(
+                        "INSERT OR IGNORE INTO messages (id, guild, channel, author,"
+                        " author_name, content, attachments, created)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        data,
+                    )
+                elif op == "edit":
+                    mid, content, edited = data
+                    # Keep the old content as a revision, then show the new.
+                    self._db.execute(
+                        "INSERT INTO revisions (message, content, edited)"
+                        " SELECT id, content, ? FROM messages"
+                        " WHERE id = ? AND content != ?",
+                        (edited, mid, content),
+                    )
+                    self._db.execute(
+                        "UPDATE messages SET content = ?, edited = ?"
+                        " WHERE id = ? AND content != ?",
+                        (content, edited, mid, content),
+                    )
+                elif op == "delete":
+                    self._db.executemany(
+                        "UPDATE messages SET deleted = ? WHERE id = ?", data
+                    )
+        self.written += len(batch)
+
+    def purge(self, cutoff: float):
+        with self._db:
+            n = self._db.execute(
+                "DELETE FROM messages WHERE created < ?", (cutoff,)
+            ).rowcount
+        if n:
+            log.f("Archive", f"Dropped {n} Messages past retention")
+
+    # Reading. Queries run in the default executor, on their own connection,
+    #   which WAL mode allows alongside the writer.
+
+    async def _query(self, sql: str, params: tuple) -> List[ArchivedMessage]:
+        def run():
+            with self._read_lock:
+                rows = self._reader.execute(sql, params).fetchall()
+            return [ArchivedMessage(*row) for row in rows]
+
+        return await asyncio.get_event_loop().run_in_executor(None, run)
+
+    async def get(self, message_id: int) -> Optional[ArchivedMessage]:
+        found = await self._query(
+            f"SELECT {COLUMNS} FROM messages WHERE id = ?", (message_id,)
+        )
+        return found[0] if found else None
+
+    async def history(
+        self,
+        author: int,
+        *,
+        guild: int = None,
+        before: datetime = None,
+        limit: int = 10,
+    ) -> List[ArchivedMessage]:
+        """Return the most recent Messages of a User, newest first."""
+        return await self._query(
+            f"SELECT {COLUMNS} FROM messages WHERE author = ?"
+            " AND (? IS NULL OR guild = ?) AND created < ?"
+            " ORDER BY created DESC LIMIT ?",
+            (author, guild, guild, epoch(before), limit),
+        )
+
+    async def revisions(self, message_id: int) -> List[Tuple[str, float]]:
+        def run():
+            with self._read_lock:
+                return self._reader.execute(
+                    "SELECT content, edited FROM revisions WHERE message = ?"
+                    " ORDER BY edited",
+                    (message_id,),
+                ).fetchall()
+
+        return await asyncio.get_event_loop().run_in_executor(None, run)
+
+    async def search(
+        self,
+        text: str,
+        *,
+        guild: int = None,
+        channel: int = None,
+        author: int = None,
+        limit: int = 10,
+    ) -> List[ArchivedMessage]:
+        """Find Messages containing every word of some text, best match first."""
+        return await self._query(
+            f"SELECT {', '.join('m.' + f for f in FIELDS)}"
+            " FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid"
+            " WHERE messages_fts MATCH ?"
+            " AND (? IS NULL OR m.guild = ?)"
+            " AND (? IS NULL OR m.channel = ?)"
+            " AND (? IS NULL OR m.author = ?)"
+            " ORDER BY rank LIMIT ?",
+            (fts_query(text), guild, guild, channel, channel, author, author, limit),
+        )
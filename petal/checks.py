@@ -1,8 +1,46 @@
 import asyncio
-from typing import Optional, Tuple, Union
+from typing import Callable, Dict, FrozenSet, Iterable, Optional, Tuple, Union
 
 import discord
 
+# The IDs which a Check may declare, in the order a Waiter Registry indexes them.
+KEYS = ("channel", "user", "message")
+
+
+def _ids(value: Union[int, Iterable[int]]) -> FrozenSet[int]:
+    if isinstance(value, int):
+        return frozenset((value,))
+    return frozenset(value)
+
+
+class Check(object):
+    """A Predicate which also declares which Channel, User or Message it can
+        match. It is called exactly like the Predicates it wraps, but when
+        passed to `wait_for`, Petal can index it by those IDs, and skip it for
+        every event that does not have them.
+
+    A Check with no IDs is valid, but is tried against every event.
+    """
+
+    __slots__ = ("key", "predicates")
+
+    def __init__(
+        self,
+        *predicates: Callable[..., bool],
+        channel: Union[int, Iterable[int]] = None,
+        user: Union[int, Iterable[int]] = None,
+        message: Union[int, Iterable[int]] = None,
+    ):
+        self.key: Dict[str, FrozenSet[int]] = {
+            name: _ids(value)
+            for name, value in zip(KEYS, (channel, user, message))
+            if value is not None
+        }
+        self.predicates: Tuple[Callable[..., bool], ...] = predicates
+
+    def __call__(self, *a) -> bool:
+        return all(p(*a) for p in self.predicates)
+
 
 def all_checks(*checks):
     """Specialized Predicate Factory. Return a Predicate that serves as an "AND"
@@ -10,11 +48,12 @@ def all_checks(*checks):
 
     Will probably end up raising an Exception if the Signatures do not match.
     """
+    key: Dict[str, FrozenSet[int]] = {}
+    for c in checks:
+        for name, ids in getattr(c, "key", {}).items():
+            key[name] = key[name] & ids if name in key else ids
 
-    def check(*a):
-        return all([p(*a) for p in checks])
-
-    return check
+    return Check(*checks, **key)
 
 
 def any_checks(*checks):
@@ -23,11 +62,18 @@ def any_checks(*checks):
 
     Will probably end up raising an Exception if the Signatures do not match.
     """
+    # Only an ID which every Predicate declares narrows down the result.
+    keys = [getattr(c, "key", {}) for c in checks]
+    key: Dict[str, FrozenSet[int]] = {
+        name: frozenset().union(*(k[name] for k in keys))
+        for name in KEYS
+        if keys and all(name in k for k in keys)
+    }
 
     def check(*a):
         return any([p(*a) for p in checks])
 
-    return check
+    return Check(check, **key)
 
 
 class Messages:
@@ -67,7 +113,7 @@ class Messages:
         def check(_message: discord.Message):
             return _message and _message.author.id == user.id
 
-        return check
+        return Check(check, user=user.id)
 
     @classmethod
     def in_channel(cls, channel: discord.TextChannel):
@@ -78,7 +124,7 @@ class Messages:
         def check(_message: discord.Message):
             return _message and _message.channel.id == channel.id
 
-        return check
+        return Check(check, channel=channel.id)
 
 
 class Reactions:
@@ -118,7 +164,7 @@ class Reactions:
         def check(_reaction, _user):
             return _user and _user.id == user.id
 
-        return check
+        return Check(check, user=user.id)
 
     @classmethod
     def on_message(cls, message: discord.Message):
@@ -129,4 +175,4 @@ class Reactions:
         def check(_reaction, _user):
             return _reaction and _reaction.message.id == message.id
 
-        return check
+        return Check(check, message=message.id)
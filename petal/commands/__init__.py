@@ -3,9 +3,9 @@ import importlib
 import sys
 from datetime import datetime as dt
 from re import compile
-from typing import Dict, get_type_hints, List, Optional, Tuple
+from typing import Callable, Dict, List, Optional, Set, Tuple
 
-from petal.etc import check_types, split, unquote
+from petal.etc import OptionSchema, split, unquote
 from petal.exceptions import CommandArgsError, CommandAuthError
 from petal.social_integration import Integrated
 from petal.types import Args, Src
@@ -75,21 +75,93 @@ class CommandRouter(Integrated):
 
         self.log.ready("Command modules loaded.")
 
+        # Every keyword maps to the engines providing it, in the order of
+        #   LoadModules, so that a lookup preserves first-permitted precedence.
+        self.index: Dict[str, List[Tuple[object, Callable]]] = {}
+        self.index_alias: Dict[str, List[Tuple[object, Callable]]] = {}
+        self._custom: Set[str] = set()
+        # Compiled Option parsing for each indexed Method.
+        self.schemas: Dict[Callable, OptionSchema] = {}
+
+        self.build_index()
+        self.config.listen(self.on_config)
+
+    def build_index(self):
+        """Build the keyword index from scratch."""
+        index = {}
+        for mod in self.engines:
+            for kword, (func, submod) in mod.get_commands().items():
+                index.setdefault(kword, []).append((submod or mod, func))
+
+        self.index = index
+        self._custom = set(self.config.commands)
+        self.schemas = {}
+        for candidates in index.values():
+            self.compile(candidates)
+        self.index_aliases()
+        self.log.ready(f"Command index built with {len(self.index)} keywords.")
+
+    def index_aliases(self):
+        aliases = self.config.get("aliases", {})
+        self.index_alias = {
+            alias: self.index[target]
+            for alias, target in aliases.items()
+            if target in self.index
+        }
+
+    def reindex(self, *kwords: str):
+        """Update the index entries for specific keywords, and then for all
+            aliases, which may point at them.
+        """
+        for kword in kwords:
+            found = []
+            for mod in self.engines:
+                func, submod = mod.get_command(kword) or (None, None)
+                if func:
+                    found.append((submod or mod, func))
+
+            for _, func in self.index.pop(kword, ()):
+                self.schemas.pop(func, None)
+            if found:
+                self.index[kword] = found
+                self.compile(found)
+
+        self.index_aliases()
+
+    def compile(self, candidates: List[Tuple[object, Callable]]):
+        for _, func in candidates:
+            try:
+                self.schemas[func] = OptionSchema(func)
+            except Exception as e:
+                # It will be compiled again on use, and fail there visibly.
+                self.log.warn(f"Could not compile options of {func.__name__}: {e}")
+
+    def on_config(self, event: str):
+        if event == "load":
+            # Custom Commands may have been added, changed, or removed.
+            custom = set(self.config.commands)
+            self.reindex(*(self._custom | custom))
+            self._custom = custom
+
     def find_command(self, kword, src=None, recursive=True):
         """Find and return a Class Method whose name matches kword."""
         reason = ""
         func = mod_src = None
 
-        for mod in self.engines:
-            _func, _submod = mod.get_command(kword)
-            if _func:
-                func = _func
-                mod_src = _submod or mod
-                permitted, reason = mod_src.authenticate(src)
-                if not src or permitted:
-                    # Allow if no Source Message was provided. That would
-                    #   indicate that this is not a check meant to be enforced.
-                    return mod_src, _func
+        candidates = self.index.get(kword)
+        if candidates is None and recursive:
+            # This command is not "real". Check whether it is an alias.
+            candidates = self.index_alias.get(kword)
+
+        for mod_src, func in candidates or ():
+            if not src:
+                # Allow if no Source Message was provided. That would indicate
+                #   that this is not a check meant to be enforced.
+                return mod_src, func
+
+            permitted, reason = mod_src.authenticate(src)
+            if permitted:
+                return mod_src, func
 
         if func:
             # The Loop above successfully found a Method for this Command, but
@@ -114,12 +186,6 @@ class CommandRouter(Integrated):
             else:
                 raise CommandAuthError(f"`{reason}`.")
         else:
-            # This command is not "real". Check whether it is an alias.
-            if recursive:
-                alias = self.config.get("aliases", {})
-                if kword in alias:
-                    return self.find_command(alias[kword], src, False)
-
             return None, None
 
     def get_all(self, src: Src = None):
@@ -153,32 +219,17 @@ class CommandRouter(Integrated):
             its Options, and Users can pass data as part of a String that gets
             automatically converted into the correct Type.
         """
-        hints = get_type_hints(func)
-        shorts = ""
-        longs = []
-
-        # First, convert the method typing hints into something Getopt knows.
-        for opt_name, opt_type in hints.items():
-            if not opt_name.startswith("_"):
-                continue
-            # "_option_name" -> "option-name"
-            opt_name = opt_name[1:].replace("_", "-")
-            if len(opt_name) == 1:
-                if opt_type != bool:
-                    opt_name += ":"
-                shorts += opt_name
-            else:
-                if opt_type != bool:
-                    opt_name += "="
-                longs.append(opt_name)
+        schema = self.schemas.get(func)
+        if schema is None:
+            schema = self.schemas[func] = OptionSchema(func)
 
-        # Run the line through Getopt using the option expectations we just generated.
-        args, opts = self.parse(cline, shorts, longs)
+        # Run the line through Getopt using the precompiled option expectations.
+        o, a = getopt.getopt(cline, schema.shorts, schema.longs)
 
         # Args: Remove any outermost quotes.
-        args: Args = Args([unquote(arg.replace(SOFT_HYPHEN, "")) for arg in args])
+        args: Args = Args([unquote(arg.replace(SOFT_HYPHEN, "")) for arg in a])
         # Opts: Enforce the typing, and if it all passes, send our results back up.
-        opts = check_types(opts, hints)
+        opts = schema.convert(o)
 
         return args, opts
 
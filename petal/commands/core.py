@@ -13,6 +13,7 @@ from petal.exceptions import (
     CommandInputError,
     CommandOperationError,
 )
+from petal.fanout import FanOut
 from petal.grasslands import Peacock
 from petal.types import Src, PetalClientABC, Printer
 
@@ -197,6 +198,7 @@ class Commands:
         self.client: PetalClientABC = client
         self.config = client.config
         self.db = client.db
+        self.adb = client.adb
 
         self.router = router
         self.log: Peacock = self.router.log
@@ -209,6 +211,16 @@ class Commands:
             # Refuse to fetch anything with a dunder
             return getattr(self, "cmd_" + kword, None), None
 
+    def get_commands(self) -> dict:
+        """Return a Dict mapping every keyword this engine provides to a Tuple
+            of its Method and the sub-engine providing it, if not this one.
+        """
+        return {
+            attr[4:]: (getattr(self, attr), None)
+            for attr in dir(self)
+            if "__" not in attr and attr.startswith("cmd_")
+        }
+
     def get_all(self) -> list:
         full = [
             getattr(self, attr)
@@ -311,88 +323,41 @@ class Commands:
     async def notify_subscribers(
         self, source_channel: discord.TextChannel, target_message, key
     ):
-        await self.client.send_message(None, source_channel, "Notifying subscribers...")
-        sub = self.db.subs.find_one({"code": key})
+        sub = await self.adb.subs.find_one({"code": key})
         if sub is None:
             return "Error, could not find that subscription anymore. Which shouldn't ever happen. Ask isometricramen about it."
-        status = "```\n"
-        total = len(sub["members"])
         if len(sub["members"]) == 0:
             return "Nobody is subscribed to this game. "
-        count = 0
-        for member in sub["members"]:
-            mem = self.get_member(target_message, member)
-            if mem is None:
-                status += member + " is missing\n"
-            else:
-                try:
-                    await self.client.send_message(
-                        None,
-                        mem,
-                        "Hello! Hope your day/evening/night/morning is going well\n\nI was just popping in here to let you know that an event for `{}` has been announced.".format(
-                            sub["name"]
-                        )
-                        + "\n\nIf you wish to stop receiving these messages, just do `{}unsubscribe {}` in the same guild in which you subscribed originally.".format(
-                            self.config.prefix, sub["code"]
-                        ),
-                    )
-                except discord.errors.ClientException:
-                    status += member + " blocked PMs\n"
-                else:
-                    status += mem.name + " PMed\n"
-                    count += 1
-            if len(status) > 1900:
-                await self.client.send_message(None, source_channel, status + "```")
-                await sleep(0.5)
-                status = "```\n"
-        if len(status) > 0:
-            await self.client.send_message(None, source_channel, status + "```")
-        return (
-            str(count) + " out of " + str(total) + " subscribed members were notified. "
-        )
 
-    # TODO: Convert to Mongo
-    def get_event_subscription(self, post):
+        return await FanOut(
+            self.client,
+            sub,
+            target_message.guild,
+            source_channel,
+            concurrency=self.config.doc.get("notifyConcurrency", 8),
+        ).run()
 
-        print(post)
-        postdata = post.lower().split(" ")
+    def get_event_subscription(self, post):
+        index = self.client.subscriptions
+        if not index.loaded and self.db.useDB:
+            # The background refresh has not run yet.
+            index.rebuild(self.db.subs.find({}, {"code": 1, "name": 1}))
 
-        subs = list(self.db.subs.find({}))
-        if len(subs) == 0:
+        if not index:
             self.log.f("event", "Subscription list empty. Ignoring...")
             return None, None
-        # print(str(postdata))
-        self.log.f("subs", "Searching for explicit tags")
-        for item in subs:
-            if "[{}]".format(item["code"]) in post:
-                return item["code"], item["name"]
-        for item in subs:
-            # print(item["name"] + item["code"])
-
-            if item["code"].lower() in postdata:
-                return item["code"], item["name"]
-            for word in item["name"].split(" "):
-                # print(word)
-
-                if word.lower() in [
-                    "and",
-                    "of",
-                    "the",
-                    "or",
-                    "with",
-                    "to",
-                    "from",
-                    "by",
-                    "on",
-                    "or",
-                ]:
-                    continue
-
-                if word.lower() in postdata:
-                    return item["code"], item["name"]
-
-        self.log.f("event", "could not find subscription key in your announcement")
-        return None, None
+
+        found = index.search(post)
+        if not found:
+            self.log.f("event", "could not find subscription key in your announcement")
+            return None, None
+
+        self.log.f(
+            "subs",
+            "Candidates: "
+            + ", ".join(f"{c.code} ({c.rank}, {c.fraction:.2f})" for c in found[:5]),
+        )
+        return found[0].code, found[0].name
 
     def generate_post_process_URI(self, mod, reason, message, target, targetId):
         if self.config.get("modURI") is None:
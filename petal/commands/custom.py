@@ -6,10 +6,13 @@ from string import Template
 
 import discord
 
+from petal.checks import all_checks, Messages
 from petal.commands import core
 
 
-same_author = lambda m0: lambda m1: m0.author == m1.author and m0.channel == m1.channel
+same_author = lambda m0: all_checks(
+    Messages.by_user(m0.author), Messages.in_channel(m0.channel)
+)
 
 
 class CommandsCustom(core.Commands):
@@ -26,6 +29,17 @@ class CommandsCustom(core.Commands):
         cmd_dict = self.config.commands.get(kword, None)
         if not cmd_dict:
             return None, None
+        return self.build_command(kword, cmd_dict), None
+
+    def get_commands(self) -> dict:
+        found = super().get_commands()
+        for kword, cmd_dict in self.config.commands.items():
+            if kword not in found and cmd_dict:
+                found[kword] = (self.build_command(kword, cmd_dict), None)
+        return found
+
+    def build_command(self, kword: str, cmd_dict: dict):
+        """Build a method returning the configured response to this keyword."""
         response = cmd_dict["com"]
 
         # Build the function to return the response. Note that "self" exists already.
@@ -70,7 +84,7 @@ class CommandsCustom(core.Commands):
         )
         cmd_custom.__name__ = "cmd_" + kword.lower()
 
-        return cmd_custom, None
+        return cmd_custom
 
     async def cmd_new(
         self,
@@ -124,6 +138,7 @@ class CommandsCustom(core.Commands):
                 "nsfw": _nsfw,
             }
             self.config.save()
+            self.router.reindex(invoker)
             return True
 
         if invoker in self.config.commands:
@@ -4,10 +4,15 @@ Access: Config Whitelist
 
 from petal.checks import all_checks, Messages
 from petal.commands import core
-from petal.exceptions import CommandArgsError, CommandInputError
+from petal.exceptions import (
+    CommandArgsError,
+    CommandInputError,
+    CommandOperationError,
+)
 from petal.menu import Menu
-from petal.util import fmt, questions
+from petal.util import cdn, fmt, questions
 from petal.util.grammar import pluralize, sequence_words
+from petal.util.http import http
 
 
 class CommandsMaintenance(core.Commands):
@@ -33,6 +38,80 @@ class CommandsMaintenance(core.Commands):
         self.config.load()
         return "Loaded config file."
 
+    async def cmd_dbstats(self, **_):
+        """Display hit and miss counts of the Member document cache."""
+        stats = self.db.cache.stats()
+        return (
+            f"Member cache: `{stats['size']}`/`{stats['maxsize']}` entries,"
+            f" TTL `{stats['ttl']}s`"
+            f"\nHits: `{stats['hits']}`, Misses: `{stats['misses']}`"
+            f" ({stats['ratio']:.1%} hit rate)"
+        )
+
+    async def cmd_http(self, **_):
+        """Display outbound HTTP statistics per host, and the state of the CDN mirror."""
+        stats = http.stats()
+        if not stats:
+            yield "No HTTP requests have been made yet."
+            return
+
+        for host, s in stats.items():
+            yield (
+                f"`{host}`: `{s['requests']}` requests,"
+                f" `{s['mean_ms']:.0f}ms` mean, `{s['last_ms']:.0f}ms` last;"
+                f" `{s['retries']}` retries, `{s['failures']}` failures"
+            )
+        yield (
+            f"Response cache: `{len(http.cache)}` entries"
+            f" ({http.cache.ratio:.1%} hit rate)"
+        )
+        m = cdn.mirror().stats()
+        yield (
+            f"CDN mirror: `{m['indexed']}` indexed, `{m['queued']}` queued;"
+            f" `{m['mirrored']}` mirrored, `{m['failed']}` failed,"
+            f" `{m['dropped']}` dropped"
+        )
+
+    async def cmd_outbox(self, **_):
+        """Display queue depth, throughput and wait times of outbound Messages, per Channel."""
+        stats = self.client.outbox.stats()
+        if not stats:
+            yield "No Messages have been queued yet."
+            return
+
+        for s in sorted(stats.values(), key=lambda s: -s["queued"]):
+            yield (
+                f"`{s['name']}`: `{s['queued']}` queued (peak `{s['peak']}`),"
+                f" `{s['sent']}` sent, `{s['mean_wait_ms']:.0f}ms` mean wait,"
+                f" `{s['max_wait_ms']:.0f}ms` max; `{s['limited']}` rate limited,"
+                f" `{s['dropped']}` dropped"
+            )
+
+    async def cmd_indexes(self, _create: bool = False, **_):
+        """Report database indexes which are missing or unused.
+
+        An index is reported as unused if it has not served any operation since the database server last started.
+
+        Syntax: `{p}indexes [OPTIONS]`
+
+        Options:
+        `--create` :: Run the startup migration and create any missing indexes before reporting.
+        """
+        if not self.adb.useDB:
+            raise CommandOperationError("Database is not configured.")
+
+        if _create:
+            failed = await self.adb.prepare()
+            if failed:
+                yield "Could not create: " + ", ".join(map(fmt.mono, failed))
+
+        for coll, found in (await self.adb.index_report()).items():
+            yield "{}: missing {}; unused {}".format(
+                fmt.bold(coll),
+                ", ".join(map(fmt.mono, found["missing"])) or "none",
+                ", ".join(map(fmt.mono, found["unused"])) or "none",
+            )
+
     async def cmd_calias(self, args, **_):
         """Manipulate command aliases.
 
@@ -151,6 +230,7 @@ class CommandsMaintenance(core.Commands):
                     yield f"`{p + alias}` is not a valid alias."
 
         self.config.save()
+        self.router.reindex()
 
     async def cmd_blacklist(self, args, src, **_):
         """Prevent user of given ID(s) from using Petal.
@@ -36,7 +36,7 @@ class CommandsMgr(core.Commands):
             else:
                 msg = args[0]
 
-            response = self.db.submit_motd(src.author.id, msg)
+            response = await self.adb.submit_motd(src.author.id, msg)
             if response is None:
                 raise CommandOperationError(
                     "Unable to add to database, ask your bot owner as to why."
@@ -63,7 +63,7 @@ class CommandsMgr(core.Commands):
                 raise CommandInputError("Every entry must be an integer.")
 
             for targ in args:
-                result = self.db.update_motd(int(targ), approve=True)
+                result = await self.adb.update_motd(int(targ), approve=True)
                 if result is None:
                     raise CommandOperationError(
                         f"No entries exist with id number: {targ}"
@@ -84,7 +84,7 @@ class CommandsMgr(core.Commands):
                 raise CommandInputError("Every entry must be an integer.")
 
             for targ in args:
-                result = self.db.update_motd(int(targ), approve=False)
+                result = await self.adb.update_motd(int(targ), approve=False)
                 if result is None:
                     raise CommandOperationError(
                         f"No entries exist with id number: {targ}"
@@ -97,7 +97,9 @@ class CommandsMgr(core.Commands):
                 ).add_field(name="Submitted by", value=f"<@{result['author']}>")
 
         elif subcom == "count":
-            count = self.db.motd.count({"approved": True, "used": False})
+            count = await self.adb.motd.count_documents(
+                {"approved": True, "used": False}
+            )
             yield f"Question queue currently contains `{count}` entries."
 
         else:
@@ -50,6 +50,13 @@ class CommandsMinecraft(core.Commands):
                 return func, (submod or mod)
         return None, None
 
+    def get_commands(self) -> dict:
+        found = {}
+        for mod in self.engines:
+            for kword, (func, submod) in mod.get_commands().items():
+                found.setdefault(kword, (func, submod or mod))
+        return found
+
     def get_all(self) -> list:
         full = []
         for mod in self.engines:
@@ -33,7 +33,7 @@ class CommandsMCMod(auth.CommandsMCAuth):
 
         send = defaultdict(list)
 
-        with self.minecraft.db():
+        with self.minecraft.db(readonly=True):
             # Open the DB File. We do not use it directly, so it does not need
             #   to be assigned a Name; This is just to avoid excessive reads.
             for ident in args:
@@ -97,7 +97,7 @@ class CommandsMCMod(auth.CommandsMCAuth):
         show = []
 
         with self.minecraft.db(
-            *(p for p in args if p != "pending" and p != "suspended")
+            *(p for p in args if p != "pending" and p != "suspended"), readonly=True
         ) as db:
             if "pending" in submission:
                 limit = True
@@ -167,7 +167,7 @@ class CommandsMCMod(auth.CommandsMCAuth):
         Syntax: `{p}wlgone`
         """
 
-        with self.minecraft.db() as db:
+        with self.minecraft.db(readonly=True) as db:
             gone_users = [
                 (str(entry["discord"]), entry["name"])
                 for entry in db
@@ -3,10 +3,9 @@ Access: Server Operators"""
 
 from typing import List
 
-from requests import HTTPError
-
 from petal.commands.minecraft import auth
 from petal.exceptions import CommandInputError, CommandOperationError
+from petal.util.http import HTTPError
 from petal.util.minecraft import new_entry, type_entry_db
 
 
@@ -39,7 +38,7 @@ class CommandsMCPublic(auth.CommandsMCAuth):
                     alts.append(entry)
             else:
                 try:
-                    entry_new = new_entry(src.author.id, name_mc=submission)
+                    entry_new = await new_entry(src.author.id, name_mc=submission)
                 except (HTTPError, RuntimeError) as e:
                     raise CommandOperationError(
                         "This does not seem to be a valid Minecraft username."
@@ -10,6 +10,7 @@ from typing import Sequence
 import discord
 
 from petal import checks
+from petal.archive import ArchivedMessage
 from petal.commands import core, shared
 from petal.etc import flat_embed, lambdall, mash, timestr
 from petal.exceptions import (
@@ -22,6 +23,7 @@ from petal.menu import confirm_action, Menu
 from petal.types import Src
 from petal.util.embeds import Color, membership_card
 from petal.util.fmt import bold, escape, mask, mono, underline, userline
+from petal.util.grammar import pluralize
 
 
 class CommandsMod(core.Commands):
@@ -344,12 +346,10 @@ class CommandsMod(core.Commands):
             try:
                 msg2 = await self.client.wait_for(
                     "message",
-                    check=(
-                        lambda x: checks.all_checks(
-                            checks.Messages.by_user(src.author),
-                            checks.Messages.in_channel(src.channel),
-                        )(x)
-                        and x.content.isdigit()
+                    check=checks.all_checks(
+                        checks.Messages.by_user(src.author),
+                        checks.Messages.in_channel(src.channel),
+                        lambda x: x.content.isdigit(),
                     ),
                     timeout=30,
                 )
@@ -373,6 +373,8 @@ class CommandsMod(core.Commands):
         except discord.errors.Forbidden:
             return "It seems I don't have perms to ban this user"
         else:
+            self.client.schedule_unban(str(userToBan.id), int(timex))
+
             logEmbed = discord.Embed(
                 title="User Ban", description=_reason, colour=Color.user_part
             )
@@ -696,7 +698,15 @@ class CommandsMod(core.Commands):
             try:
                 message: discord.Message = await channel.fetch_message(id_m)
             except discord.NotFound:
-                yield f"Cannot find Message with id `{id_m}` in channel `{id_c}`."
+                archived = (
+                    self.client.archive
+                    and str(id_m).isdigit()
+                    and await self.client.archive.get(int(id_m))
+                )
+                if archived:
+                    yield self.quote_archived(archived, channel)
+                else:
+                    yield f"Cannot find Message with id `{id_m}` in channel `{id_c}`."
                 continue
 
             member: discord.Member = message.author
@@ -815,6 +825,113 @@ class CommandsMod(core.Commands):
 
             yield e
 
+    @staticmethod
+    def quote_archived(
+        message: ArchivedMessage, channel: discord.TextChannel
+    ) -> discord.Embed:
+        """Quote a Message which Discord no longer has, from the Archive."""
+        ct = escape(message.content)
+        if len(ct) > 1000:
+            ct = ct[:997] + "..."
+
+        e = (
+            discord.Embed(
+                colour=Color.message_delete,
+                description=ct or "(no text)",
+                timestamp=message.created_at,
+                title="Archived Message __{}__ by {} ({} char)".format(
+                    mash(message.author, channel.id, message.id),
+                    message.author_name,
+                    len(message.content),
+                ),
+            )
+            .set_author(icon_url=channel.guild.icon_url, name="#" + channel.name)
+            .set_footer(text=f"{message.author_name} / {message.author}")
+        )
+        if message.attachments:
+            e.add_field(
+                name="Attached Files",
+                value=f"{message.attachments} (not archived)",
+                inline=False,
+            )
+        e.add_field(name="Author", value=f"<@{message.author}>").add_field(
+            name="Location", value=channel.mention
+        )
+
+        e.add_field(name="Time of Creation", value=timestr(message.created_at))
+        if message.edited:
+            e.add_field(
+                name="Time of Last Edit",
+                value=timestr(dt.utcfromtimestamp(message.edited)),
+            )
+        if message.deleted:
+            e.add_field(
+                name="Time of Deletion",
+                value=timestr(dt.utcfromtimestamp(message.deleted)),
+            )
+        return e
+
+    async def cmd_search(
+        self,
+        args,
+        src: Src,
+        _user: int = None,
+        _u: int = None,
+        _channel: int = None,
+        _c: int = None,
+        _limit: int = 10,
+        _l: int = None,
+        **_,
+    ):
+        """Search the Message Archive of this Guild for some words.
+
+        Every word must appear in a Message for it to be found, in any order.
+            Deleted Messages are found as well. The Message Archive must be
+            enabled in the Config.
+
+        Syntax: `{p}search [OPTIONS] <words>...`
+
+        Options:
+        `--user <int>`, `-u <int>` :: Only find Messages by the User with this ID.
+        `--channel <int>`, `-c <int>` :: Only find Messages in the Channel with this ID.
+        `--limit <int>`, `-l <int>` :: Show at most this many results. Default 10, maximum 25.
+        """
+        if not self.client.archive:
+            raise CommandOperationError("The Message Archive is not enabled.")
+        if src.guild is None:
+            # Searching every Guild from a DM could show Messages from Guilds
+            #   that the Moderator has nothing to do with.
+            raise CommandOperationError("The Archive can only be searched in a Guild.")
+        if not args:
+            raise CommandArgsError("Must provide at least one word to search for.")
+
+        found = await self.client.archive.search(
+            " ".join(args),
+            guild=src.guild.id,
+            channel=_channel or _c,
+            author=_user or _u,
+            limit=max(1, min(_l or _limit, 25)),
+        )
+        if not found:
+            return "No archived Messages were found."
+
+        n = len(found)
+        em = discord.Embed(
+            title=f"Archive Search: {n} {pluralize(n, 'Result')}", colour=Color.info
+        )
+        for m in found:
+            ct = escape(m.content)
+            if len(ct) > 200:
+                ct = ct[:197] + "..."
+            em.add_field(
+                name=f"{m.author_name} at {timestr(m.created_at)}"
+                + (" (deleted)" if m.deleted else ""),
+                value=f"{ct or '(no text)'}"
+                f"\n<#{m.channel}> {mask(m.jump_url, 'Jump to Message')}",
+                inline=False,
+            )
+        return em
+
     cmd_send = shared.factory_send(
         {
             "mods": {"colour": 0xE67E22, "title": "Moderation Message"},
@@ -8,8 +8,6 @@ from random import choice, randint
 from subprocess import PIPE, run
 
 import discord
-import requests
-import requests_cache
 from requests.utils import requote_uri
 
 from bs4 import BeautifulSoup
@@ -25,9 +23,9 @@ from petal.grasslands import Pidgeon, Define
 from petal.types import Args, Src
 from petal.util import dice
 from petal.util.embeds import Color, membership_card
+from petal.util.http import http
 
 link = re.compile(r"\b\w{1,8}://\S+\.\w+\b")
-requests_cache.install_cache("lazy_money_cache", expire_after=1800)
 
 
 class CommandsPublic(core.Commands):
@@ -62,7 +60,7 @@ class CommandsPublic(core.Commands):
                 "key": self.config.get("trello/app_key"),
                 "token": self.config.get("trello/token"),
             }
-            response = requests.get(url, params=params)
+            response = await http.get(url, params=params, cache=0)
 
         except KeyError:
             raise CommandOperationError(
@@ -108,7 +106,7 @@ class CommandsPublic(core.Commands):
             }
         )
 
-        response = requests.post("https://api.trello.com/1/cards", params=params)
+        response = await http.post("https://api.trello.com/1/cards", params=params)
 
         if not response:
             raise CommandOperationError(
@@ -160,7 +158,7 @@ class CommandsPublic(core.Commands):
                 # Otherwise, try their Discord username
                 username = src.author.name
 
-            user = self.router.osu.get_user(username)
+            user = await self.router.osu.get_user(username)
 
             if user is None:
                 raise CommandOperationError(
@@ -168,7 +166,7 @@ class CommandsPublic(core.Commands):
                     " under your Discord username."
                 )
         else:
-            user = self.router.osu.get_user(args[0])
+            user = await self.router.osu.get_user(args[0])
             if user is None:
                 raise CommandInputError(f"No user found with Osu name: {args[0]}")
 
@@ -378,7 +376,7 @@ class CommandsPublic(core.Commands):
             else:
                 msg = args[0]
 
-            response = self.db.submit_motd(src.author.id, msg)
+            response = await self.adb.submit_motd(src.author.id, msg)
             if response is None:
                 raise CommandOperationError(
                     "Unable to add to database, ask your bot owner as to why."
@@ -411,7 +409,7 @@ class CommandsPublic(core.Commands):
         query = " ".join(args)
         self.log.f("wiki", "Query string: " + query)
 
-        response = Pidgeon(query).get_summary()
+        response = await Pidgeon(query).get_summary()
         title = response[1]["title"]
         url = "https://en.wikipedia.org/wiki/" + title
         if response[0] == 0:
@@ -506,9 +504,9 @@ class CommandsPublic(core.Commands):
 
         try:
             indexresp = json.loads(
-                requests.get("https://xkcd.com/info.0.json").content.decode()
+                (await http.get("https://xkcd.com/info.0.json")).content.decode()
             )
-        except requests.exceptions.ConnectionError as e:
+        except ConnectionError as e:
             raise CommandOperationError(
                 "XKCD did not return a valid response. It may be down."
             ) from e
@@ -542,14 +540,14 @@ class CommandsPublic(core.Commands):
         try:
             if target_number != 0:
                 resp = json.loads(
-                    requests.get(
-                        f"https://xkcd.com/{target_number}/info.0.json"
+                    (
+                        await http.get(f"https://xkcd.com/{target_number}/info.0.json")
                     ).content.decode()
                 )
             else:
                 resp = indexresp
 
-        except requests.exceptions.ConnectionError as e:
+        except ConnectionError as e:
             raise CommandOperationError(
                 "XKCD did not return a valid response. It may be down."
             ) from e
@@ -667,7 +665,7 @@ class CommandsPublic(core.Commands):
             return "Imgur Support is disabled by administrator"
 
         try:
-            ob = self.router.i.get_subreddit(sr)
+            ob = await self.router.i.get_subreddit(sr)
             if ob is None:
                 return "Sorry, I couldn't find any images in subreddit: `" + sr + "`"
 
@@ -771,13 +769,15 @@ class CommandsPublic(core.Commands):
         `{p}void <link or text message>` - Drop an item into the Void to be randomly retrieved later.
         """
         if not args:
-            response = self.client.db.get_void()
+            response = await self.adb.get_void()
+            if response is None:
+                return "Nothing in void storage"
             author = response["author"]
             num = response["number"]
             response = response["content"]
 
             if "@everyone" in response or "@here" in response:
-                self.client.db.delete_void()
+                await self.adb.delete_void(num)
                 return (
                     f"{author} tried to sneak a mass tag into the void."
                     f"\n\nI have deleted it."
@@ -795,12 +795,14 @@ class CommandsPublic(core.Commands):
             if "@everyone" in msg or "@here" in msg:
                 raise CommandAuthError("Mass tags are not permitted into the Void.")
             else:
-                count = self.client.db.save_void(
+                count = await self.adb.save_void(
                     msg, src.author.name, str(src.author.id)
                 )
 
                 if count is not None:
                     return f"Added item number {count} to the void"
+                else:
+                    return "That is already in the void"
 
     async def cmd_spookyclock(self, **_):
         """Be careful, Skeletons are closer than you think..."""
@@ -841,7 +843,7 @@ class CommandsPublic(core.Commands):
     async def cmd_trees(self, **_):
         """how many trees has the internet planted?"""
         ua = {"User-Agent": "Petal/python3.7 DiscordBot"}
-        raw = requests.get("https://teamtrees.org", headers=ua).text
+        raw = (await http.get("https://teamtrees.org", headers=ua)).text
         bs = BeautifulSoup(raw, features="html.parser")
         tag = bs.find("h2", {"id": "totalTrees"})
         return (
@@ -1068,8 +1070,9 @@ class CommandsPublic(core.Commands):
         gamer_cur = ["OSRS", "WOW", "BELL"]
 
         if isym == "WOW" or osym == "WOW":
-            r = requests.get(
-                f"https://api-pn.playerauctions.com/markettracker/api/WoW/CurrencyOrder"
+            r = await http.get(
+                f"https://api-pn.playerauctions.com/markettracker/api/WoW/CurrencyOrder",
+                cache=1800,
             )
             if r.status_code != 200:
                 raise CommandOperationError("World of Warcraft conversion api did not return a valid result. Please try again later")
@@ -1099,8 +1102,9 @@ class CommandsPublic(core.Commands):
             return em
 
         if isym == "OSRS" or osym == "OSRS":
-            r = requests.get(
-                f"https://api-pn.playerauctions.com/markettracker/api/OSRS/CurrencyOrder"
+            r = await http.get(
+                f"https://api-pn.playerauctions.com/markettracker/api/OSRS/CurrencyOrder",
+                cache=1800,
             )
             if r.from_cache:
                 self.log.f("Money", "Using cached response for playerauctions.com")
@@ -1134,8 +1138,9 @@ class CommandsPublic(core.Commands):
             return em
 
         if isym == "BELL" or osym == "BELL":
-            r = requests.get(
-                f"https://api-pn.playerauctions.com/markettracker/api/Animal-Crossing-NH/CurrencyOrder"
+            r = await http.get(
+                f"https://api-pn.playerauctions.com/markettracker/api/Animal-Crossing-NH/CurrencyOrder",
+                cache=1800,
             )
             if r.from_cache:
                 self.log.f("Money", "Using cached response for playerauctions.com")
@@ -1177,8 +1182,9 @@ class CommandsPublic(core.Commands):
                 osym = "USD"
 
             if isym in crypto_cur:
-                r = requests.get(
-                    f"https://min-api.cryptocompare.com/data/price?fsym={osym}&tsyms=BTC,DOGE,ETH,ETC,RPL,IOTA,XRP,NEO,LTC,IOTA"
+                r = await http.get(
+                    f"https://min-api.cryptocompare.com/data/price?fsym={osym}&tsyms=BTC,DOGE,ETH,ETC,RPL,IOTA,XRP,NEO,LTC,IOTA",
+                    cache=1800,
                 )
                 if r.from_cache:
                     self.log.f("Money", "Using cached response for cryptocompare.com")
@@ -1187,8 +1193,9 @@ class CommandsPublic(core.Commands):
                 rate = 1 / r.json()[isym]
 
             if osym in crypto_cur:
-                r = requests.get(
-                    f"https://min-api.cryptocompare.com/data/price?fsym={isym} \&tsyms=BTC,DOGE,ETH,ETC,RPL,IOTA,XRP,NEO,LTC,IOTA"
+                r = await http.get(
+                    f"https://min-api.cryptocompare.com/data/price?fsym={isym} \&tsyms=BTC,DOGE,ETH,ETC,RPL,IOTA,XRP,NEO,LTC,IOTA",
+                    cache=1800,
                 )
                 if r.from_cache:
                     self.log.f("Money", "Using cached response for cryptocompare.com")
@@ -1207,7 +1214,9 @@ class CommandsPublic(core.Commands):
             )
             return em
 
-        r = requests.get(f"https://api.exchangeratesapi.io/latest?base={isym}")
+        r = await http.get(
+            f"https://api.exchangeratesapi.io/latest?base={isym}", cache=1800
+        )
 
         if r.from_cache:
             self.log.f("Money", "Using cached response for exchangeratesapi.io")
@@ -2,7 +2,6 @@
 Access: Role-based"""
 
 import asyncio
-import requests
 
 import discord
 import facebook
@@ -11,6 +10,7 @@ from praw.exceptions import APIException
 
 from petal.commands import core
 from petal.menu import Menu
+from petal.util.http import http
 from petal.util.grammar import sequence_words
 
 
@@ -296,9 +296,9 @@ class CommandsSocial(core.Commands):
             headers = {
                 "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_11_5) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/50.0.2661.102 Safari/537.36"
             }
-            res = requests.get("http://aws.random.cat/meow", headers=headers).json()[
-                "file"
-            ]
+            res = (
+                await http.get("http://aws.random.cat/meow", headers=headers, cache=0)
+            ).json()["file"]
             return (
                 "Oh :(. Im sorry to say that you've made a goof. As it turns out, we already retweeted this tweet. I'm sure the author would appreciate it if they knew you tried to retweet their post twice! It's gonna be ok though, we'll get through this. Hmmmm.....hold on, I have an idea.\n\n\nHere: "
                 + res
@@ -685,12 +685,26 @@ class CommandsUtil(core.Commands):
         """Print your Message History.
 
         Useful for Debugging and not much else. Can tell you whether Petal is
-            able to see a certain Message.
+            able to see a certain Message. If the Message Archive is enabled, it
+            is read instead of the Channels themselves.
         """
-        history = member_message_history(src.author, limit=_n)
         now = dt.utcnow()
         s = 0
 
+        if self.client.archive and src.guild:
+            for m in await self.client.archive.history(
+                src.author.id, guild=src.guild.id, limit=min(_n, 31)
+            ):
+                s += 1
+                yield (
+                    f"<#{m.channel}>, `{str(now - m.created_at)[:-7]}` ago"
+                    f"{' (deleted)' if m.deleted else ''}:"
+                    f"{fmt.mono_block(fmt.escape(m.content))}"
+                )
+            yield f"Showing last __{s}__ archived Messages."
+            return
+
+        history = member_message_history(src.author, limit=_n)
         async for m in history:
             if s > 30:
                 break
@@ -1,4 +1,4 @@
-from typing import Union
+from typing import Callable, List, Union
 
 from ruamel import yaml
 
@@ -10,6 +10,7 @@ log = Peacock()
 
 class Config(object):
     def __init__(self):
+        self.listeners: List[Callable[[str], None]] = []
         try:
             with open("config.yml", "r") as fp:
                 self.doc = yaml.load(fp, Loader=yaml.RoundTripLoader)
@@ -128,6 +129,22 @@ class Config(object):
             # config["field"]
             return self.get(key)
 
+    def listen(self, callback: Callable[[str], None]):
+        """Register a Callable to be run after the Config is successfully loaded
+            or saved. It will be passed the name of the event, "load" or "save".
+        """
+        self.listeners.append(callback)
+
+    def notify(self, event: str):
+        for callback in self.listeners:
+            try:
+                callback(event)
+            except Exception as e:
+                log.err(
+                    f"Config listener {getattr(callback, '__qualname__', callback)}"
+                    f" FAILED on {event}: {type(e).__name__}: {e}"
+                )
+
     def save(self, vb=False):
         if vb:
             log.info("Saving...")
@@ -148,6 +165,7 @@ class Config(object):
         else:
             if vb:
                 log.info("Save complete")
+            self.notify("save")
         return
 
     def load(self, vb=False):
@@ -164,6 +182,11 @@ class Config(object):
                 + str(e)
             )
         else:
+            # These are held as attributes, so they must be refreshed too, or
+            #   they would still refer into the old document.
+            self.aliases = self.doc["aliases"]
+            self.commands = self.doc["commands"]
+            self.notify("load")
             return self
 
 
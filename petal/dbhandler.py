@@ -1,11 +1,18 @@
 # 2017 John Shell
-from datetime import datetime, timezone
-from random import randint as rand
+import asyncio
+from contextlib import asynccontextmanager, contextmanager
+from copy import deepcopy
+from datetime import datetime, timedelta, timezone
+from hashlib import sha256
+from time import sleep
+from typing import Dict
 
 import discord
 import pytz
 
+from . import dbindex
 from .grasslands import Peacock
+from .util.cache import TTLCache
 
 log = Peacock()
 
@@ -41,6 +48,339 @@ def ts(dt):
         return dt
 
 
+def member_defaults(member) -> dict:
+    """
+    Build the initial document for a member who is not yet in the database
+    :param member: discord.Member or discord.User
+    :return: dict member
+    """
+    data = {
+        "name": member.name,
+        "uid": m2id(member),
+        "discord_date": ts(member.created_at),
+        "local_date": ts(datetime.utcnow()),
+        "aliases": [],
+        "discriminator": member.discriminator,
+        "isBot": member.bot,
+        "avatar_url": str(member.avatar_url),
+        "location": "Brisbane, Australia",
+        "osu": "",
+        "banned": False,
+        "subreddit": "aww",
+        "message_count": 0,
+        "last_active": ts(datetime.utcnow()),
+        "last_message": 0,
+        "last_message_channel": "0",
+        "strikes": [],
+        "subscriptions": [],
+        "commands_count": 0,
+    }
+
+    try:
+        data["guilds"] = [member.guild.id]
+    except AttributeError:
+        log.f(
+            "dbhandler",
+            f"{member.name} is a User type object, cannot add server attribute",
+        )
+
+    if isinstance(member, discord.Member):
+        data["server_date"] = ts(member.joined_at)
+        data["joins"] = [ts(member.joined_at)]
+    if member.display_name != member.name:
+        data["aliases"].append(member.display_name)
+
+    return data
+
+
+# Fields of the member document which hold lists. Values given for these to
+#   update_member are added to the list as a set, rather than replacing it.
+LIST_FIELDS = frozenset(("aliases", "guilds", "joins", "strikes", "subscriptions"))
+
+
+def void_digest(content: str) -> str:
+    """
+    Hash Void content, so that duplicates can be refused by a unique index
+    :param content: str content of a Void entry
+    :return: str hex digest
+    """
+    return sha256(content.encode("utf-8")).hexdigest()
+
+
+# How long the Void counter may stay locked before another writer assumes that
+#   its holder has died, and how often a waiting writer tries again.
+VOID_LOCK_TTL = timedelta(seconds=30)
+VOID_LOCK_POLL = 0.05
+
+
+def void_lock_filter():
+    """
+    Match the Void counter only if it is free to be locked
+    :return: dict filter
+    """
+    return {
+        "_id": "void",
+        "$or": [
+            {"lock": {"$exists": False}},
+            {"locked": {"$lt": datetime.utcnow() - VOID_LOCK_TTL}},
+        ],
+    }
+
+
+def duplicate_key(error, field: str) -> bool:
+    """
+    Check whether a DuplicateKeyError was raised by the unique index on a field
+    :param error: pymongo.errors.DuplicateKeyError
+    :param field: str name of the indexed field
+    :return: bool
+    """
+    details = error.details or {}
+    if "keyPattern" in details:
+        return field in details["keyPattern"]
+    # Servers before 4.2 only name the index in the message.
+    return f"index: {field}_" in str(error)
+
+
+def on_insert(member, update: dict) -> dict:
+    """
+    Build the $setOnInsert clause which creates a member document in full when
+    an update is upserted, leaving out every field the update already writes
+    :param member: discord.Member or discord.User
+    :param update: dict of update operators
+    :return: dict of default fields
+    """
+    touched = {"uid"}
+    for clause in update.values():
+        touched.update(path.split(".", 1)[0] for path in clause)
+
+    return {k: v for k, v in member_defaults(member).items() if k not in touched}
+
+
+def compile_update(data: dict, type: int = 0, subdict: str = "") -> dict:
+    """
+    Translate the merge semantics of update_member into update operators, so
+    that the database can apply them atomically with no preceding read
+    :param data: dictionary containing data to update
+    :param type: 0 = None, 1 = Message, 2 = Command
+    :param subdict: Whether this operation is an update to a subdict of the user
+    :return: dict of update operators
+    """
+    set_ = {}
+    add = {}
+    inc = {}
+
+    if subdict:
+        for key, value in data.items():
+            set_[f"{subdict}.{key}"] = value
+    else:
+        for key, value in data.items():
+            if isinstance(value, dict):
+                set_[key] = {vk: ts(vv) for vk, vv in value.items()}
+            elif key in LIST_FIELDS:
+                add[key] = {"$each": value if isinstance(value, list) else [value]}
+            else:
+                set_[key] = ts(value)
+
+    if type == 1:
+        inc["message_count"] = 1
+    elif type == 2:
+        inc["commands_count"] = 1
+
+    update = {}
+    if set_:
+        update["$set"] = set_
+    if add:
+        update["$addToSet"] = add
+    if inc:
+        update["$inc"] = inc
+    return update
+
+
+def delivery_run(sub: dict, guild_id: int, channel_id: int, session: str) -> dict:
+    """
+    Build the document recording a notification run
+    :param sub: dict subscription document being notified
+    :param guild_id: int ID of the Guild to find subscribers in
+    :param channel_id: int ID of the Channel to report progress in
+    :param session: str ID of the Petal session running it
+    :return: dict run
+    """
+    return {
+        "code": sub["code"],
+        "guild": guild_id,
+        "channel": channel_id,
+        "members": list(sub["members"]),
+        "results": {},
+        "session": session,
+        "started": ts(datetime.utcnow()),
+        "finished": False,
+    }
+
+
+def attribute(mem: dict, uid: str, key: str, verbose: bool = True):
+    """
+    Pick a field out of a full or projected member document
+    :param mem: dict member, or None if the member was not found
+    :param uid: str id of the member, for logging
+    :param key: field to return
+    :param verbose: whether to log missing members and fields
+    :return: a copy of mem[key], which may be shared with the cache, or None if none
+    """
+    if mem is None:
+        if verbose:
+            log.f("DBHandler", f"{uid} not found in db")
+        return None
+
+    if key in mem:
+        return deepcopy(mem[key])
+    else:
+        if verbose:
+            log.f("DBHandler", f"{uid} has no field: {key}")
+        return None
+
+
+def mongo_options(db_conf: dict) -> dict:
+    """
+    Build the connection pool keyword arguments shared by both database clients
+    :param db_conf: the dbconf section of config.yml
+    :return: dict of client keyword arguments
+    """
+    return {
+        "maxPoolSize": db_conf.get("pool_max", 50),
+        "minPoolSize": db_conf.get("pool_min", 2),
+        "maxIdleTimeMS": db_conf.get("pool_idle_ms", 60_000),
+        "serverSelectionTimeoutMS": db_conf.get("timeout_ms", 5_000),
+        "connectTimeoutMS": db_conf.get("timeout_ms", 5_000),
+    }
+
+
+class ActivityBuffer(object):
+    """
+    Accumulate member activity from incoming messages in memory, so that it can
+    be written to the database periodically as a single bulk write, rather than
+    as several round trips for every message.
+    """
+
+    def __init__(self, collection, cache: TTLCache = None):
+        self.collection = collection
+        self.cache = cache
+        self.pending: Dict[str, dict] = {}
+
+    def __len__(self):
+        return len(self.pending)
+
+    def record(self, message):
+        """
+        Note the activity represented by a message
+        :param message: discord.Message sent in a guild
+        """
+        author = message.author
+        uid = m2id(author)
+        entry = self.pending.get(uid)
+
+        if entry is None:
+            entry = self.pending[uid] = {
+                "member": author,
+                "count": 0,
+                "set": {},
+                "aliases": set(),
+                "guilds": set(),
+            }
+
+        when = ts(message.created_at)
+        entry["count"] += 1
+        entry["set"].update(
+            last_active=when,
+            last_message=when,
+            last_message_channel=message.channel.id,
+        )
+        entry["aliases"].add(author.name)
+        entry["guilds"].add(message.guild.id)
+
+    def drain(self) -> Dict[str, dict]:
+        """
+        Empty the buffer. Must be called from the event loop thread.
+        :return: dict of everything accumulated so far, by member ID
+        """
+        pending, self.pending = self.pending, {}
+        return pending
+
+    @staticmethod
+    def operations(entries: Dict[str, dict]) -> list:
+        """
+        Convert drained entries into upsert operations, in the same order
+        :param entries: dict returned by drain()
+        :return: list of pymongo.UpdateOne
+        """
+        from pymongo import UpdateOne
+
+        ops = []
+        for uid, entry in entries.items():
+            update = {
+                "$inc": {"message_count": entry["count"]},
+                "$set": entry["set"],
+                "$addToSet": {
+                    "aliases": {"$each": sorted(entry["aliases"])},
+                    "guilds": {"$each": sorted(entry["guilds"])},
+                },
+            }
+            update["$setOnInsert"] = on_insert(entry["member"], update)
+            ops.append(UpdateOne({"uid": uid}, update, upsert=True))
+
+        return ops
+
+    def restore(self, entries: Dict[str, dict], error: Exception = None):
+        """
+        Put back drained entries which could not be written, merged with any
+        activity recorded since, so that they are retried by the next flush
+        :param entries: dict returned by drain()
+        :param error: the Exception raised by the write. If it reports which
+        operations failed, only those entries are put back.
+        """
+        failed = getattr(error, "details", None)
+        if isinstance(failed, dict) and "writeErrors" in failed:
+            # The rest of an unordered bulk write was applied.
+            items = list(entries.items())
+            entries = dict(items[e["index"]] for e in failed["writeErrors"])
+
+        for uid, old in entries.items():
+            new = self.pending.get(uid)
+            if new is None:
+                self.pending[uid] = old
+            else:
+                new["count"] += old["count"]
+                new["set"] = {**old["set"], **new["set"]}
+                new["aliases"] |= old["aliases"]
+                new["guilds"] |= old["guilds"]
+
+    def written(self, entries: Dict[str, dict]):
+        """
+        Invalidate cached documents once a write has completed, so that no
+        read in the meantime can cache the old document again
+        :param entries: dict returned by drain()
+        """
+        if self.cache is not None:
+            for uid in entries:
+                self.cache.invalidate(uid)
+
+    def flush(self) -> int:
+        """
+        Write everything buffered to the database.
+        :return: int number of members written
+        """
+        entries = self.drain()
+        if not entries:
+            return 0
+        try:
+            self.collection.bulk_write(self.operations(entries), ordered=False)
+        except Exception as e:
+            self.restore(entries, e)
+            raise
+        finally:
+            self.written(entries)
+        return len(entries)
+
+
 class DBHandler(object):
     """
     Handle connections between leaf and the database. If config.yml has
@@ -49,7 +389,7 @@ class DBHandler(object):
 
     """
 
-    def __init__(self, config):
+    def __init__(self, config, client=None):
         if config.get("dbconf") is None:
             log.f(
                 "DBHandler",
@@ -58,19 +398,31 @@ class DBHandler(object):
                 "Certain features will be disabled",
             )
             self.useDB = False
+            self.activity = None
+            self.cache = TTLCache(0)
             return
 
         self.useDB = True
         self.config = config
         db_conf = self.config.get("dbconf")
+        self.cache = TTLCache(
+            db_conf.get("cache_size", 1024), db_conf.get("cache_ttl", 300)
+        )
 
-        from pymongo import MongoClient
-
-        if "remote_uri" in db_conf:
-            client = MongoClient(db_conf["remote_uri"])
+        if client is not None:
+            # Share a connection pool that already exists, such as the one
+            #   underlying an AsyncDBHandler.
+            pass
+        elif "remote_uri" in db_conf:
+            from pymongo import MongoClient
 
+            client = MongoClient(db_conf["remote_uri"], **mongo_options(db_conf))
         else:
-            client = MongoClient("localhost", db_conf["port"])
+            from pymongo import MongoClient
+
+            client = MongoClient(
+                "localhost", db_conf["port"], **mongo_options(db_conf)
+            )
         if "name" not in db_conf:
             self.db = client["petal"]
         else:
@@ -79,10 +431,13 @@ class DBHandler(object):
         self.reminders = self.db["reminders"]
         self.motd = self.db["motd"]
         self.void = self.db["void"]
+        self.counters = self.db["counters"]
         self.ac = self.db["ac"]
         self.subs = self.db["subs"]
+        self.deliveries = self.db["deliveries"]
         self.emoji = self.db["emoji"]
         self.dinos = self.db["dinos"]
+        self.activity = ActivityBuffer(self.members, self.cache)
         log.f("DBHandler", "Database system ready")
 
     def member_exists(self, member):
@@ -109,44 +464,16 @@ class DBHandler(object):
             return False
 
         else:
+            from pymongo.errors import DuplicateKeyError
 
-            data = {
-                "name": member.name,
-                "uid": member.id,
-                "discord_date": ts(member.created_at),
-                "local_date": ts(datetime.utcnow()),
-                "aliases": [],
-                "discriminator": member.discriminator,
-                "isBot": member.bot,
-                "avatar_url": str(member.avatar_url),
-                "location": "Brisbane, Australia",
-                "osu": "",
-                "banned": False,
-                "subreddit": "aww",
-                "message_count": 0,
-                "last_active": ts(datetime.utcnow()),
-                "last_message": 0,
-                "last_message_channel": "0",
-                "strikes": [],
-                "subscriptions": [],
-                "commands_count": 0,
-            }
-
+            data = member_defaults(member)
             try:
-                data["guilds"] = [member.guild.id]
-            except AttributeError:
-                log.f(
-                    "dbhandler",
-                    f"{member.name} is a User type object, cannot add server attribute",
-                )
-
-            if isinstance(member, discord.Member):
-                data["server_date"] = ts(member.joined_at)
-                data["joins"] = [ts(member.joined_at)]
-            if member.display_name != member.name:
-                data["aliases"].append(member.display_name)
-
-            pid = self.members.insert_one(data).inserted_id
+                pid = self.members.insert_one(data).inserted_id
+            except DuplicateKeyError:
+                # Created in the meantime, such as by an activity flush.
+                return False
+            finally:
+                self.cache.invalidate(m2id(member))
             log.f("DBhandler", f"New member added to DB! (_id: {pid})")
             return True
 
@@ -154,14 +481,18 @@ class DBHandler(object):
         """
         Retrieves a Dictionary representation of a member
         :param member: discord.Member or str id of member
-        :return: dict member
+        :return: dict member, a copy which may be changed freely
         """
         if not self.useDB:
             return None
-        r = self.members.find_one({"uid": m2id(member)})
-        if r is not None:
-            return r
-        return None
+        uid = m2id(member)
+        r = self.cache.get(uid)
+        if r is None:
+            r = self.members.find_one({"uid": uid})
+            if r is not None:
+                self.cache.put(uid, r)
+        # The cached document is shared; Callers may change what they get.
+        return deepcopy(r)
 
     def get_attribute(self, member, key, verbose=True):
         """
@@ -173,28 +504,23 @@ class DBHandler(object):
         """
         if not self.useDB:
             return False
-        mem = self.get_member(member)
+        uid = m2id(member)
+        mem = self.cache.get(uid)
         if mem is None:
-            if verbose:
-                log.f("DBHandler", f"{member.name} {m2id(member)} not found in db")
-            return None
-
-        if key in mem:
-            return mem[key]
-        else:
-            if verbose:
-                log.f("DBHandler", f"{m2id(member)} has no field: {key}")
-            return None
+            # Fetch only the one field, along with the _id to show existence.
+            mem = self.members.find_one({"uid": uid}, {key: 1})
+        return attribute(mem, uid, key, verbose)
 
     def update_member(self, member, data=None, type=0, subdict=""):
         """
-        Updates a the database with keys and values provided in the data field
+        Updates a the database with keys and values provided in the data field.
+        The update is applied atomically, creating the member if needed.
 
         :param member: member to update
         :param data: dictionary containing data to update
         :param type: 0 = None, 1 = Message, 2 = Command
         :param subdict: Whether this operation is an update to a subdict of the user
-        :return: str response
+        :return: bool success
         """
         if not self.useDB:
             return False
@@ -203,103 +529,118 @@ class DBHandler(object):
             log.f("DBhandler", "Please provide data first!")
             return False
 
-        self.add_member(member)
+        update = compile_update(data, type, subdict)
+        # Only a real Member or User carries enough to create a new document.
+        upsert = isinstance(member, (discord.Member, discord.User))
+        if upsert:
+            update["$setOnInsert"] = on_insert(member, update)
+        if not update:
+            return True
 
-        # mem: MONGO DOCUMENT (as python dict)
-        mem = self.get_member(member)
-        if mem is None:
+        result = self.members.update_one({"uid": m2id(member)}, update, upsert=upsert)
+        self.cache.invalidate(m2id(member))
+
+        if not upsert and result.matched_count == 0:
             log.f("DBhandler", "Member doesn't exist")
             return False
-
-        # TODO: get member dict first then query over. Update finally
-        count = 0
-
-        if subdict:
-            # This operation is running in Subdict mode; Update the dict provided
-            if not subdict in mem:
-                mem[subdict] = data
-                count += 1
-            else:
-                mem[subdict].update_one(data)
-        else:
-            for key in data:
-                # data:      DICT
-                # key:       STR (probably)
-                # mem[key]:  CURRENT VALUE
-                # data[key]: NEW VALUE
-                if isinstance(data[key], dict):
-                    print(str(key) + "\n" + str(data) + "\n")
-                    mem[key] = data[key]
-                    print(str(mem[key]))
-                    for vk in mem[key]:
-                        mem[key][vk] = ts(mem[key][vk])
-
-                elif key in mem:
-                    if isinstance(mem[key], list):
-                        if isinstance(data[key], list):
-                            for item in data[key]:
-                                # log.f("DBHandler", "Item: " + item)
-                                if item not in mem[key]:
-                                    #  log.f("DBHandler", "ON key: " + key + " added " + item + " to " + str(mem[key]))
-                                    mem[key].append(item)
-                                    count += 1
-                        else:
-                            if data[key] not in mem[key]:
-                                mem[key].append(data[key])
-                                log.f("DBHandler", f"added { data[key]}  to {key}")
-                                count += 1
-
-                    else:
-                        # log.f("DBHandler", "replace key: " + key + " -> "
-                        #  + str(mem[key]) + " with "
-                        #      + str(data[key]))
-                        # log.f("Replaced " + key + ": " + str(mem[key]) + " -> " + str(ts(data[key])))
-                        mem[key] = ts(data[key])
-
-                else:
-                    # log.f("Added " + key)
-                    mem[key] = ts(data[key])
-                    count += 1
-
-        if type == 1:
-            mem["message_count"] += 1
-        elif type == 2:
-            mem["commands_count"] += 1
-
-        if count > 0:
-            log.f("DBHandler", "Added {count} fields to {mem['name']}")
-
-        self.members.replace_one({"uid": m2id(member)}, mem, upsert=False)
-
         return True
 
     def get_void(self):
-        void_size = self.void.count()
-        if void_size == 0:
-            return "Nothing in void storage"
+        """
+        Retrieve one random entry from the Void in a single query
+        :return: dict entry, or None if the Void is empty
+        """
+        for entry in self.void.aggregate([{"$sample": {"size": 1}}]):
+            return entry
+        return None
+
+    @contextmanager
+    def void_lock(self):
+        """
+        Lock the Void counter, so that numbers are never allocated while others
+        are being moved. The yielded counter's "seq" is written back on release
+        :return: dict counter document
+        """
+        from bson import ObjectId
+        from pymongo import ReturnDocument
 
-        response = None
-        while response is None:
-            index = rand(0, void_size - 1)
-            response = self.void.find_one({"number": index})
+        self.counters.update_one(
+            {"_id": "void"}, {"$setOnInsert": {"seq": 0}}, upsert=True
+        )
+        token = ObjectId()
+        while True:
+            counter = self.counters.find_one_and_update(
+                void_lock_filter(),
+                {"$set": {"lock": token, "locked": datetime.utcnow()}},
+                return_document=ReturnDocument.AFTER,
+            )
+            if counter is not None:
+                break
+            sleep(VOID_LOCK_POLL)
 
-        return response
+        try:
+            yield counter
+        finally:
+            self.counters.update_one(
+                {"_id": "void", "lock": token},
+                {"$set": {"seq": counter["seq"]}, "$unset": {"lock": "", "locked": ""}},
+            )
+
+    def void_end(self):
+        """
+        Find the number after the last entry in the Void
+        :return: int
+        """
+        last = self.void.find_one({}, {"number": 1}, sort=[("number", -1)])
+        return 0 if last is None else last["number"] + 1
 
     def save_void(self, content, name, id):
-        if self.void.count({"content": content}) > 0:
-            return None
+        """
+        Add an entry to the Void under the next free number
+        :return: int size of the Void, or None if the content is a duplicate
+        """
+        from pymongo.errors import DuplicateKeyError
 
-        self.void.insert(
-            {"content": content, "number": self.void.count(), "author": name + " " + id}
-        )
-        return self.void.count()
+        entry = {
+            "content": content,
+            "digest": void_digest(content),
+            "author": name + " " + id,
+        }
+        with self.void_lock() as counter:
+            entry["number"] = counter["seq"]
+            try:
+                self.void.insert_one(entry)
+            except DuplicateKeyError as e:
+                if duplicate_key(e, "digest"):
+                    return None
+                # The counter has fallen behind the entries. Catch it up.
+                entry["number"] = self.void_end()
+                self.void.insert_one(entry)
+            counter["seq"] = entry["number"] + 1
+            return counter["seq"]
 
     def delete_void(self, number):
-        return self.void.delete_one({"number": number})
+        """
+        Remove an entry from the Void, then move the last entry into its number
+        so that numbering stays dense
+        """
+        with self.void_lock() as counter:
+            result = self.void.delete_one({"number": number})
+            if result.deleted_count:
+                end = self.void_end()
+                if end > number:
+                    self.void.update_one(
+                        {"number": end - 1}, {"$set": {"number": number}}
+                    )
+                    end -= 1
+                counter["seq"] = end
+        return result
 
-    def get_reminders(self, timestamp):
+    def get_reminders(self, timestamp=None):
+        if timestamp is None:
+            return self.reminders.find()
         timestamp = ts(timestamp)
-        return self.reminders.find({"ts": {"$lr": timestamp}})
+        return self.reminders.find({"ts": {"$lt": timestamp}})
 
     def add_reminder(self, author, content, timestamp):
         timestamp = ts(timestamp)
@@ -307,6 +648,69 @@ class DBHandler(object):
             {"ts": timestamp, "author": author.id, "content": content}
         )
 
+    def delete_reminder(self, _id):
+        return self.reminders.delete_one({"_id": _id})
+
+    def get_tempbans(self):
+        """
+        Find every Member whose ban is due to expire
+        :return: cursor of dicts with "uid" and "banExpires"
+        """
+        return self.members.find(
+            {"tempBanned": True, "banExpires": {"$ne": None}},
+            {"uid": 1, "banExpires": 1},
+        )
+
+    def start_delivery(self, sub, guild_id, channel_id, session):
+        """
+        Record the start of a notification run, so that it can be resumed
+        :param sub: dict subscription document being notified
+        :param guild_id: int ID of the Guild to find subscribers in
+        :param channel_id: int ID of the Channel to report progress in
+        :param session: str ID of the Petal session running it
+        :return: ObjectId of the run
+        """
+        return self.deliveries.insert_one(
+            delivery_run(sub, guild_id, channel_id, session)
+        ).inserted_id
+
+    def record_deliveries(self, run_id, results):
+        """
+        Store the outcome of some deliveries in a run
+        :param run_id: ObjectId of the run
+        :param results: dict mapping member IDs to outcomes
+        """
+        if results:
+            self.deliveries.update_one(
+                {"_id": run_id},
+                {"$set": {f"results.{uid}": res for uid, res in results.items()}},
+            )
+
+    def finish_delivery(self, run_id):
+        self.deliveries.update_one({"_id": run_id}, {"$set": {"finished": True}})
+
+    def get_unfinished_deliveries(self, session):
+        """
+        :param session: str ID of the current Petal session
+        :return: runs left unfinished by any other session
+        """
+        return self.deliveries.find({"finished": False, "session": {"$ne": session}})
+
+    def claim_delivery(self, run, session):
+        """
+        Take over an unfinished run for this session, unless another has first
+        :param run: dict run, as returned by get_unfinished_deliveries
+        :param session: str ID of the current Petal session
+        :return: bool whether the run was claimed
+        """
+        return (
+            self.deliveries.update_one(
+                {"_id": run["_id"], "session": run.get("session")},
+                {"$set": {"session": session}},
+            ).modified_count
+            == 1
+        )
+
     def get_motd_entry(self, update=False):
         response = self.motd.find_one({"used": False, "approved": True})
         if response is None:
@@ -362,3 +766,326 @@ class DBHandler(object):
         # TODO: `img` is a bstring of Base64 data. Write it into the DB under the key `invoker`.
         # Should return `True` if the image was written, or `False` if it was not.
         pass
+
+
+class AsyncDBHandler(object):
+    """
+    Asynchronous counterpart to DBHandler, running on Motor. Every method shares
+    its name and arguments with the DBHandler method it replaces, but must be
+    awaited.
+
+    The blocking DBHandler remains available as the `sync` attribute, sharing
+    this connection pool, so that callers can be migrated one at a time.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        db_conf = config.get("dbconf")
+
+        if db_conf is None:
+            self.useDB = False
+            self.sync = DBHandler(config)
+            self.cache = self.sync.cache
+            return
+
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        if "remote_uri" in db_conf:
+            client = AsyncIOMotorClient(
+                db_conf["remote_uri"], **mongo_options(db_conf)
+            )
+        else:
+            client = AsyncIOMotorClient(
+                "localhost", db_conf["port"], **mongo_options(db_conf)
+            )
+
+        self.useDB = True
+        self.client = client
+        self.sync = DBHandler(config, client=client.delegate)
+        self.cache = self.sync.cache
+
+        self.db = client[db_conf.get("name", "petal")]
+        self.members = self.db["members"]
+        self.reminders = self.db["reminders"]
+        self.motd = self.db["motd"]
+        self.void = self.db["void"]
+        self.counters = self.db["counters"]
+        self.ac = self.db["ac"]
+        self.subs = self.db["subs"]
+        self.deliveries = self.db["deliveries"]
+        self.emoji = self.db["emoji"]
+        self.dinos = self.db["dinos"]
+        log.f("DBHandler", "Async database system ready")
+
+    async def prepare(self):
+        """
+        Migrate old documents and create any missing indexes
+        :return: list of str names of indexes which could not be created
+        """
+        if not self.useDB:
+            return []
+        await dbindex.migrate(self.db)
+        return await dbindex.ensure_indexes(self.db)
+
+    async def index_report(self):
+        if not self.useDB:
+            return {}
+        return await dbindex.index_report(self.db)
+
+    @property
+    def activity(self) -> ActivityBuffer:
+        return self.sync.activity
+
+    async def flush_activity(self) -> int:
+        """
+        Write all buffered member activity in one bulk write
+        :return: int number of members written
+        """
+        if not self.useDB:
+            return 0
+        entries = self.activity.drain()
+        if not entries:
+            return 0
+        try:
+            await self.members.bulk_write(
+                ActivityBuffer.operations(entries), ordered=False
+            )
+        except Exception as e:
+            self.activity.restore(entries, e)
+            raise
+        finally:
+            self.activity.written(entries)
+        return len(entries)
+
+    async def member_exists(self, member):
+        if not self.useDB:
+            return False
+        found = await self.members.find_one({"uid": m2id(member)}, {"_id": 1})
+        return found is not None
+
+    async def add_member(self, member, verbose=False):
+        if not self.useDB:
+            return False
+        if await self.member_exists(member):
+            if verbose:
+                log.f(
+                    "DBhandler",
+                    "Member already exists in database, "
+                    "use update_member to update them",
+                )
+            return False
+        else:
+            from pymongo.errors import DuplicateKeyError
+
+            data = member_defaults(member)
+            try:
+                pid = (await self.members.insert_one(data)).inserted_id
+            except DuplicateKeyError:
+                # Created in the meantime, such as by an activity flush.
+                return False
+            finally:
+                self.cache.invalidate(m2id(member))
+            log.f("DBhandler", f"New member added to DB! (_id: {pid})")
+            return True
+
+    async def get_member(self, member):
+        if not self.useDB:
+            return None
+        uid = m2id(member)
+        r = self.cache.get(uid)
+        if r is None:
+            r = await self.members.find_one({"uid": uid})
+            if r is not None:
+                self.cache.put(uid, r)
+        # The cached document is shared; Callers may change what they get.
+        return deepcopy(r)
+
+    async def get_attribute(self, member, key, verbose=True):
+        if not self.useDB:
+            return False
+        uid = m2id(member)
+        mem = self.cache.get(uid)
+        if mem is None:
+            mem = await self.members.find_one({"uid": uid}, {key: 1})
+        return attribute(mem, uid, key, verbose)
+
+    async def update_member(self, member, data=None, type=0, subdict=""):
+        if not self.useDB:
+            return False
+
+        if data is None:
+            log.f("DBhandler", "Please provide data first!")
+            return False
+
+        update = compile_update(data, type, subdict)
+        upsert = isinstance(member, (discord.Member, discord.User))
+        if upsert:
+            update["$setOnInsert"] = on_insert(member, update)
+        if not update:
+            return True
+
+        result = await self.members.update_one(
+            {"uid": m2id(member)}, update, upsert=upsert
+        )
+        self.cache.invalidate(m2id(member))
+
+        if not upsert and result.matched_count == 0:
+            log.f("DBhandler", "Member doesn't exist")
+            return False
+        return True
+
+    async def get_void(self):
+        async for entry in self.void.aggregate([{"$sample": {"size": 1}}]):
+            return entry
+        return None
+
+    @asynccontextmanager
+    async def void_lock(self):
+        from bson import ObjectId
+        from pymongo import ReturnDocument
+
+        await self.counters.update_one(
+            {"_id": "void"}, {"$setOnInsert": {"seq": 0}}, upsert=True
+        )
+        token = ObjectId()
+        while True:
+            counter = await self.counters.find_one_and_update(
+                void_lock_filter(),
+                {"$set": {"lock": token, "locked": datetime.utcnow()}},
+                return_document=ReturnDocument.AFTER,
+            )
+            if counter is not None:
+                break
+            await asyncio.sleep(VOID_LOCK_POLL)
+
+        try:
+            yield counter
+        finally:
+            await self.counters.update_one(
+                {"_id": "void", "lock": token},
+                {"$set": {"seq": counter["seq"]}, "$unset": {"lock": "", "locked": ""}},
+            )
+
+    async def void_end(self):
+        last = await self.void.find_one({}, {"number": 1}, sort=[("number", -1)])
+        return 0 if last is None else last["number"] + 1
+
+    async def save_void(self, content, name, id):
+        from pymongo.errors import DuplicateKeyError
+
+        entry = {
+            "content": content,
+            "digest": void_digest(content),
+            "author": name + " " + id,
+        }
+        async with self.void_lock() as counter:
+            entry["number"] = counter["seq"]
+            try:
+                await self.void.insert_one(entry)
+            except DuplicateKeyError as e:
+                if duplicate_key(e, "digest"):
+                    return None
+                entry["number"] = await self.void_end()
+                await self.void.insert_one(entry)
+            counter["seq"] = entry["number"] + 1
+            return counter["seq"]
+
+    async def delete_void(self, number):
+        async with self.void_lock() as counter:
+            result = await self.void.delete_one({"number": number})
+            if result.deleted_count:
+                end = await self.void_end()
+                if end > number:
+                    await self.void.update_one(
+                        {"number": end - 1}, {"$set": {"number": number}}
+                    )
+                    end -= 1
+                counter["seq"] = end
+        return result
+
+    async def get_reminders(self, timestamp=None):
+        if timestamp is None:
+            return await self.reminders.find().to_list(None)
+        timestamp = ts(timestamp)
+        return await self.reminders.find({"ts": {"$lt": timestamp}}).to_list(None)
+
+    async def add_reminder(self, author, content, timestamp):
+        timestamp = ts(timestamp)
+        return await self.reminders.insert_one(
+            {"ts": timestamp, "author": author.id, "content": content}
+        )
+
+    async def delete_reminder(self, _id):
+        return await self.reminders.delete_one({"_id": _id})
+
+    async def get_tempbans(self):
+        return await self.members.find(
+            {"tempBanned": True, "banExpires": {"$ne": None}},
+            {"uid": 1, "banExpires": 1},
+        ).to_list(None)
+
+    async def start_delivery(self, sub, guild_id, channel_id, session):
+        return (
+            await self.deliveries.insert_one(
+                delivery_run(sub, guild_id, channel_id, session)
+            )
+        ).inserted_id
+
+    async def record_deliveries(self, run_id, results):
+        if results:
+            await self.deliveries.update_one(
+                {"_id": run_id},
+                {"$set": {f"results.{uid}": res for uid, res in results.items()}},
+            )
+
+    async def finish_delivery(self, run_id):
+        await self.deliveries.update_one({"_id": run_id}, {"$set": {"finished": True}})
+
+    async def get_unfinished_deliveries(self, session):
+        return await self.deliveries.find(
+            {"finished": False, "session": {"$ne": session}}
+        ).to_list(None)
+
+    async def claim_delivery(self, run, session):
+        result = await self.deliveries.update_one(
+            {"_id": run["_id"], "session": run.get("session")},
+            {"$set": {"session": session}},
+        )
+        return result.modified_count == 1
+
+    async def get_motd_entry(self, update=False):
+        if not update:
+            return await self.motd.find_one({"used": False, "approved": True})
+        return await self.motd.find_one_and_update(
+            {"used": False, "approved": True}, {"$set": {"used": True}}
+        )
+
+    async def get_motd_max(self):
+        return await self.motd.find_one(sort=[("num", -1)])
+
+    async def submit_motd(self, author, content):
+        num = await self.get_motd_max()
+
+        if num is None:
+            idx: int = 2000
+        else:
+            idx: int = num["num"] + 1
+
+        entry = {
+            "author": author,
+            "num": idx,
+            "content": content,
+            "approved": False,
+            "used": False,
+        }
+        await self.motd.insert_one(entry)
+        return entry
+
+    async def update_motd(self, num, approve=True):
+        from pymongo import ReturnDocument
+
+        return await self.motd.find_one_and_update(
+            {"num": num},
+            {"$set": {"approved": bool(approve), "used": False}},
+            return_document=ReturnDocument.AFTER,
+        )
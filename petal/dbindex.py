@@ -0,0 +1,242 @@
+"""Index declarations and bootstrapping for the Petal database.
+
+Every query shape that Petal runs regularly should be served by an index listed
+    here. At startup, `ensure_indexes` creates any which are missing, after
+    `migrate` has brought old documents into a shape the indexes can accept.
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+from .grasslands import Peacock
+
+log = Peacock()
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    collection: str
+    keys: Tuple[Tuple[str, int], ...]
+    unique: bool = False
+    options: Dict[str, object] = field(default_factory=dict)
+
+    @property
+    def name(self) -> str:
+        return "_".join(f"{k}_{d}" for k, d in self.keys)
+
+
+ASC = 1
+DESC = -1
+
+INDEXES: List[IndexSpec] = [
+    # {"uid": ...}
+    IndexSpec("members", (("uid", ASC),), unique=True),
+    # {"tempBanned": True}, loaded by the scheduler at startup
+    IndexSpec(
+        "members",
+        (("tempBanned", ASC),),
+        options={"partialFilterExpression": {"tempBanned": True}},
+    ),
+    # {"number": ...}
+    IndexSpec("void", (("number", ASC),), unique=True),
+    # Duplicate content is refused by its digest. MongoDB cannot enforce
+    #   uniqueness on a hashed index, so the SHA-256 is stored instead.
+    IndexSpec(
+        "void",
+        (("digest", ASC),),
+        unique=True,
+        options={"partialFilterExpression": {"digest": {"$exists": True}}},
+    ),
+    # {"used": False, "approved": True}, sorted by "num"
+    IndexSpec("motd", (("approved", ASC), ("used", ASC), ("num", ASC))),
+    # {"num": ...}, and the maximum "num"
+    IndexSpec("motd", (("num", DESC),), unique=True),
+    # {"ts": {"$lt": ...}}
+    IndexSpec("reminders", (("ts", ASC),)),
+    # {"code": ...}
+    IndexSpec("subs", (("code", ASC),), unique=True),
+    # {"finished": False}, loaded to resume notification runs at startup
+    IndexSpec(
+        "deliveries",
+        (("finished", ASC),),
+        options={"partialFilterExpression": {"finished": False}},
+    ),
+]
+
+
+async def migrate(db):
+    """Bring existing documents into line with what the indexes expect."""
+    # Member IDs have always been looked up as strings, but some documents were
+    #   inserted with integer IDs. Those were unreachable, and would collide
+    #   with their string counterparts under a unique index.
+    result = await db["members"].update_many(
+        {"uid": {"$not": {"$type": "string"}}},
+        [{"$set": {"uid": {"$toString": "$uid"}}}],
+    )
+    if result.modified_count:
+        log.f("DBIndex", f"Converted {result.modified_count} member IDs to strings")
+
+    await migrate_members(db)
+    await migrate_void(db)
+
+
+# Fields of member documents which only ever grow, and are summed on merging.
+COUNTERS = ("message_count", "commands_count")
+
+
+def merge_members(docs: List[dict]) -> dict:
+    """Combine several documents of the same member into one. The most recently
+        active document provides the other fields, counters are summed, lists
+        are combined, and fields any one document lacks are filled from the
+        others.
+    """
+    from .dbhandler import LIST_FIELDS
+
+    docs = sorted(docs, key=lambda d: d.get("last_active") or 0, reverse=True)
+    merged = dict(docs[0])
+
+    for doc in docs[1:]:
+        for key, value in doc.items():
+            if key == "_id":
+                continue
+            elif key in COUNTERS:
+                merged[key] = (merged.get(key) or 0) + (value or 0)
+            elif key in LIST_FIELDS and isinstance(value, list):
+                have = merged.get(key) or []
+                merged[key] = have + [v for v in value if v not in have]
+            else:
+                merged.setdefault(key, value)
+
+    return merged
+
+
+async def migrate_members(db):
+    """Merge member documents which share a uid. The baseline could insert a
+        member under both an integer and a string ID, and after converting the
+        IDs to strings, those would keep the unique index from being built.
+    """
+    groups = db["members"].aggregate(
+        [
+            {"$group": {"_id": "$uid", "ids": {"$push": "$_id"}, "n": {"$sum": 1}}},
+            {"$match": {"n": {"$gt": 1}}},
+        ],
+        allowDiskUse=True,
+    )
+
+    merged = 0
+    dropped = 0
+    async for group in groups:
+        docs = await db["members"].find({"_id": {"$in": group["ids"]}}).to_list(None)
+        if len(docs) < 2:
+            continue
+        keep = merge_members(docs)
+        drop = [d["_id"] for d in docs if d["_id"] != keep["_id"]]
+
+        await db["members"].delete_many({"_id": {"$in": drop}})
+        await db["members"].replace_one({"_id": keep["_id"]}, keep)
+        merged += 1
+        dropped += len(drop)
+
+    if merged:
+        log.f("DBIndex", f"Merged {dropped} duplicate documents into {merged} members")
+
+
+async def migrate_void(db):
+    """Give the Void dense numbering, content digests and a counter document.
+
+    Old entries were numbered by the size of the collection at insertion, so
+        deletions left gaps and later insertions reused numbers. This only runs
+        once; after the counter exists, the Void keeps itself dense.
+    """
+    from pymongo import UpdateOne
+
+    from .dbhandler import void_digest
+
+    if await db["counters"].find_one({"_id": "void"}) is not None:
+        return
+
+    seen = set()
+    keep = []
+    drop = []
+    async for entry in db["void"].find({}, {"content": 1, "number": 1}).sort(
+        [("number", ASC), ("_id", ASC)]
+    ):
+        digest = void_digest(str(entry.get("content", "")))
+        if digest in seen:
+            drop.append(entry["_id"])
+        else:
+            seen.add(digest)
+            keep.append((entry["_id"], digest))
+
+    if drop:
+        await db["void"].delete_many({"_id": {"$in": drop}})
+    if keep:
+        # Renumber through negative values first, so that no two entries share
+        #   a number at any point, even under a unique index.
+        await db["void"].bulk_write(
+            [
+                UpdateOne({"_id": _id}, {"$set": {"number": -1 - i}})
+                for i, (_id, _) in enumerate(keep)
+            ]
+        )
+        await db["void"].bulk_write(
+            [
+                UpdateOne({"_id": _id}, {"$set": {"number": i, "digest": digest}})
+                for i, (_id, digest) in enumerate(keep)
+            ]
+        )
+
+    await db["counters"].update_one(
+        {"_id": "void"}, {"$set": {"seq": len(keep)}}, upsert=True
+    )
+    log.f("DBIndex", f"Renumbered {len(keep)} Void entries, dropped {len(drop)}")
+
+
+async def ensure_indexes(db) -> List[str]:
+    """Create every declared index which does not exist yet. Creating an index
+        which already exists is a no-op, so this is safe to run on every start.
+
+    Return a List of the names of any indexes which could not be created.
+    """
+    from pymongo.errors import OperationFailure
+
+    failed: List[str] = []
+    for spec in INDEXES:
+        try:
+            await db[spec.collection].create_index(
+                list(spec.keys), name=spec.name, unique=spec.unique, **spec.options
+            )
+        except OperationFailure as e:
+            log.err(f"Could not create index {spec.collection}.{spec.name}: {e}")
+            failed.append(f"{spec.collection}.{spec.name}")
+
+    if not failed:
+        log.f("DBIndex", f"All {len(INDEXES)} indexes are in place")
+    return failed
+
+
+async def index_report(db) -> Dict[str, Dict[str, List[str]]]:
+    """Compare the declared indexes against those in the database.
+
+    Return a Dict mapping each Collection name to its "missing" declared
+        indexes, and its "unused" existing indexes, which have not served any
+        operations since the database server started.
+    """
+    report: Dict[str, Dict[str, List[str]]] = {}
+
+    for name in sorted({spec.collection for spec in INDEXES}):
+        coll = db[name]
+        existing = await coll.index_information()
+        declared = [spec.name for spec in INDEXES if spec.collection == name]
+
+        unused = []
+        async for stat in coll.aggregate([{"$indexStats": {}}]):
+            if stat["name"] != "_id_" and not stat["accesses"]["ops"]:
+                unused.append(stat["name"])
+
+        report[name] = {
+            "missing": [n for n in declared if n not in existing],
+            "unused": sorted(unused),
+        }
+
+    return report
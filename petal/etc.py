@@ -2,8 +2,17 @@
 
 from datetime import datetime as dt
 from hashlib import sha256
-import shlex
-from typing import Any, Callable, Dict, List, Optional as Opt, Sequence, Tuple
+import re
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    get_type_hints,
+    List,
+    Optional as Opt,
+    Sequence,
+    Tuple,
+)
 
 from discord import Embed, Role
 
@@ -61,6 +70,91 @@ def check_types(opts: Dict[str, kwopt], hints: Dict[str, T1]) -> Dict[str, T1]:
     return output
 
 
+def _convert_bool(_: str) -> bool:
+    return True
+
+
+def _convert_int(val: str) -> int:
+    if val.lstrip("-").isdigit() and val.count("-") <= 1:
+        return int(val)
+    raise ValueError
+
+
+def _convert_float(val: str) -> float:
+    if val.replace(".", "", 1).lstrip("-").isdigit() and val.count("-") <= 1:
+        return float(val)
+    raise ValueError
+
+
+def _convert_str(val: str) -> str:
+    return val
+
+
+def _convert_none(_: str):
+    raise ValueError
+
+
+def converter(want: type) -> Callable[[str], kwopt]:
+    """Select the function which converts an Option value into the wanted type.
+        This follows the same rules as `check_types()`.
+    """
+    if want == bool or want == Opt[bool]:
+        return _convert_bool
+    elif want == int or want == Opt[int]:
+        return _convert_int
+    elif want == float or want == Opt[float]:
+        return _convert_float
+    elif want == str or want == Opt[str]:
+        return _convert_str
+    else:
+        return _convert_none
+
+
+class OptionSchema(object):
+    """The Options accepted by a Command Method, compiled once from its type
+        hints. Holds the Getopt specification and a converter for every Option,
+        so that parsing an invocation does not need to inspect the Method.
+    """
+
+    __slots__ = ("shorts", "longs", "options")
+
+    def __init__(self, func: Callable):
+        self.shorts: str = ""
+        self.longs: List[str] = []
+        # Getopt Option name -> (kwarg name, wanted type, converter)
+        self.options: Dict[str, Tuple[str, type, Callable[[str], kwopt]]] = {}
+
+        for kwarg, want in get_type_hints(func).items():
+            if not kwarg.startswith("_"):
+                continue
+            # "_option_name" -> "option-name"
+            opt_name = kwarg[1:].replace("_", "-")
+            flag = want == bool
+
+            if len(opt_name) == 1:
+                self.shorts += opt_name if flag else opt_name + ":"
+                self.options["-" + opt_name] = (kwarg, want, converter(want))
+            else:
+                self.longs.append(opt_name if flag else opt_name + "=")
+                self.options["--" + opt_name] = (kwarg, want, converter(want))
+
+    def convert(self, opts: List[Tuple[str, str]]) -> Dict[str, kwopt]:
+        """Convert the Options returned by Getopt into keyword arguments."""
+        output = {}
+        # As with a Dict, only the last value given for an Option counts.
+        for opt_name, val in dict(opts).items():
+            kwarg, want, conv = self.options[opt_name]
+            try:
+                output[kwarg] = conv(val)
+            except ValueError:
+                raise TypeError(
+                    "Option `{}` wants {}, got {}, `{}`".format(
+                        opt_name, want, type(val).__name__, repr(val)
+                    )
+                ) from None
+        return output
+
+
 def enforce_quoted_args(args: Sequence[str], wanted: int, text: str = None):
     """We want only a few Arguments, but one of them is likely to contain
         whitespace. If we get too many, it indicates that the user probably
@@ -108,35 +202,107 @@ def mash(*data: Any, digits: int = 4, base: int = 10) -> int:
     return hashval
 
 
+# Characters which separate tokens, and which may open a quoted token. These
+#   match the configuration that `split()` used to give `shlex.shlex`.
+_WHITESPACE = " \t\r\n,"
+_QUOTES = "'\"`"
+_COMMENT = ";"
+
+_skip_space = re.compile(f"[{_WHITESPACE}]*").match
+_read_word = re.compile(f"[^{_WHITESPACE}{_COMMENT}]*").match
+
+
+def _skip_comment(line: str, i: int) -> int:
+    """Return the index of the start of the line after the one containing the
+        comment at index i.
+    """
+    j = line.find("\n", i)
+    return len(line) if j < 0 else j + 1
+
+
+def _original(line: str) -> str:
+    """Find the "original" text of a command line: Everything until the first
+        comment, or the first quoted string if the line opens with one.
+    """
+    i = 0
+    n = len(line)
+    while i < n and line[i] == _COMMENT:
+        i = _skip_comment(line, i)
+    if i >= n:
+        return ""
+
+    if line[i] in _QUOTES:
+        j = line.find(line[i], i + 1)
+        if j < 0:
+            raise ValueError("No closing quotation")
+        return line[i : j + 1]
+
+    pieces = []
+    while i < n:
+        j = line.find(_COMMENT, i)
+        if j < 0:
+            pieces.append(line[i:])
+            break
+        pieces.append(line[i:j])
+        i = _skip_comment(line, j)
+    return "".join(pieces)
+
+
 def split(line: str) -> Tuple[List[str], str]:
-    """Break an input line into a list of tokens, and a "regular" message."""
-    # Split the full command line into a list of tokens, each its own arg.
-    tokens = shlex.shlex(line, posix=False)
-    tokens.quotes += "`"
-    # Split the string only on whitespace.
-    tokens.whitespace_split = True
-    # However, consider a comma to be whitespace so it splits on them too.
-    tokens.whitespace += ","
-    # Consider a semicolon to denote a comment; Everything after a semicolon
-    #   will then be ignored.
-    tokens.commenters = ";"
-
-    # Now, find the original string, but only up until the point of a semicolon.
-    # Therefore, the following message:
-    #   !help -s commands; @person, this is where to see the list
-    # will yield a list:   ["help", "-s", "commands"]
-    # and a string:         "help -s commands"
-    # This will allow commands to consider "the rest of the line" without going
-    #   beyond a semicolon, and without having to reconstruct the line from the
-    #   list of arguments, which may or may not have been separated by spaces.
-    original = shlex.shlex(line, posix=False)
-    original.quotes += "`"
-    original.whitespace_split = True
-    original.whitespace = ""
-    original.commenters = ";"
-
-    # Return a list of all the tokens, and the first part of the "original".
-    return list(tokens), original.read_token()
+    """Break an input line into a list of tokens, and a "regular" message.
+
+    Tokens are separated by whitespace or commas. A token beginning with a quote
+        runs until the matching quote, and keeps its quotes. A semicolon begins
+        a comment, and everything after it on the same line is ignored.
+
+    The "regular" message is the original string, but only up until the point
+        of a semicolon. Therefore, the following message:
+      !help -s commands; @person, this is where to see the list
+    will yield a list:   ["help", "-s", "commands"]
+    and a string:         "help -s commands"
+    This will allow commands to consider "the rest of the line" without going
+        beyond a semicolon, and without having to reconstruct the line from the
+        list of arguments, which may or may not have been separated by spaces.
+
+    This gives exactly the results of the non-POSIX `shlex.shlex` that it
+        replaces, but reads runs of characters with regular expressions rather
+        than one character at a time.
+    """
+    tokens = []
+    i = 0
+    n = len(line)
+
+    while True:
+        i = _skip_space(line, i).end()
+        if i >= n:
+            break
+
+        c = line[i]
+        if c == _COMMENT:
+            i = _skip_comment(line, i)
+
+        elif c in _QUOTES:
+            j = line.find(c, i + 1)
+            if j < 0:
+                raise ValueError("No closing quotation")
+            tokens.append(line[i : j + 1])
+            i = j + 1
+
+        else:
+            # A word continues through quotes, and through comments, which
+            #   only skip the rest of their line.
+            pieces = []
+            while True:
+                m = _read_word(line, i)
+                pieces.append(m.group())
+                i = m.end()
+                if i < n and line[i] == _COMMENT:
+                    i = _skip_comment(line, i)
+                else:
+                    break
+            tokens.append("".join(pieces))
+
+    return tokens, _original(line)
 
 
 def timestr(ts: dt = None) -> str:
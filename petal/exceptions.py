@@ -98,6 +98,14 @@ class WhitelistError(PetalError):
     pass
 
 
+class OutboxFull(PetalError):
+    """Raised by a queued outbound Message which was dropped before it could be
+        sent, because its Channel had too many Messages waiting.
+    """
+
+    pass
+
+
 class TunnelError(PetalError):
     """Superclass for Exceptions regarding Tunnels."""
 
@@ -0,0 +1,191 @@
+"""Concurrent delivery of subscription notifications.
+
+Notifying the subscribers of a game means sending one DM to each of them. A
+    FanOut sends them from a fixed number of workers at once, through the
+    Outbox, so that they are paced by its rate limits rather than sent one by
+    one. Progress is shown in a single Embed which is edited as it goes, and
+    every outcome is stored, so that a run cut short by a restart can pick up
+    where it stopped.
+"""
+
+import asyncio
+from collections import Counter
+from typing import Dict, Iterator, List, Optional
+
+import discord
+
+from .grasslands import Peacock
+from .outbox import Priority
+from .util.embeds import Color
+
+log = Peacock()
+
+SENT = "sent"
+MISSING = "missing"
+BLOCKED = "blocked"
+FAILED = "failed"
+
+LABELS = {
+    SENT: "Notified",
+    MISSING: "Not in the Guild",
+    BLOCKED: "Not accepting DMs",
+    FAILED: "Failed",
+}
+
+
+def notice(sub: dict, prefix: str) -> str:
+    return (
+        f"Hello! Hope your day/evening/night/morning is going well\n\nI was just"
+        f" popping in here to let you know that an event for `{sub['name']}` has"
+        f" been announced.\n\nIf you wish to stop receiving these messages, just"
+        f" do `{prefix}unsubscribe {sub['code']}` in the same guild in which you"
+        f" subscribed originally."
+    )
+
+
+class FanOut(object):
+    def __init__(
+        self,
+        client,
+        sub: dict,
+        guild: discord.Guild,
+        channel: discord.abc.Messageable,
+        *,
+        run_id=None,
+        results: Dict[str, str] = None,
+        concurrency: int = 8,
+        interval: float = 2,
+    ):
+        """
+        :param client: The Petal Client.
+        :param sub: The subscription document being notified.
+        :param guild: The Guild to find subscribers in.
+        :param channel: Where to show progress.
+        :param run_id: The ID of an unfinished run being resumed, if any.
+        :param results: The outcomes already stored for that run.
+        :param concurrency: How many DMs may be in flight at once.
+        :param interval: Seconds between progress updates.
+        """
+        self.client = client
+        self.sub: dict = sub
+        self.guild: discord.Guild = guild
+        self.channel: discord.abc.Messageable = channel
+        self.run_id = run_id
+        self.results: Dict[str, str] = dict(results or {})
+        self.concurrency: int = concurrency
+        self.interval: float = interval
+
+        self.members: List[str] = list(dict.fromkeys(map(str, sub["members"])))
+        self.unsaved: Dict[str, str] = {}
+        self.saving: Optional[asyncio.Future] = None
+        self.text: str = notice(sub, client.config.prefix)
+
+    def progress(self) -> discord.Embed:
+        counts = Counter(self.results.values())
+        em = discord.Embed(
+            title=f"Notifying subscribers of {self.sub['name']}",
+            description=f"{len(self.results)} of {len(self.members)} processed.",
+            colour=Color.info,
+        )
+        for status, label in LABELS.items():
+            if counts[status]:
+                em.add_field(name=label, value=str(counts[status]))
+
+        failed = [uid for uid in self.members if self.results.get(uid, SENT) != SENT]
+        if failed:
+            em.add_field(
+                name="Not Notified",
+                value=" ".join(f"<@{uid}>" for uid in failed[:40])
+                + (f" ...and {len(failed) - 40} more." if len(failed) > 40 else ""),
+                inline=False,
+            )
+        return em
+
+    async def deliver(self, uid: str) -> str:
+        try:
+            member: Optional[discord.Member] = self.guild.get_member(int(uid))
+        except ValueError:
+            return MISSING
+        if member is None:
+            return MISSING
+
+        try:
+            await self.client.outbox.send(member, Priority.BULK, content=self.text)
+        except discord.Forbidden:
+            return BLOCKED
+        except Exception as e:
+            log.f("FanOut", f"DM to {uid} failed: {type(e).__name__}: {e}")
+            return FAILED
+        else:
+            return SENT
+
+    async def _work(self, queue: Iterator[str]):
+        for uid in queue:
+            result = await self.deliver(uid)
+            self.results[uid] = result
+            self.unsaved[uid] = result
+            # Store outcomes as soon as they are known, so that a crash can
+            #   only repeat the DMs which were in flight at the time. While a
+            #   write is running, further outcomes gather for the next one.
+            if self.saving is None or self.saving.done():
+                self.saving = asyncio.ensure_future(self._save())
+
+    async def _save(self):
+        while self.run_id is not None and self.unsaved:
+            unsaved, self.unsaved = self.unsaved, {}
+            try:
+                await self.client.adb.record_deliveries(self.run_id, unsaved)
+            except Exception as e:
+                # Keep them for the next attempt. Notifying carries on; At
+                #   worst, a resumed run repeats these DMs.
+                self.unsaved = {**unsaved, **self.unsaved}
+                log.f("FanOut", f"Could not store outcomes: {type(e).__name__}: {e}")
+                return
+
+    async def _flush(self):
+        if self.saving is not None:
+            await self.saving
+        await self._save()
+
+    async def run(self) -> str:
+        """Notify every subscriber who has not been processed yet. Return a
+            summary of the run.
+        """
+        if self.run_id is None and self.client.adb.useDB:
+            self.run_id = await self.client.adb.start_delivery(
+                self.sub, self.guild.id, self.channel.id, self.client.session_id
+            )
+
+        status: discord.Message = await self.client.outbox.send(
+            self.channel, embed=self.progress()
+        )
+
+        # Every worker draws from the same iterator, so each member is taken
+        #   by exactly one of them.
+        queue = iter([uid for uid in self.members if uid not in self.results])
+        workers = asyncio.ensure_future(
+            asyncio.gather(*(self._work(queue) for _ in range(self.concurrency)))
+        )
+        try:
+            while not workers.done():
+                await asyncio.wait([workers], timeout=self.interval)
+                await self._flush()
+                if status is not None:
+                    try:
+                        await status.edit(embed=self.progress())
+                    except discord.HTTPException:
+                        # Deleted, most likely. Carry on without it.
+                        status = None
+            workers.result()
+        finally:
+            if not workers.done():
+                # Do not leave the workers sending DMs with nobody watching.
+                workers.cancel()
+                await asyncio.gather(workers, return_exceptions=True)
+            await self._flush()
+
+        if self.run_id is not None:
+            await self.client.adb.finish_delivery(self.run_id)
+
+        sent = sum(1 for r in self.results.values() if r == SENT)
+        return f"{sent} out of {len(self.members)} subscribed members were notified."
@@ -2,10 +2,16 @@
 Grasslands is a semi-public module for colored logging and misc APIs
 """
 
+import atexit
+import json
+import queue
+import sys
+import threading
 from datetime import datetime as dt
 from random import randint
-import requests
-import sys
+from time import sleep, time
+from typing import List, Optional, TextIO, Tuple
+
 from colorama import init, Fore
 from wiktionaryparser import WiktionaryParser as WP
 
@@ -16,115 +22,174 @@ Wikt = WP()
 def_cache = {}
 
 
+DEBUG = 10
+INFO = 20
+WARN = 30
+ERROR = 40
+
+LEVELS = {"DEBUG": DEBUG, "INFO": INFO, "WARN": WARN, "ERROR": ERROR}
+
+# Label, level and colour of each kind of message, by Peacock method name.
+KINDS = {
+    "debug": ("DEBUG", DEBUG, Fore.MAGENTA),
+    "log": ("LOG", INFO, Fore.WHITE),
+    "info": ("INFO", INFO, Fore.CYAN),
+    "com": ("COMMAND", INFO, Fore.BLUE),
+    "member": ("MEMBER", INFO, Fore.CYAN),
+    "ready": ("READY", INFO, Fore.GREEN),
+    "f": ("FUNC", INFO, Fore.MAGENTA),
+    "warn": ("WARN", WARN, Fore.YELLOW),
+    "err": ("ERROR", ERROR, Fore.RED),
+}
+
+Record = Tuple[float, str, Optional[str], str]
+
+
+class Plumage(object):
+    """The backend behind every Peacock. Records are put onto a queue by the
+        caller, and formatted and written in batches by a background thread,
+        so that logging never waits on the terminal.
+    """
+
+    def __init__(self, level: int = INFO, interval: float = 0.05):
+        self.level: int = level
+        self.interval: float = interval
+        self.json: Optional[TextIO] = None
+
+        self.queue: "queue.SimpleQueue[Optional[Record]]" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def put(self, record: Record):
+        if self._thread is None:
+            self.start()
+        self.queue.put(record)
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                init()
+                self._thread = threading.Thread(
+                    target=self.run, name="Peacock", daemon=True
+                )
+                self._thread.start()
+                atexit.register(self.close)
+
+    def close(self):
+        """Write out everything still queued, and stop the thread."""
+        if self._thread is not None and self._thread.is_alive():
+            self.queue.put(None)
+            self._thread.join(5)
+        if self.json is not None:
+            self.json.close()
+            self.json = None
+
+    def run(self):
+        while True:
+            batch: List[Record] = [self.queue.get()]
+            if self.interval:
+                # Let a burst of records arrive, to write them all at once.
+                sleep(self.interval)
+            try:
+                while True:
+                    batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            stop = None in batch
+            self.write([r for r in batch if r is not None])
+            if stop:
+                return
+
+    def write(self, batch: List[Record]):
+        lines = []
+        for ts, kind, func, message in batch:
+            label, _, colour = KINDS[kind]
+            if func is not None:
+                label = f"{label}/{str(func).upper()}"
+            stamp = str(dt.utcfromtimestamp(ts))[:19]
+            text = message.encode("ascii", "ignore").decode("ascii")
+            lines.append(f"{colour}[{label}] [{stamp}] {text}{Fore.RESET}\n")
+
+            if self.json is not None:
+                self.json.write(
+                    json.dumps(
+                        {
+                            "ts": ts,
+                            "level": label.split("/")[0],
+                            "func": func,
+                            "message": message,
+                        }
+                    )
+                    + "\n"
+                )
+
+        try:
+            sys.stdout.write("".join(lines))
+            sys.stdout.flush()
+            if self.json is not None:
+                self.json.flush()
+        except Exception:
+            pass
+
+
+DEV_MODE = "--dev-mode" in sys.argv
+
+plumage = Plumage(DEBUG if DEV_MODE else INFO)
+
+
+def configure(level: str = None, json_path: str = None, interval: float = None):
+    """Set the minimum level of messages to log, and optionally a file to which
+        every message will also be written as a line of JSON. In dev mode, the
+        level is never set above DEBUG.
+    """
+    if level is not None:
+        level = LEVELS.get(str(level).upper(), plumage.level)
+        plumage.level = min(level, DEBUG) if DEV_MODE else level
+    if interval is not None:
+        plumage.interval = interval
+    if json_path:
+        plumage.json = open(json_path, "a", encoding="utf-8")
+
+
 class Peacock(object):
     def __init__(self, painter=None):
-        init()
+        pass
 
     def timestamp(self):
         return "[{}]".format(str(dt.utcnow())[:-7])
 
+    @staticmethod
+    def _put(kind: str, message, func: str = None):
+        if KINDS[kind][1] >= plumage.level:
+            plumage.put((time(), kind, func, str(message)))
+
     def log(self, message):
-        print(
-            Fore.WHITE
-            + "[LOG] "
-            + self.timestamp()
-            + " "
-            + message.encode("ascii", "ignore").decode("ascii")
-            + Fore.RESET,
-            flush=True,
-        )
-        return
+        self._put("log", message)
 
     def warn(self, message):
-        print(
-            Fore.YELLOW
-            + "[WARN] "
-            + self.timestamp()
-            + " "
-            + message.encode("ascii", "ignore").decode("ascii")
-            + Fore.RESET,
-            flush=True,
-        )
-        return
+        self._put("warn", message)
 
     def err(self, message):
-        print(
-            Fore.RED
-            + "[ERROR] "
-            + self.timestamp()
-            + " "
-            + message.encode("ascii", "ignore").decode("ascii")
-            + Fore.RESET,
-            flush=True,
-        )
+        self._put("err", message)
 
     def info(self, message):
-        print(
-            Fore.CYAN
-            + "[INFO] "
-            + self.timestamp()
-            + " "
-            + message.encode("ascii", "ignore").decode("ascii")
-            + Fore.RESET,
-            flush=True,
-        )
+        self._put("info", message)
 
     def com(self, message):
-        print(
-            Fore.BLUE
-            + "[COMMAND] "
-            + self.timestamp()
-            + " "
-            + message.encode("ascii", "ignore").decode("ascii")
-            + Fore.RESET,
-            flush=True,
-        )
+        self._put("com", message)
 
     def member(self, message):
-        print(
-            Fore.CYAN
-            + "[MEMBER] "
-            + self.timestamp()
-            + " "
-            + message.encode("ascii", "ignore").decode("ascii")
-            + Fore.RESET,
-            flush=True,
-        )
+        self._put("member", message)
 
     def debug(self, message):
-        if "--dev-mode" not in sys.argv:
-            return
-        print(
-            Fore.MAGENTA
-            + "[DEBUG] "
-            + self.timestamp()
-            + " "
-            + message.encode("ascii", "ignore").decode("ascii")
-            + Fore.RESET,
-            flush=True,
-        )
+        self._put("debug", message)
 
     def ready(self, message):
-        print(
-            Fore.GREEN
-            + "[READY] "
-            + self.timestamp()
-            + " "
-            + message.encode("ascii", "ignore").decode("ascii")
-            + Fore.RESET,
-            flush=True,
-        )
+        self._put("ready", message)
 
     def f(self, func="basic", message=""):
-        print(
-            Fore.MAGENTA
-            + "[FUNC/{}] ".format(func.upper())
-            + self.timestamp()
-            + " "
-            + message.encode("ascii", "ignore").decode("ascii")
-            + Fore.RESET,
-            flush=True,
-        )
+        self._put("f", message, func)
 
 
 class Octopus(object):
@@ -164,17 +229,12 @@ class Octopus(object):
             )
             return None
         self.key = API_KEY
-        response = requests.get(
-            "https://osu.ppy.sh/api/get_beatmaps?k={}" + "&limit={}".format(self.key, 1)
-        )
-        if "error" in response:
-            self.log.err("OSU Error: " + response["error"])
-            return None
-        else:
-            self.log.ready("OSU support enabled")
+        self.log.ready("OSU support enabled")
 
-    def get_user(self, userid, mode=0):
-        response = requests.get(
+    async def get_user(self, userid, mode=0):
+        from .util.http import http
+
+        response = await http.get(
             "https://osu.ppy.sh/api/get_user?k="
             + "{}&m={}&u={}".format(self.key, mode, userid.strip())
         )
@@ -183,8 +243,10 @@ class Octopus(object):
         user = self.Tentacle_user(response.json()[0])
         return user
 
-    def get_beatmap(self, beatid, sets="", mode=0):
-        response = requests.get(
+    async def get_beatmap(self, beatid, sets="", mode=0):
+        from .util.http import http
+
+        response = await http.get(
             "https://osu.ppy.sh/api/get_beatmaps?k="
             + "{}&s={}&b={}&m={}".format(self.key, sets, beatid, mode)
         )
@@ -207,9 +269,11 @@ class Giraffe(object):
             self.log.ready("imgur support enabled")
         self.key = API_KEY
 
-    def get_image(self, imageID):
+    async def get_image(self, imageID):
+        from .util.http import http
+
         headers = {"Authorization": "Client-Id {}".format(self.key)}
-        req = requests.get(
+        req = await http.get(
             "https://api.imgur.com/3/image/{}".format(imageID), headers=headers
         )
         response = req.json()
@@ -219,9 +283,11 @@ class Giraffe(object):
 
         return self.Imgur_Image(response["data"])
 
-    def get_random(self, albumID):
+    async def get_random(self, albumID):
+        from .util.http import http
+
         headers = {"Authorization": "Client-Id {}".format(self.key)}
-        req = requests.get(
+        req = await http.get(
             "https://api.imgur.com/3/album/{}".format(albumID), headers=headers
         )
         response = req.json()
@@ -231,10 +297,12 @@ class Giraffe(object):
 
         return self.Imgur_Image(response["data"][randint(0, len(response["data"]) - 1)])
 
-    def get_subreddit(self, subID):
+    async def get_subreddit(self, subID):
+
+        from .util.http import http
 
         headers = {"Authorization": "Client-Id {}".format(self.key)}
-        req = requests.get(
+        req = await http.get(
             "https://api.imgur.com/3/gallery/r/{}".format(subID), headers=headers
         )
         response = req.json()
@@ -259,18 +327,25 @@ class Giraffe(object):
 class Pidgeon:
     def __init__(self, query):
         self.query = query
+        self.response = None
+
+    async def fetch(self):
+        from .util.http import http
+
         api_url = "https://en.wikipedia.org/w/api.php?action=query&titles={q}&format=json&prop=extracts&exintro&explaintext"
-        url = api_url.format(q=query)
+        url = api_url.format(q=self.query)
         headers = {
             "User-Agent": "Petalbot/"
             + version
             + " (http://leaf.drunkencode.net/; nullexistence180@gmail.com) Python 3.6"
         }
         # Peacock().f("wiki", str(headers))
-        req = requests.get(url, headers=headers)
+        req = await http.get(url, headers=headers)
         self.response = req.json()
 
-    def get_summary(self):
+    async def get_summary(self):
+        if self.response is None:
+            await self.fetch()
         if self.response is None:
             return 0, "No data returned for: " + self.query
         try:
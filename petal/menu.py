@@ -164,10 +164,11 @@ class Menu:
         buttons: Task = await self.add_buttons(selection)
 
         ok = (str(cancel), str(confirm))
-        pre = all_checks(Reactions.by_user(self.master), Reactions.on_message(self.msg))
-
-        def check(react_: Reaction, user: User) -> bool:
-            return pre(react_, user) and str(react_.emoji) in ok
+        check = all_checks(
+            Reactions.by_user(self.master),
+            Reactions.on_message(self.msg),
+            lambda react_, user: str(react_.emoji) in ok,
+        )
 
         choice = (await Reactions.waitfor(self.client, check, timeout=time))[0]
 
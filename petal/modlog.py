@@ -0,0 +1,217 @@
+"""Batched posting of event logs.
+
+Joins, deletions, edits and the like each produce an Embed for a log Channel.
+    Rather than post each in its own Message, a LogBatch collects them for a
+    short window and then posts them together, several Embeds to a Message
+    where the library allows it. When a low-detail kind of event, such as a
+    join, repeats many times in a window, as during a raid, those events are
+    collapsed into a single digest Embed with one line for each. Events which
+    are evidence, such as deletions and edits, are always posted in full.
+"""
+
+import asyncio
+import inspect
+from collections import Counter
+from datetime import datetime
+from typing import Iterator, List, NamedTuple, Optional, Union
+
+import discord
+
+from .etc import timestr
+from .grasslands import Peacock
+from .outbox import Priority
+
+log = Peacock()
+
+# Discord allows at most ten Embeds in a Message, with at most 6000 characters
+#   between them.
+MAX_EMBEDS = 10
+MAX_CHARS = 6000
+# Descriptions are limited to 2048 characters; Leave room for the overflow note.
+DIGEST_CHARS = 1900
+
+# Older versions of discord.py can only send one Embed per Message.
+MULTI_EMBED: bool = "embeds" in inspect.signature(
+    discord.abc.Messageable.send
+).parameters
+
+
+class Entry(NamedTuple):
+    kind: str
+    embed: discord.Embed
+    line: str
+    time: datetime
+    collapse: bool
+
+
+def digest(entries: List[Entry]) -> discord.Embed:
+    """Build one Embed summarizing a run of Entries of the same kind."""
+    first, last = entries[0], entries[-1]
+    lines: List[str] = []
+    size = 0
+    for entry in entries:
+        size += len(entry.line) + 1
+        if size > DIGEST_CHARS:
+            lines.append(f"...and {len(entries) - len(lines)} more.")
+            break
+        lines.append(entry.line)
+
+    return (
+        discord.Embed(
+            title=f"{first.kind} ×{len(entries)}",
+            description="\n".join(lines),
+            colour=first.embed.colour,
+        )
+        .add_field(name="First", value=timestr(first.time))
+        .add_field(name="Last", value=timestr(last.time))
+    )
+
+
+def pack(embeds: List[discord.Embed]) -> Iterator[List[discord.Embed]]:
+    """Split Embeds, in order, into groups which each fit in one Message."""
+    if not MULTI_EMBED:
+        for em in embeds:
+            yield [em]
+        return
+
+    group: List[discord.Embed] = []
+    chars = 0
+    for em in embeds:
+        n = len(em)
+        if group and (len(group) >= MAX_EMBEDS or chars + n > MAX_CHARS):
+            yield group
+            group, chars = [], 0
+        group.append(em)
+        chars += n
+    if group:
+        yield group
+
+
+class LogBatch(object):
+    def __init__(
+        self,
+        client,
+        key: str,
+        priority: int = Priority.MODERATION,
+        *,
+        window: float = 2,
+        digest_after: int = 5,
+        max_entries: int = 100,
+    ):
+        """
+        :param client: The Petal Client, to find the Channel and the Outbox.
+        :param key: The Config key holding the ID of the log Channel.
+        :param priority: The Outbox Priority to post at.
+        :param window: Seconds to collect Entries for before posting. Zero
+            posts each Entry immediately.
+        :param digest_after: Collapse a collapsible kind of event into a
+            digest when it occurs this many times in one batch.
+        :param max_entries: Post early when this many Entries are waiting.
+        """
+        self.client = client
+        self.key: str = key
+        self.priority: int = priority
+        self.window: float = window
+        self.digest_after: int = digest_after
+        self.max_entries: int = max_entries
+
+        self.entries: List[Entry] = []
+        # Counts of collapsible Entries, by kind.
+        self.kinds: Counter = Counter()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    @classmethod
+    def from_config(cls, client, key: str, priority: int) -> "LogBatch":
+        opts = client.config.doc.get("logBatching") or {}
+        return cls(
+            client,
+            key,
+            priority,
+            window=opts.get("window", 2),
+            digest_after=opts.get("digestAfter", 5),
+        )
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @property
+    def size(self) -> int:
+        """The number of Embeds that the batch would post right now."""
+        full = len(self.entries) - sum(self.kinds.values())
+        return full + sum(
+            1 if n >= self.digest_after else n for n in self.kinds.values()
+        )
+
+    def add(
+        self,
+        embed: discord.Embed,
+        kind: str,
+        line: Union[str, None] = None,
+        *,
+        collapse: bool = False,
+    ):
+        """Queue an Embed for the log Channel.
+
+        :param embed: The full Embed, posted if the event is not collapsed.
+        :param kind: Which sort of event this is. Events are only collapsed
+            with others of the same kind.
+        :param line: One line describing the event, used in a digest.
+        :param collapse: Whether the line says all that matters about the
+            event, so that it may be collapsed into a digest. Leave this off
+            for anything a moderator may need the full detail of.
+        """
+        self.entries.append(
+            Entry(
+                kind,
+                embed,
+                line or embed.description or kind,
+                datetime.utcnow(),
+                collapse,
+            )
+        )
+        if collapse:
+            self.kinds[kind] += 1
+
+        if (
+            self.window <= 0
+            or len(self.entries) >= self.max_entries
+            or self.size >= MAX_EMBEDS
+        ):
+            self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_event_loop().call_later(self.window, self.flush)
+
+    def flush(self):
+        """Post everything waiting, in the order it was added."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        entries, kinds = self.entries, self.kinds
+        self.entries, self.kinds = [], Counter()
+        if not entries:
+            return
+
+        channel = self.client.get_channel(self.client.config.get(self.key, 0))
+        if not channel:
+            log.err(f"Cannot post {len(entries)} log entries to {self.key!r}.")
+            return
+
+        # A digest goes where the first of its Entries would have gone.
+        embeds: List[Union[discord.Embed, str]] = []
+        runs = {}
+        for entry in entries:
+            if not entry.collapse or kinds[entry.kind] < self.digest_after:
+                embeds.append(entry.embed)
+            elif entry.kind in runs:
+                runs[entry.kind].append(entry)
+            else:
+                runs[entry.kind] = [entry]
+                embeds.append(entry.kind)
+
+        embeds = [digest(runs[em]) if isinstance(em, str) else em for em in embeds]
+        for group in pack(embeds):
+            if len(group) == 1:
+                self.client.outbox.post(channel, self.priority, embed=group[0])
+            else:
+                self.client.outbox.post(channel, self.priority, embeds=group)
@@ -0,0 +1,299 @@
+"""Outbound message dispatch for Petal.
+
+Every Message that Petal posts should be queued here rather than sent inline.
+    Each Channel has its own queue, drained in priority order by its own worker,
+    and paced by a token bucket shaped like Discord's per-Channel route bucket.
+    A global bucket caps the total rate across all Channels. A handler can queue
+    a Message and return at once, instead of waiting behind a rate limit.
+"""
+
+import asyncio
+import heapq
+from enum import IntEnum
+from itertools import count
+from time import monotonic
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import discord
+
+from .exceptions import OutboxFull
+from .grasslands import Peacock
+
+log = Peacock()
+
+
+class Priority(IntEnum):
+    """Lower values are sent first. Within a priority, order is preserved."""
+
+    MODERATION = 0
+    MEMBERSHIP = 1
+    REPLY = 2
+    BULK = 3
+
+
+class TokenBucket(object):
+    __slots__ = ("rate", "per", "tokens", "stamp", "blocked")
+
+    def __init__(self, rate: int, per: float):
+        self.rate: int = rate
+        self.per: float = per
+        self.tokens: float = rate
+        self.stamp: float = monotonic()
+        # Set from a 429, when Discord says to wait longer than the bucket would.
+        self.blocked: float = 0
+
+    def _refill(self, now: float):
+        self.tokens = min(
+            self.rate, self.tokens + (now - self.stamp) * self.rate / self.per
+        )
+        self.stamp = now
+
+    def delay(self, now: float) -> float:
+        """Return how long to wait before a token is available."""
+        if self.blocked > now:
+            return self.blocked - now
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) * self.per / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def block(self, until: float):
+        self.blocked = max(self.blocked, until)
+        self.tokens = 0
+
+    @property
+    def full(self) -> bool:
+        self._refill(monotonic())
+        return self.tokens >= self.rate and self.blocked <= self.stamp
+
+
+class Envelope(object):
+    __slots__ = ("priority", "kwargs", "future", "queued")
+
+    def __init__(
+        self, priority: int, kwargs: Dict[str, Any], future: Optional[asyncio.Future]
+    ):
+        self.priority: int = priority
+        self.kwargs: Dict[str, Any] = kwargs
+        # None if nobody is waiting for the result. Failures are logged instead.
+        self.future: Optional[asyncio.Future] = future
+        self.queued: float = monotonic()
+
+    def resolve(self, result: Optional[discord.Message]):
+        if self.future is not None and not self.future.done():
+            self.future.set_result(result)
+
+    def fail(self, e: Exception, where: str):
+        if self.future is None:
+            log.err(f"Message could not be sent in {where}: {type(e).__name__}: {e}")
+        elif not self.future.done():
+            self.future.set_exception(e)
+
+
+class Lane(object):
+    """The queue, bucket and worker for one Channel."""
+
+    __slots__ = (
+        "channel",
+        "bucket",
+        "heap",
+        "task",
+        "sent",
+        "dropped",
+        "limited",
+        "peak",
+        "wait_total",
+        "wait_max",
+    )
+
+    def __init__(self, channel: discord.abc.Messageable, bucket: TokenBucket):
+        self.channel: discord.abc.Messageable = channel
+        self.bucket: TokenBucket = bucket
+        self.heap: List[Tuple[int, int, Envelope]] = []
+        self.task: Optional[asyncio.Task] = None
+
+        self.sent: int = 0
+        self.dropped: int = 0
+        self.limited: int = 0
+        self.peak: int = 0
+        self.wait_total: float = 0
+        self.wait_max: float = 0
+
+    @property
+    def name(self) -> str:
+        return f"#{getattr(self.channel, 'name', None) or 'DM'}/{self.channel.id}"
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "name": self.name,
+            "queued": len(self.heap),
+            "peak": self.peak,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "limited": self.limited,
+            "mean_wait_ms": 1000 * self.wait_total / self.sent if self.sent else 0,
+            "max_wait_ms": 1000 * self.wait_max,
+        }
+
+
+def retry_after(e: discord.HTTPException) -> float:
+    try:
+        return float(e.response.headers.get("Retry-After", 1))
+    except (AttributeError, TypeError, ValueError):
+        return 1
+
+
+class Outbox(object):
+    def __init__(
+        self,
+        *,
+        channel_rate: int = 5,
+        channel_per: float = 5,
+        global_rate: int = 50,
+        global_per: float = 1,
+        max_queue: int = 100,
+    ):
+        self.channel_rate: int = channel_rate
+        self.channel_per: float = channel_per
+        self.max_queue: int = max_queue
+
+        self.bucket: TokenBucket = TokenBucket(global_rate, global_per)
+        self.lanes: Dict[Hashable, Lane] = {}
+        self._seq = count()
+
+    @classmethod
+    def from_config(cls, config) -> "Outbox":
+        opts = config.doc.get("outbox") or {}
+        return cls(
+            channel_rate=opts.get("channelRate", 5),
+            channel_per=opts.get("channelPer", 5),
+            global_rate=opts.get("globalRate", 50),
+            global_per=opts.get("globalPer", 1),
+            max_queue=opts.get("maxQueue", 100),
+        )
+
+    def __len__(self) -> int:
+        return sum(len(lane.heap) for lane in self.lanes.values())
+
+    def send(
+        self,
+        channel: discord.abc.Messageable,
+        priority: int = Priority.REPLY,
+        **kwargs,
+    ) -> asyncio.Future:
+        """Queue a Message, with the keyword arguments of `Messageable.send()`.
+            Return a Future which resolves to the sent Message.
+
+        If the queue for the Channel is full, the lowest priority Message is
+            dropped, and its Future raises OutboxFull. That may be this one.
+        """
+        future = asyncio.get_event_loop().create_future()
+        self._queue(channel, Envelope(priority, kwargs, future))
+        return future
+
+    def post(
+        self,
+        channel: discord.abc.Messageable,
+        priority: int = Priority.REPLY,
+        **kwargs,
+    ):
+        """Queue a Message without waiting for it. Failures are logged."""
+        self._queue(channel, Envelope(priority, kwargs, None))
+
+    def _queue(self, channel: discord.abc.Messageable, env: Envelope):
+        lane = self.lanes.get(channel.id)
+        if lane is None:
+            if len(self.lanes) >= 256:
+                self._prune()
+            lane = self.lanes[channel.id] = Lane(
+                channel, TokenBucket(self.channel_rate, self.channel_per)
+            )
+
+        if len(lane.heap) >= self.max_queue:
+            # Drop the newest Message of the lowest priority, unless this one
+            #   is lower still.
+            worst = max(range(len(lane.heap)), key=lambda i: lane.heap[i][:2])
+            if env.priority >= lane.heap[worst][0]:
+                lane.dropped += 1
+                env.fail(OutboxFull(f"Queue for {lane.name} is full"), lane.name)
+                return
+            _, _, evicted = lane.heap[worst]
+            lane.heap[worst] = lane.heap[-1]
+            lane.heap.pop()
+            heapq.heapify(lane.heap)
+            lane.dropped += 1
+            evicted.fail(OutboxFull(f"Queue for {lane.name} is full"), lane.name)
+
+        heapq.heappush(lane.heap, (env.priority, next(self._seq), env))
+        lane.peak = max(lane.peak, len(lane.heap))
+        if lane.task is None:
+            lane.task = asyncio.ensure_future(self._drain(lane))
+
+    def _prune(self):
+        for key, lane in list(self.lanes.items()):
+            if lane.task is None and lane.bucket.full:
+                del self.lanes[key]
+
+    async def _drain(self, lane: Lane):
+        try:
+            while lane.heap:
+                now = monotonic()
+                delay = max(lane.bucket.delay(now), self.bucket.delay(now))
+                if delay > 0:
+                    # Sleep before popping, so that anything more urgent queued
+                    #   in the meantime goes first.
+                    await asyncio.sleep(delay)
+                    continue
+
+                entry = heapq.heappop(lane.heap)
+                env = entry[2]
+                if env.future is not None and env.future.done():
+                    # Cancelled by the caller.
+                    continue
+
+                lane.bucket.take()
+                self.bucket.take()
+                try:
+                    msg = await lane.channel.send(**env.kwargs)
+                except discord.HTTPException as e:
+                    if e.status == 429:
+                        lane.limited += 1
+                        lane.bucket.block(monotonic() + retry_after(e))
+                        heapq.heappush(lane.heap, entry)
+                    else:
+                        env.fail(e, lane.name)
+                except asyncio.CancelledError:
+                    env.fail(OutboxFull(f"Queue for {lane.name} closed"), lane.name)
+                    raise
+                except Exception as e:
+                    env.fail(e, lane.name)
+                else:
+                    waited = monotonic() - env.queued
+                    lane.sent += 1
+                    lane.wait_total += waited
+                    lane.wait_max = max(lane.wait_max, waited)
+                    env.resolve(msg)
+        finally:
+            lane.task = None
+
+    async def flush(self, timeout: float = 5):
+        """Wait for every queue to drain, or for the timeout to pass. Anything
+            still queued after that is dropped.
+        """
+        tasks = [lane.task for lane in self.lanes.values() if lane.task is not None]
+        if tasks:
+            _, pending = await asyncio.wait(tasks, timeout=timeout)
+            for task in pending:
+                task.cancel()
+
+        for lane in self.lanes.values():
+            while lane.heap:
+                _, _, env = lane.heap.pop()
+                lane.dropped += 1
+                env.fail(OutboxFull(f"Queue for {lane.name} closed"), lane.name)
+
+    def stats(self) -> Dict[Hashable, Dict[str, float]]:
+        return {key: lane.as_dict() for key, lane in self.lanes.items()}
@@ -0,0 +1,97 @@
+"""Precomputed Config values for the message hot path.
+
+`on_message` runs for every message Petal can see, so it should not walk the
+    Config document, compile regexes, or scan guild roles each time. A Runtime
+    holds everything it needs in ready-to-use form. It is immutable, and is
+    rebuilt and swapped in whole whenever the Config is loaded or saved, so a
+    handler always sees one consistent set of values.
+"""
+
+import re
+from types import MappingProxyType
+from typing import Any, FrozenSet, Iterable, Mapping, NamedTuple, Optional, Pattern
+
+import discord
+
+from .grasslands import Peacock
+
+log = Peacock()
+
+
+def id_set(values: Optional[Iterable[Any]]) -> FrozenSet[int]:
+    """Convert a Config List of IDs, which may be Strings or Integers, into a
+        frozenset of Integers, dropping any which are not IDs at all.
+    """
+    out = set()
+    for v in values or ():
+        try:
+            out.add(int(v))
+        except (TypeError, ValueError):
+            continue
+    return frozenset(out)
+
+
+def as_id(value: Any) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def find_role(spec: Any, guild: Optional[discord.Guild]) -> Optional[discord.Role]:
+    """Find a Role by its ID or, failing that, its name."""
+    if guild is None or spec is None:
+        return None
+    rid = as_id(spec)
+    if rid is not None:
+        role = guild.get_role(rid)
+        if role is not None:
+            return role
+    return discord.utils.get(guild.roles, name=str(spec))
+
+
+class RoleGrant(NamedTuple):
+    channel: Optional[int]
+    regex: Pattern
+    response: str
+    role: Optional[discord.Role]
+
+
+class Runtime(NamedTuple):
+    prefix: str
+    accept_pms: bool
+    blacklist: FrozenSet[int]
+    ignore_channels: FrozenSet[int]
+    ignore_servers: FrozenSet[int]
+    autoreplies: Mapping[str, str]
+    role_grant: Optional[RoleGrant]
+
+    @classmethod
+    def build(cls, config, guild: discord.Guild = None) -> "Runtime":
+        doc = config.doc
+
+        grant = None
+        grant_conf = doc.get("roleGrant")
+        if grant_conf and grant_conf.get("regex"):
+            try:
+                grant = RoleGrant(
+                    channel=as_id(grant_conf.get("chan")),
+                    regex=re.compile(
+                        grant_conf["regex"],
+                        re.IGNORECASE if grant_conf.get("ignorecase") else 0,
+                    ),
+                    response=grant_conf.get("response", ""),
+                    role=find_role(grant_conf.get("role"), guild),
+                )
+            except re.error as e:
+                log.err(f"roleGrant regex is invalid, role granting disabled: {e}")
+
+        return cls(
+            prefix=doc.get("prefix", config.prefix),
+            accept_pms=bool(doc.get("acceptPMs", config.pm)),
+            blacklist=id_set(doc.get("blacklist")),
+            ignore_channels=id_set(doc.get("ignoreChannels")),
+            ignore_servers=id_set(doc.get("ignoreServers")),
+            autoreplies=MappingProxyType(dict(doc.get("autoreplies") or {})),
+            role_grant=grant,
+        )
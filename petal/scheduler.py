@@ -0,0 +1,92 @@
+"""Timed job scheduling for Petal.
+
+Jobs are kept in a min-heap ordered by due time, and the scheduler sleeps
+    exactly until the earliest one is due. Scheduling a job that is due sooner
+    than the current earliest wakes the scheduler so that it can re-arm. Each
+    job runs in its own Task, so that a slow one does not hold up the rest.
+"""
+
+import asyncio
+import heapq
+import time
+from functools import partial
+from itertools import count
+from typing import Awaitable, Callable, Dict, Hashable, List, Set, Tuple
+
+from .grasslands import Peacock
+
+log = Peacock()
+
+Job = Callable[[], Awaitable]
+
+
+class Scheduler:
+    def __init__(self):
+        self._heap: List[Tuple[float, int, Hashable, Job]] = []
+        # Only the most recent entry for each key is live. Entries which have
+        #   been replaced or cancelled are skipped when they reach the top.
+        self._live: Dict[Hashable, int] = {}
+        self._seq = count()
+        self._wake = asyncio.Event()
+        # Jobs which have been started and not yet finished.
+        self.running: Set[asyncio.Future] = set()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._live
+
+    def __len__(self) -> int:
+        return len(self._live)
+
+    def schedule(self, due: float, key: Hashable, job: Job):
+        """Run a Job at a UNIX timestamp. If a Job is already scheduled under
+            the same key, it is replaced.
+        """
+        seq = next(self._seq)
+        self._live[key] = seq
+        heapq.heappush(self._heap, (due, seq, key, job))
+
+        if self._heap[0][1] == seq:
+            self._wake.set()
+
+    def cancel(self, key: Hashable):
+        self._live.pop(key, None)
+
+    def next_due(self) -> float:
+        self._prune()
+        return self._heap[0][0] if self._heap else None
+
+    def _prune(self):
+        while self._heap and self._live.get(self._heap[0][2]) != self._heap[0][1]:
+            heapq.heappop(self._heap)
+
+    async def run(self):
+        while True:
+            self._wake.clear()
+            due = self.next_due()
+
+            if due is None:
+                await self._wake.wait()
+                continue
+
+            delay = due - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            _, seq, key, job = heapq.heappop(self._heap)
+            del self._live[key]
+
+            task = asyncio.ensure_future(job())
+            self.running.add(task)
+            task.add_done_callback(partial(self._finished, key))
+
+    def _finished(self, key: Hashable, task: asyncio.Future):
+        self.running.discard(task)
+        if task.cancelled():
+            return
+        e = task.exception()
+        if e is not None:
+            log.err(f"Scheduled job {key!r} FAILED: {type(e).__name__}: {e}")
@@ -1,10 +1,23 @@
 """Chat Tunneling module for Petal.
 
 Manage bridges between Messageables, such as two DMs, or a DM and a Channel.
+
+Every Tunnel is registered with the TunnelRouter of the Client, under the IDs of
+    all of its Channels. Messages are handed to the Router once, from
+    `on_message`, and it finds the Tunnel of a Channel with one lookup, however
+    many Tunnels are open.
 """
 
-from asyncio import ensure_future as create_task, CancelledError, Task, TimeoutError
-from typing import List, Optional, Set
+from asyncio import (
+    ensure_future as create_task,
+    gather,
+    sleep,
+    CancelledError,
+    Task,
+)
+from collections import OrderedDict
+from time import monotonic
+from typing import Dict, Iterator, List, Optional, Set, Tuple
 
 import discord
 
@@ -12,17 +25,95 @@ from petal.exceptions import TunnelSetupError
 from petal.types import TunnelABC
 
 
-def mkembed(src: discord.Message):
-    """Build a Discord Embed representing the passed Message."""
-    em = discord.Embed(
-        colour=src.author.colour,
-        description=src.content,
-        timestamp=src.created_at,
-        title=f"Message from `#{src.channel.name}`"
-        if hasattr(src.channel, "name")
-        else "Message via DM",
-    ).set_author(name=src.author.display_name, icon_url=src.author.avatar_url)
-    return {"embed": em}
+class TunnelRouter(object):
+    """Deliver Messages to the Tunnels connected to their Channels."""
+
+    def __init__(self, client, senders: int = 256):
+        """
+        :param client: The Petal Client.
+        :param senders: How many Senders to keep prepared Embed parts for.
+        """
+        self.client = client
+        self.gates: Dict[int, "Tunnel"] = {}
+        self.tunnels: Set["Tunnel"] = set()
+
+        self.max_senders: int = senders
+        self.senders: "OrderedDict[int, Tuple[tuple, discord.Colour, dict]]" = (
+            OrderedDict()
+        )
+
+    def __iter__(self) -> Iterator["Tunnel"]:
+        return iter(self.tunnels)
+
+    def __len__(self) -> int:
+        return len(self.tunnels)
+
+    def get(self, channel_id: int) -> Optional["Tunnel"]:
+        return self.gates.get(channel_id)
+
+    def add(self, tunnel: "Tunnel"):
+        self.tunnels.add(tunnel)
+        for gate in tunnel.connected:
+            self.gates[gate] = tunnel
+
+    def remove(self, tunnel: "Tunnel"):
+        self.tunnels.discard(tunnel)
+        for gate, t in list(self.gates.items()):
+            if t is tunnel:
+                del self.gates[gate]
+
+    def disconnect(self, channel_id: int):
+        self.gates.pop(channel_id, None)
+
+    def forget(self, user_id: int):
+        """Drop the prepared Embed parts of a Sender, whose Roles may have
+            changed their colour.
+        """
+        self.senders.pop(user_id, None)
+
+    def embed(self, src: discord.Message) -> discord.Embed:
+        """Build a Discord Embed representing the passed Message. The parts
+            which depend only on its author are reused while their name and
+            Avatar stay the same.
+        """
+        author = src.author
+        ident = (author.display_name, author.avatar)
+        cached = self.senders.get(author.id)
+        if cached is None or cached[0] != ident:
+            cached = self.senders[author.id] = (
+                ident,
+                author.colour,
+                {"name": author.display_name, "icon_url": author.avatar_url},
+            )
+            while len(self.senders) > self.max_senders:
+                self.senders.popitem(last=False)
+        else:
+            self.senders.move_to_end(author.id)
+
+        _, colour, head = cached
+        return discord.Embed(
+            colour=colour,
+            description=src.content,
+            timestamp=src.created_at,
+            title=f"Message from `#{src.channel.name}`"
+            if hasattr(src.channel, "name")
+            else "Message via DM",
+        ).set_author(**head)
+
+    def route(self, msg: discord.Message) -> bool:
+        """Forward a Message if its Channel is in an active Tunnel. Return True
+            if it was. This does not wait for the Message to be delivered.
+        """
+        tunnel = self.gates.get(msg.channel.id)
+        if (
+            tunnel is None
+            or not tunnel.active
+            or msg.author.id == self.client.user.id
+            or msg.content.startswith(self.client.config.prefix)
+        ):
+            return False
+        create_task(tunnel.receive(msg))
+        return True
 
 
 class Tunnel(TunnelABC):
@@ -40,7 +131,8 @@ class Tunnel(TunnelABC):
         self.timeout: int = timeout
 
         self.active: bool = False
-        self.connected: List[discord.TextChannel] = []
+        self.connected: Dict[int, discord.abc.Messageable] = {}
+        self.last: float = monotonic()
         # self.names_c = {}  # Channel aliases
         # self.names_u = {}  # User aliases
 
@@ -49,7 +141,7 @@ class Tunnel(TunnelABC):
 
     async def activate(self):
         """Resolve all Channel IDs into usable Channel Objects, and store them
-            in memory in a List.
+            in memory, by ID.
         """
         for c_id in self.gates:
             channel: discord.TextChannel = self.client.get_channel(c_id)
@@ -66,7 +158,7 @@ class Tunnel(TunnelABC):
                             f"Failed to connect to `{channel.id}`: {e}"
                         )
                     else:
-                        self.connected.append(channel)
+                        self.connected[channel.id] = channel
                 else:
                     await self.origin.send(
                         f"Failed to connect to `{channel.id}`: Channel is"
@@ -82,6 +174,8 @@ class Tunnel(TunnelABC):
             raise TunnelSetupError()
         else:
             self.active = True
+            self.last = monotonic()
+            self.client.tunnels.add(self)
             tunnel_coro = create_task(self.run_tunnel())
             await self.broadcast(
                 f"Messaging Tunnel established. This Channel is now connected"
@@ -96,36 +190,46 @@ class Tunnel(TunnelABC):
         file=None,
         exclude: List[int] = None,
     ):
-        """Post a Message with the supplied values to all connected Channels."""
+        """Post a Message with the supplied values to all connected Channels.
+            The Messages are queued together, so that one slow Channel does not
+            hold up the others.
+        """
         exclude = exclude or []
-        to_drop = []
         if content or embed or file:
-            for gate in self.connected:
-                if gate.id not in exclude:
-                    try:
-                        await gate.send(content=content, embed=embed, file=file)
-                    except:
-                        to_drop.append(gate)
-            for gate in to_drop:
-                await self.drop(gate)
+            gates = [
+                gate for gate in self.connected.values() if gate.id not in exclude
+            ]
+            results = await gather(
+                *(
+                    self.client.outbox.send(
+                        gate, content=content, embed=embed, file=file
+                    )
+                    for gate in gates
+                ),
+                return_exceptions=True,
+            )
+            for gate, result in zip(gates, results):
+                if isinstance(result, Exception):
+                    await self.drop(gate)
 
     async def close(self):
         """Remove all connected Gateways, and remove self from the Tunnels field
             in the Client. If the interface has been used correctly, this will
             cause the Garbage Collector to delete the Tunnel fully.
         """
-        for gate in self.connected:
+        for gate in list(self.connected.values()):
             await self.drop(gate)
         self.client.remove_tunnel(self)
 
     async def drop(self, gate):
         """Remove a connected Channel from the connected Channels."""
-        while gate in self.connected:
-            self.connected.remove(gate)
+        if self.connected.pop(gate.id, None) is None:
+            return
+        self.client.tunnels.disconnect(gate.id)
         if self.active:
             await self.broadcast("One endpoint has disconnected.")
-        if len(self.connected) < 2:
-            await self.kill("Connection closed: No active endpoints.")
+            if len(self.connected) < 2:
+                await self.kill("Connection closed: No active endpoints.")
 
     async def kill(self, final=""):
         """Induce this Tunnel to close."""
@@ -137,36 +241,31 @@ class Tunnel(TunnelABC):
 
     async def receive(self, msg: discord.Message):
         """Forward a received Message to all connected Channels."""
-        await self.broadcast(exclude=[msg.channel.id], **mkembed(msg))
+        self.last = monotonic()
+        await self.broadcast(
+            exclude=[msg.channel.id], embed=self.client.tunnels.embed(msg)
+        )
 
     async def run_tunnel(self):
-        """Begin Tunnel operation loop."""
+        """Watch the Tunnel, and close it once no Message has passed through it
+            for the timeout. Messages themselves are forwarded by the Router.
+        """
         while self.active:
             if len(self.connected) < 2:
                 await self.kill("Connection closed: No active endpoints.")
                 continue
-            self.waiting = create_task(
-                self.client.wait_for(
-                    "message",
-                    check=(
-                        lambda m: m.channel in self.connected
-                        and m.author.id != self.client.user.id
-                        and not m.content.startswith(self.client.config.prefix)
-                    ),
-                    timeout=self.timeout,
-                )
-            )
+            idle = monotonic() - self.last
+            if idle >= self.timeout:
+                # Tunnel timed out.
+                await self.kill("Connection closed due to inactivity.")
+                continue
+            self.waiting = create_task(sleep(self.timeout - idle))
             try:
-                msg = await self.waiting
+                await self.waiting
             except CancelledError:
                 # Tunnel was killed.
                 if self.active:
                     await self.broadcast("Connection closed: Coroutine cancelled.")
-            except TimeoutError:
-                # Tunnel timed out.
-                await self.kill("Connection closed due to inactivity.")
-            else:
-                await self.receive(msg)
             finally:
                 self.waiting = None
         await self.close()
@@ -68,18 +68,29 @@ class TunnelABC(object):
 
 class PetalClientABC(discord.Client):
     __slots__ = (
+        "adb",
+        "archive",
+        "audit",
         "commands",
         "config",
         "db",
         "dev_mode",
         "logLock",
         "loop_tasks",
+        "memberlog",
         "minecraft",
+        "modlog",
+        "outbox",
         "potential_typo",
+        "rt",
+        "scheduler",
         "session_id",
         "startup",
+        "subscriptions",
         "tempBanFlag",
         "tunnels",
+        "waiters",
+        "word_filter",
     )
 
     @property
@@ -118,6 +129,14 @@ class PetalClientABC(discord.Client):
     async def ban_loop(self) -> None:
         ...
 
+    @abstractmethod
+    def schedule_unban(self, uid: str, expires: float) -> None:
+        ...
+
+    @abstractmethod
+    def schedule_reminder(self, entry: dict) -> None:
+        ...
+
     @abstractmethod
     async def close_tunnels_to(self, channel: int) -> None:
         ...
@@ -169,19 +188,21 @@ class PetalClientABC(discord.Client):
         message: str = None,
         *,
         embed: discord.Embed = None,
+        priority: int = 2,
+        wait: bool = True,
         **_
     ) -> Optional[discord.Message]:
         ...
 
     @abstractmethod
     async def log_membership(
-        self, content: str = None, *, embed: discord.Embed = None
+        self, content: str = None, *, embed: discord.Embed = None, wait: bool = True
     ) -> Optional[discord.Message]:
         ...
 
     @abstractmethod
     async def log_moderation(
-        self, content: str = None, *, embed: discord.Embed = None
+        self, content: str = None, *, embed: discord.Embed = None, wait: bool = True
     ) -> Optional[discord.Message]:
         ...
 
@@ -0,0 +1,182 @@
+"""Shared lookups into Guild Audit Logs.
+
+Finding who deleted a Message means reading the Audit Log. During a purge,
+    every deleted Message asks the same question at the same moment, and one
+    fetch per Message soon runs into rate limits. An AuditTail fetches the
+    recent entries of one action in one Guild at most once per window, and
+    indexes them so that every handler in the burst can share the result.
+
+An Entry is matched by its target and Channel, and by how many deletions it
+    accounts for that have not been matched yet. Where more than one Entry
+    could be responsible, the match is reported as ambiguous, rather than
+    guessing at the nearest.
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+from time import monotonic
+from typing import Dict, Hashable, List, NamedTuple, Optional, Tuple
+
+import discord
+
+from ..grasslands import Peacock
+
+log = Peacock()
+
+
+def entry_key(record: discord.AuditLogEntry) -> Hashable:
+    """Return what an Audit Log Entry should be found by. Single deletions are
+        found by the author of the Message and the Channel it was in; Bulk
+        deletions are found by the Channel alone.
+    """
+    if record.action is discord.AuditLogAction.message_bulk_delete:
+        return getattr(record.target, "id", None)
+    return (
+        getattr(record.target, "id", None),
+        getattr(getattr(record.extra, "channel", None), "id", None),
+    )
+
+
+def entry_count(record: discord.AuditLogEntry) -> int:
+    """Return how many Messages an Audit Log Entry accounts for. Discord merges
+        repeated deletions by one Moderator, of one author, in one Channel, into
+        a single Entry, and counts them.
+    """
+    return getattr(record.extra, "count", None) or 1
+
+
+class AuditMatch(NamedTuple):
+    # Whether the Audit Log could be read.
+    ok: bool
+    # The Entry responsible, if exactly one could be.
+    entry: Optional[discord.AuditLogEntry]
+    # Whether more than one Entry could be responsible, so that none is given.
+    ambiguous: bool = False
+
+
+class AuditTail(object):
+    """The recent entries of one action in one Guild."""
+
+    __slots__ = ("fetched", "index", "counts", "unclaimed", "task", "ok")
+
+    def __init__(self):
+        self.fetched: float = 0
+        # Entries which account for a deletion since the previous fetch.
+        self.index: Dict[Hashable, List[discord.AuditLogEntry]] = {}
+        # The count of every Entry as of the last fetch, by Entry ID.
+        self.counts: Dict[int, int] = {}
+        # How many deletions each indexed Entry accounts for that have not yet
+        #   been claimed by a lookup, by Entry ID. Carried over between fetches.
+        self.unclaimed: Dict[int, int] = {}
+        self.task: Optional[asyncio.Future] = None
+        # False if the last fetch was refused, as it will be without the
+        #   permission to view the Audit Log.
+        self.ok: bool = True
+
+
+class AuditCache(object):
+    def __init__(
+        self,
+        *,
+        window: float = 2,
+        horizon: timedelta = timedelta(seconds=10),
+        limit: int = 50,
+    ):
+        """
+        :param window: Seconds for which one fetch answers every lookup.
+        :param horizon: How far back a new entry may be and still be relevant.
+        :param limit: The most entries to read in one fetch.
+        """
+        self.window: float = window
+        self.horizon: timedelta = horizon
+        self.limit: int = limit
+
+        self.tails: Dict[Tuple[int, discord.AuditLogAction], AuditTail] = {}
+        self.fetches: int = 0
+        self.lookups: int = 0
+        self.ambiguous: int = 0
+
+    async def find(
+        self,
+        guild: discord.Guild,
+        action: discord.AuditLogAction,
+        key: Hashable,
+        count: int = None,
+    ) -> AuditMatch:
+        """Find the Audit Log Entry responsible for a deletion, by its key. See
+            `entry_key()` for what the key is.
+
+        An Entry only matches if it is new, or its count has risen, since the
+            previous fetch, and it has not already been claimed by as many
+            deletions. If `count` is given, the Entry must account for exactly
+            that many Messages, as with a bulk deletion. If more than one Entry
+            matches, none of them is returned, and the match is ambiguous.
+        """
+        self.lookups += 1
+        tail = self.tails.get((guild.id, action))
+        if tail is None:
+            tail = self.tails[(guild.id, action)] = AuditTail()
+
+        if tail.task is None and monotonic() - tail.fetched > self.window:
+            tail.task = asyncio.ensure_future(self._fetch(guild, action, tail))
+        if tail.task is not None:
+            # Shielded, so that a cancelled handler does not cancel the fetch
+            #   that the others are waiting on.
+            await asyncio.shield(tail.task)
+
+        if not tail.ok:
+            return AuditMatch(False, None)
+
+        found = []
+        for record in tail.index.get(key, ()):
+            left = tail.unclaimed[record.id]
+            if (left == count) if count else (left >= 1):
+                found.append(record)
+
+        if len(found) > 1:
+            self.ambiguous += 1
+            return AuditMatch(True, None, True)
+        elif found:
+            tail.unclaimed[found[0].id] -= count or 1
+            return AuditMatch(True, found[0])
+        else:
+            return AuditMatch(True, None)
+
+    async def _fetch(
+        self, guild: discord.Guild, action: discord.AuditLogAction, tail: AuditTail
+    ):
+        self.fetches += 1
+        index: Dict[Hashable, List[discord.AuditLogEntry]] = {}
+        counts: Dict[int, int] = {}
+        unclaimed: Dict[int, int] = {}
+        cutoff = datetime.utcnow() - self.horizon
+        try:
+            # Not limited by time: A merged Entry keeps the time it was first
+            #   made, however recently its count rose.
+            async for record in guild.audit_logs(
+                limit=self.limit, oldest_first=False, action=action
+            ):
+                n = counts[record.id] = entry_count(record)
+                if record.id in tail.counts:
+                    new = n - tail.counts[record.id]
+                elif record.created_at >= cutoff:
+                    new = n
+                else:
+                    new = 0
+                # Deletions counted before, but not yet claimed, still stand;
+                #   Their events may arrive more than a window apart.
+                left = tail.unclaimed.get(record.id, 0) + max(new, 0)
+                if left > 0:
+                    unclaimed[record.id] = left
+                    index.setdefault(entry_key(record), []).append(record)
+        except (discord.Forbidden, discord.HTTPException) as e:
+            log.f("Audit", f"Could not read {action} in {guild.id}: {e}")
+            tail.ok = False
+        else:
+            tail.ok = True
+            tail.index = index
+            tail.counts = counts
+            tail.unclaimed = unclaimed
+        finally:
+            tail.fetched = monotonic()
+            tail.task = None
@@ -0,0 +1,77 @@
+"""Small in-memory caching structures shared by various Petal subsystems."""
+
+from collections import OrderedDict
+from time import monotonic
+from typing import Dict, Generic, Hashable, Optional, Tuple, TypeVar
+
+
+T = TypeVar("T")
+
+
+class TTLCache(Generic[T]):
+    """A bounded Least-Recently-Used cache whose entries also expire after a
+        set number of seconds.
+
+    Counts hits and misses so that it can be sized sensibly.
+    """
+
+    def __init__(self, maxsize: int = 512, ttl: float = 300):
+        self.maxsize: int = maxsize
+        self.ttl: float = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, T]]" = OrderedDict()
+
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._data.get(key)
+        return entry is not None and entry[0] > monotonic()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: T = None) -> Optional[T]:
+        entry = self._data.get(key)
+
+        if entry is None:
+            self.misses += 1
+            return default
+
+        expires, value = entry
+        if expires <= monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: T, ttl: float = None):
+        expires = monotonic() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (expires, value)
+        self._data.move_to_end(key)
+
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    @property
+    def ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "ratio": self.ratio,
+        }
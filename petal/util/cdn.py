@@ -1,15 +1,36 @@
-"""Module dedicated to accessing the Avatar CDN."""
+"""Module dedicated to accessing the Avatar CDN.
 
-from typing import Dict, NewType, Union
+Discord Asset URLs expire when a User changes their Avatar, so log Embeds point
+    to copies on the Petal Mirror instead, where one exists. Which Assets have
+    been mirrored is kept in a small SQLite index, so that it survives restarts,
+    and in memory, so that looking one up never waits on anything. Changes to
+    the index are committed by a background thread.
+
+Assets which are not mirrored yet are uploaded from a background queue, by a
+    fixed number of workers. The Discord URL is used until the upload is done.
+    An Asset which fails to upload is not tried again for a short while.
+"""
+
+import asyncio
+import queue
+import sqlite3
+import threading
+from collections import OrderedDict
+from time import time
+from typing import Any, Dict, List, NewType, Optional, Set, Tuple, Union
 from urllib.parse import ParseResult, urlparse
 
 import discord
-import requests
 
 from ..config import cfg
 from ..exceptions import ConfigError
+from ..grasslands import Peacock
+from .cache import TTLCache
+from .http import Response, http
+
+__all__ = ["Mirror", "MirrorIndex", "get_asset", "get_avatar", "mirror"]
 
-__all__ = ["get_asset", "get_avatar"]
+log = Peacock()
 
 
 # Typing to keep the domains separate.
@@ -18,77 +39,297 @@ DiscordURL: type = NewType("Discord URL", URL)
 PetalURL: type = NewType("Petal URL", URL)
 
 
-CACHE: Dict[DiscordURL, URL] = {}
+class MirrorIndex(object):
+    """A persistent, size-bounded mapping of Discord URLs to Mirror URLs. The
+        whole index is held in memory as well, in least recently used order, so
+        that lookups never touch the disk. Writes are put on a queue and
+        committed by a background thread, so that storing never waits on it
+        either.
+    """
 
+    def __init__(self, path: str, max_entries: int = 10000):
+        self.max_entries: int = max_entries
+        self.entries: "OrderedDict[DiscordURL, URL]" = OrderedDict()
+        self.queue: "queue.SimpleQueue[Optional[Tuple[str, Any]]]" = queue.SimpleQueue()
 
-def cdn_save(url: DiscordURL, dest: PetalURL = None) -> PetalURL:
-    """Given a Discord Asset URL, send a PUT Request to save the Asset on the CDN.
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS mirror"
+            " (discord TEXT PRIMARY KEY, url TEXT NOT NULL, used REAL NOT NULL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS mirror_used ON mirror (used)")
 
-    Raise an Exception if unsuccessful.
-    """
-    dest: PetalURL = convert(url) if dest is None else dest
-
-    response: requests.Response = requests.get(url)
-    if response:
-        data = response.content
-        saved: requests.Response = requests.put(dest, data)
-        if saved:
-            return dest
+        # Drop anything beyond the bound, in case it was lowered since.
+        with self.db:
+            self.db.execute(
+                "DELETE FROM mirror WHERE discord NOT IN"
+                " (SELECT discord FROM mirror ORDER BY used DESC LIMIT ?)",
+                (max_entries,),
+            )
+        for discord_url, url in self.db.execute(
+            "SELECT discord, url FROM mirror ORDER BY used ASC"
+        ):
+            self.entries[discord_url] = url
+
+        self._thread = threading.Thread(target=self.run, name="CDN Index", daemon=True)
+        self._thread.start()
+
+    def __contains__(self, url: DiscordURL) -> bool:
+        return url in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, url: DiscordURL) -> Optional[URL]:
+        found = self.entries.get(url)
+        if found is not None:
+            # Recency is only tracked in memory. It is written to disk the next
+            #   time this entry is stored, which is enough to order evictions.
+            self.entries.move_to_end(url)
+        return found
+
+    def put(self, url: DiscordURL, mirrored: URL):
+        self.entries[url] = mirrored
+        self.entries.move_to_end(url)
+        self.queue.put(("put", (url, mirrored, time())))
+
+        excess: List[DiscordURL] = []
+        while len(self.entries) > self.max_entries:
+            excess.append(self.entries.popitem(last=False)[0])
+        if excess:
+            self.queue.put(("evict", [(u,) for u in excess]))
+
+    def close(self):
+        """Commit everything still queued, and stop the thread."""
+        if self._thread.is_alive():
+            self.queue.put(None)
+            self._thread.join(10)
+        self.db.close()
+
+    def run(self):
+        while True:
+            batch = [self.queue.get()]
+            try:
+                while True:
+                    batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            try:
+                self.write([op for op in batch if op is not None])
+            except sqlite3.Error as e:
+                log.err(f"CDN index write FAILED: {type(e).__name__}: {e}")
+
+            if None in batch:
+                return
+
+    def write(self, batch: List[Tuple[str, Any]]):
+        with self.db:
+            for op, data in batch:
+                if op == "put":
+                    self.db.execute(
+                        "INSERT OR REPLACE INTO mirror (discord, url, used)"
+                        " VALUES (?, ?, ?)",
+                        data,
+                    )
+                elif op == "evict":
+                    self.db.executemany("DELETE FROM mirror WHERE discord = ?", data)
+
+
+class Mirror(object):
+    """Upload Discord Assets to the Petal Mirror in the background."""
+
+    def __init__(
+        self,
+        index: Optional[MirrorIndex],
+        endpoint: Optional[str],
+        *,
+        workers: int = 4,
+        queue: int = 256,
+        retry_after: float = 300,
+    ):
+        """
+        :param index: Where to record which Assets have been mirrored, or None
+            if nothing is mirrored.
+        :param endpoint: The address of the Mirror, or None to mirror nothing.
+        :param workers: How many uploads to run at once.
+        :param queue: How many Assets may wait to be uploaded.
+        :param retry_after: Seconds to wait before trying an Asset again, after
+            it has failed to upload.
+        """
+        self.index: Optional[MirrorIndex] = index
+        self.endpoint: Optional[str] = endpoint
+        self.workers: int = workers
+
+        self.queue: Optional[asyncio.Queue] = None
+        self.pending: Set[DiscordURL] = set()
+        self.tasks: List[asyncio.Task] = []
+        self._maxsize: int = queue
+
+        # Assets which recently failed to upload, so that an Asset which is
+        #   gone, or a Mirror which is down, is not retried on every lookup.
+        self.recent_failures: TTLCache[bool] = TTLCache(queue, retry_after)
+
+        self.mirrored: int = 0
+        self.failed: int = 0
+        self.dropped: int = 0
+
+    @classmethod
+    def from_config(cls) -> "Mirror":
+        opts = cfg.doc.get("cdnMirror") or {}
+        endpoint: Optional[str] = (cfg.doc.get("api") or {}).get("cdn")
+        return cls(
+            # Without a Mirror there is nothing to index, so do not open one.
+            MirrorIndex(
+                opts.get("index", "cdn_index.sqlite3"), opts.get("maxEntries", 10000)
+            )
+            if endpoint is not None
+            else None,
+            endpoint,
+            workers=opts.get("workers", 4),
+            queue=opts.get("queue", 256),
+            retry_after=opts.get("retryAfter", 300),
+        )
+
+    def convert(self, url: DiscordURL) -> PetalURL:
+        """Given a URL to the Discord CDN, convert it into the Petal Mirror.
+
+        https://images-ext-2.discordapp.net/external/EYKxsyQBGXDjUBnfgqdaGqzT0kov7_rxRSe53PGqrNU/%3Fsize%3D1024/https/cdn.discordapp.com/avatars/106605138893889536/8fc0478f11a6f5adf6a1e970c658cded.webp
+        ->
+        https://{Address of CDN}/avatars/106605138893889536/8fc0478f11a6f5adf6a1e970c658cded.webp
+        """
+        if self.endpoint is None:
+            raise ConfigError("CDN API URL")
         else:
+            parts: ParseResult = urlparse(str(url))
+            # noinspection PyProtectedMember
+            return PetalURL(parts._replace(netloc=self.endpoint).geturl())
+
+    def lookup(self, url: DiscordURL) -> URL:
+        """Return the Mirror URL of an Asset if it has one. Otherwise, queue it
+            to be mirrored, and return the Discord URL. This never waits.
+        """
+        if self.index is None:
+            return url
+
+        found = self.index.get(url)
+        if found is not None:
+            return found
+
+        if (
+            self.endpoint is not None
+            and url not in self.pending
+            and url not in self.recent_failures
+        ):
+            self._start()
+            try:
+                self.queue.put_nowait(url)
+            except asyncio.QueueFull:
+                # It will be asked for again the next time it is seen.
+                self.dropped += 1
+            else:
+                self.pending.add(url)
+
+        return url
+
+    def _start(self):
+        # The Queue has to be created inside the running event loop.
+        if self.queue is None:
+            self.queue = asyncio.Queue(self._maxsize)
+            self.tasks = [
+                asyncio.ensure_future(self._work()) for _ in range(self.workers)
+            ]
+
+    async def _work(self):
+        while True:
+            url: DiscordURL = await self.queue.get()
+            try:
+                await self.save(url)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # The Discord URL will continue to be used.
+                self.failed += 1
+                self.recent_failures.put(url, True)
+                log.f("CDN", f"Could not mirror {url}: {type(e).__name__}: {e}")
+            finally:
+                self.pending.discard(url)
+                self.queue.task_done()
+
+    async def save(self, url: DiscordURL) -> URL:
+        """Mirror an Asset if the Mirror does not already have it, and record
+            it in the index. Raise an Exception if unsuccessful.
+        """
+        dest: PetalURL = self.convert(url)
+
+        exists: Response = await http.request("HEAD", dest, retries=0)
+        if not exists:
+            response: Response = await http.get(url, cache=0)
+            response.raise_for_status()
+            saved: Response = await http.put(dest, data=response.content)
             saved.raise_for_status()
-    else:
-        response.raise_for_status()
 
+        if self.index is not None:
+            self.index.put(url, dest)
+        self.mirrored += 1
+        return dest
 
-def convert(url: DiscordURL) -> PetalURL:
-    """Given a URL to the Discord CDN, convert it into the Petal Mirror.
+    def stats(self) -> Dict[str, int]:
+        return {
+            "indexed": len(self.index) if self.index is not None else 0,
+            "queued": self.queue.qsize() if self.queue is not None else 0,
+            "mirrored": self.mirrored,
+            "failed": self.failed,
+            "dropped": self.dropped,
+        }
 
-    https://images-ext-2.discordapp.net/external/EYKxsyQBGXDjUBnfgqdaGqzT0kov7_rxRSe53PGqrNU/%3Fsize%3D1024/https/cdn.discordapp.com/avatars/106605138893889536/8fc0478f11a6f5adf6a1e970c658cded.webp
-    ->
-    https://{Address of CDN}/avatars/106605138893889536/8fc0478f11a6f5adf6a1e970c658cded.webp
-    """
-    endpoint = cfg.get("api/cdn")
-    if endpoint is None:
-        raise ConfigError("CDN API URL")
-    else:
-        parts: ParseResult = urlparse(str(url))
-        # noinspection PyProtectedMember
-        return PetalURL(parts._replace(netloc=endpoint).geturl())
+    async def close(self):
+        for task in self.tasks:
+            task.cancel()
+        # Let the workers finish being cancelled before the index goes away.
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        if self.index is not None:
+            self.index.close()
 
 
-def get_asset(url_discord: DiscordURL) -> URL:
-    """Given the URL of a Discord Asset, find it in the Mirror CDN. If it is not
-        there, upload it and return the Mirror URL. If it cannot be uploaded,
-        return the Discord URL.
+_mirror: Optional[Mirror] = None
+
+
+def mirror() -> Mirror:
+    """Return the shared Mirror, creating it on first use, after the Config has
+        been loaded.
     """
-    if url_discord in CACHE:
-        return CACHE[url_discord]
+    global _mirror
+    if _mirror is None:
+        _mirror = Mirror.from_config()
+    return _mirror
 
-    else:
-        url_cdn: PetalURL = convert(url_discord)
 
-        req: requests.Response = requests.get(url_cdn)
-        if req:
-            # File exists on CDN. Return.
-            url = url_cdn
-        else:
-            # File does NOT exist on CDN. Add it.
-            url = cdn_save(url_discord, url_cdn)
+async def close():
+    if _mirror is not None:
+        await _mirror.close()
 
-        while len(CACHE) >= 15:
-            del CACHE[list(CACHE)[0]]
 
-        CACHE[url_discord] = url
-        return url
+async def get_asset(url_discord: DiscordURL) -> URL:
+    """Given the URL of a Discord Asset, find it in the Mirror CDN. If it is not
+        there, upload it and return the Mirror URL. If it cannot be uploaded,
+        raise an Exception.
+    """
+    url_discord = DiscordURL(str(url_discord))
+    m = mirror()
+    found = m.index.get(url_discord) if m.index is not None else None
+    return found or await m.save(url_discord)
 
 
 def get_avatar(user: Union[discord.Member, discord.User]) -> URL:
     """Given a Discord Member/User, check their Avatar URL, and then, if
         possible, get a Mirror of it from the Bot CDN.
+
+    This never waits on the CDN. If the Avatar has not been mirrored yet, the
+        Discord URL is returned, and the Mirror is made in the background for
+        next time.
     """
-    url_discord: DiscordURL = user.avatar_url
-    try:
-        return get_asset(url_discord)
-    except:
-        # If anything goes wrong, return Discord URL.
-        return url_discord
+    return mirror().lookup(DiscordURL(str(user.avatar_url)))
@@ -0,0 +1,254 @@
+"""Shared asynchronous HTTP client.
+
+Every outbound HTTP request should go through the `http` instance here, rather
+    than through `requests`, which would block the event loop for the whole
+    length of the request. Connections are pooled per host, requests are
+    retried with exponential backoff, and GET responses may be cached.
+"""
+
+import asyncio
+import json
+from time import monotonic
+from typing import Dict, Mapping, Optional, Tuple
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from ..grasslands import Peacock
+from .cache import TTLCache
+
+__all__ = ["HTTPClient", "HTTPError", "Response", "http"]
+
+log = Peacock()
+
+# Status codes which are worth trying again.
+RETRY_STATUS = frozenset((429, 500, 502, 503, 504))
+# Methods which are safe to send twice. Others are not retried by default.
+IDEMPOTENT = frozenset(("DELETE", "GET", "HEAD", "OPTIONS", "PUT"))
+
+
+class HTTPError(IOError):
+    """Raised by `Response.raise_for_status()` for an unsuccessful Response."""
+
+    def __init__(self, response: "Response"):
+        super().__init__(f"{response.status_code} for URL: {response.url}")
+        self.response: Response = response
+
+
+class Response(object):
+    """A completed Response, read in full. Provides the parts of the interface
+        of `requests.Response` that Petal uses, so that call sites can move
+        over without changing how they handle results.
+    """
+
+    __slots__ = ("url", "status_code", "headers", "content", "from_cache")
+
+    def __init__(
+        self,
+        url: str,
+        status_code: int,
+        headers: Mapping[str, str],
+        content: bytes,
+        from_cache: bool = False,
+    ):
+        self.url: str = url
+        self.status_code: int = status_code
+        self.headers: Mapping[str, str] = headers
+        self.content: bytes = content
+        self.from_cache: bool = from_cache
+
+    def __bool__(self) -> bool:
+        return self.ok
+
+    def __repr__(self) -> str:
+        return f"<Response [{self.status_code}]>"
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", "replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise HTTPError(self)
+
+    def cached(self) -> "Response":
+        return Response(
+            self.url, self.status_code, self.headers, self.content, from_cache=True
+        )
+
+
+def max_age(headers: Mapping[str, str]) -> Optional[float]:
+    """Read the lifetime that a Response allows itself to be cached for. Return
+        None if it does not say.
+    """
+    control = headers.get("Cache-Control", "").lower()
+    if "no-store" in control or "no-cache" in control:
+        return 0
+    for directive in control.split(","):
+        name, _, value = directive.strip().partition("=")
+        if name == "max-age" and value.isdigit():
+            return float(value)
+    return None
+
+
+class HostStats(object):
+    __slots__ = ("requests", "failures", "retries", "total", "last")
+
+    def __init__(self):
+        self.requests: int = 0
+        self.failures: int = 0
+        self.retries: int = 0
+        self.total: float = 0
+        self.last: float = 0
+
+    def record(self, elapsed: float):
+        self.requests += 1
+        self.total += elapsed
+        self.last = elapsed
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "requests": self.requests,
+            "failures": self.failures,
+            "retries": self.retries,
+            "mean_ms": 1000 * self.total / self.requests if self.requests else 0,
+            "last_ms": 1000 * self.last,
+        }
+
+
+class HTTPClient(object):
+    def __init__(
+        self,
+        *,
+        limit_per_host: int = 8,
+        timeout: float = 15,
+        retries: int = 2,
+        backoff: float = 0.5,
+        max_backoff: float = 30,
+        cache_size: int = 256,
+    ):
+        self.limit_per_host: int = limit_per_host
+        self.timeout: float = timeout
+        self.retries: int = retries
+        self.backoff: float = backoff
+        # The longest wait between attempts, whatever a server asks for.
+        self.max_backoff: float = max_backoff
+
+        self.cache: TTLCache[Response] = TTLCache(cache_size, 0)
+        self.hosts: Dict[str, HostStats] = {}
+
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        # The Session has to be created inside the running event loop.
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit_per_host=self.limit_per_host, ttl_dns_cache=300
+                ),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return {host: s.as_dict() for host, s in sorted(self.hosts.items())}
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        params: Mapping[str, str] = None,
+        headers: Mapping[str, str] = None,
+        data=None,
+        cache: float = None,
+        retries: int = None,
+    ) -> Response:
+        """Send a Request and read its Response in full.
+
+        GET Responses are cached for as long as their Cache-Control header
+            allows. If `cache` is given, it overrides the header; Pass zero to
+            never cache.
+
+        Connection failures and retryable status codes are tried again, up to
+            `retries` times, with exponential backoff, or after the delay in a
+            Retry-After header, but never waiting longer than `max_backoff`. By
+            default, only idempotent methods are retried. If the connection
+            still fails, ConnectionError is raised; An unsuccessful status is
+            returned like any other Response.
+        """
+        method = method.upper()
+        key: Optional[Tuple] = None
+        if method == "GET" and cache != 0:
+            key = (url, tuple(sorted((params or {}).items())))
+            hit = self.cache.get(key)
+            if hit is not None:
+                return hit
+
+        host = urlsplit(url).netloc
+        stats = self.hosts.setdefault(host, HostStats())
+        if retries is None:
+            retries = self.retries if method in IDEMPOTENT else 0
+
+        attempt = 0
+        while True:
+            start = monotonic()
+            try:
+                async with self.session.request(
+                    method, url, params=params, headers=headers, data=data
+                ) as resp:
+                    response = Response(
+                        str(resp.url), resp.status, resp.headers, await resp.read()
+                    )
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                stats.failures += 1
+                if attempt >= retries:
+                    raise ConnectionError(f"{method} {url} failed: {e}") from e
+                delay = self.backoff * 2 ** attempt
+            else:
+                stats.record(monotonic() - start)
+                if response.status_code not in RETRY_STATUS or attempt >= retries:
+                    break
+                retry_after = response.headers.get("Retry-After", "")
+                delay = (
+                    float(retry_after)
+                    if retry_after.isdigit()
+                    else self.backoff * 2 ** attempt
+                )
+
+            delay = min(delay, self.max_backoff)
+            attempt += 1
+            stats.retries += 1
+            log.f("HTTP", f"Retrying {method} {host} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+        if key is not None and response.ok:
+            ttl = max_age(response.headers) if cache is None else cache
+            if ttl:
+                self.cache.put(key, response.cached(), ttl)
+
+        return response
+
+    async def get(self, url: str, **kw) -> Response:
+        return await self.request("GET", url, **kw)
+
+    async def post(self, url: str, **kw) -> Response:
+        return await self.request("POST", url, **kw)
+
+    async def put(self, url: str, **kw) -> Response:
+        return await self.request("PUT", url, **kw)
+
+
+http = HTTPClient()
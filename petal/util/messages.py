@@ -1,7 +1,9 @@
 """Module dedicated to utilities concerning Discord Messages."""
 
-from dataclasses import dataclass
-from typing import Any, AsyncIterator, Callable, Generator, List, TypeVar
+import asyncio
+import heapq
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Callable, List, Optional, TypeVar
 
 import discord
 
@@ -10,11 +12,31 @@ from ..checks import Messages
 
 T = TypeVar("T")
 
+_END = object()
 
-@dataclass
-class Pair:
-    iterator: AsyncIterator
-    last: T
+
+class Reverse(object):
+    """Invert the ordering of a value, so that a min-heap yields the largest
+        first. Works for values which cannot be negated, such as datetimes.
+    """
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other: "Reverse") -> bool:
+        return other.value < self.value
+
+    def __eq__(self, other: "Reverse") -> bool:
+        return self.value == other.value
+
+
+async def _next(iterator: AsyncIterator[T]):
+    try:
+        return await iterator.__anext__()
+    except StopAsyncIteration:
+        return _END
 
 
 async def aitermux(
@@ -28,66 +50,161 @@ async def aitermux(
         outputs sorted by some Key Function.
 
     The only caveat with this is that each Iterator must yield at least one
-        value before the Generator can yield any at all.
+        value before the Generator can yield any at all. The first values are
+        awaited concurrently, and after that, the next value is picked from a
+        heap, so each one costs O(log k) for k Iterators.
     """
-    limited: bool = limit > 0
-
-    # To make the Multiplexer transparent, we must wrap the Key Function so that
-    #   it will operate on a Pair containing a value, not the value itself.
-    def key_true(pair: Pair) -> Any:
-        return key(pair.last)
-
-    # Associate Iterators with their most recent Yields.
-    lasts: List[Pair] = []
-    for ITER in iters:
-        try:
-            # Get the first Value from each Iterator.
-            p = await ITER.__anext__()
-        except StopAsyncIteration:
-            continue
-        else:
-            # Store it in a Dataclass next to the Iterator from whence it came.
-            lasts.append(Pair(ITER, p))
-
-    # Evaluate Reversal outside the Loop.
-    cmp: Callable[..., T] = max if reverse else min
-    while lasts and (not limited or limit > 0):
-        next_: Pair = cmp(lasts, key=key_true)
-        yield next_.last
-
-        try:
-            next_.last = await next_.iterator.__anext__()
-        except StopAsyncIteration:
+    wrap: Callable[[Any], Any] = Reverse if reverse else (lambda x: x)
+
+    firsts = await asyncio.gather(*(_next(it) for it in iters))
+    # The index breaks ties, so that values themselves are never compared.
+    heap = [(wrap(key(v)), i, v) for i, v in enumerate(firsts) if v is not _END]
+    heapq.heapify(heap)
+
+    count = 0
+    while heap and (limit <= 0 or count < limit):
+        _, i, value = heap[0]
+        yield value
+        count += 1
+
+        following = await _next(iters[i])
+        if following is _END:
             if shortest:
                 # We have been told to stop once the shortest is exhausted.
                 break
             else:
                 # Everything must go.
-                lasts.remove(next_)
+                heapq.heappop(heap)
         else:
-            limit -= 1
+            heapq.heapreplace(heap, (wrap(key(following)), i, following))
+
+
+def last_active(channel: discord.TextChannel) -> Optional[datetime]:
+    if channel.last_message_id is None:
+        return None
+    return discord.utils.snowflake_time(channel.last_message_id)
 
 
-def member_message_history(
+async def member_message_history(
     member: discord.Member,
     *,
     limit: int = 0,
-    before=None,
-    after=None,
-    around=None,
-    oldest_first: bool = None,
+    before: datetime = None,
+    after: datetime = None,
+    oldest_first: bool = False,
+    window: timedelta = timedelta(days=1),
+    concurrency: int = 4,
 ) -> AsyncIterator[discord.Message]:
-    iters: Generator[Generator[discord.Message]] = (
-        (
-            msg
-            async for msg in channel.history(
-                before=before, after=after, around=around, oldest_first=oldest_first
+    """Yield the Messages of a Member from every Text Channel in their Guild
+        which Petal can read, newest first unless `oldest_first` is set.
+
+    History is read in windows of time, starting at one end of the range. Each
+        window is read from every Channel at once, at most `concurrency` at a
+        time, and the results are merged in order. Since the windows do not
+        overlap, the scan stops as soon as `limit` Messages have been found.
+        Windows double in length while they turn up too little, so that a
+        quiet Member does not take a great many small windows to reach.
+
+    Within a window, the Channels share the times of the best Messages found
+        so far. Once enough have been found to fill the limit, a Channel stops
+        reading as soon as it passes the last of them, and a Channel which
+        cannot have anything better is not read at all.
+    """
+    guild: discord.Guild = member.guild
+    channels = [
+        c
+        for c in guild.text_channels
+        if c.permissions_for(guild.me).read_message_history
+    ]
+    if not channels:
+        return
+
+    floor: datetime = after or min(c.created_at for c in channels)
+    ceiling: datetime = before or datetime.utcnow()
+    sem = asyncio.Semaphore(concurrency)
+    # Wrapped so that the Message furthest from where reading starts is always
+    #   the least, and sits at the top of a heap.
+    wrap: Callable[[datetime], Any] = Reverse if oldest_first else (lambda x: x)
+
+    async def scan(
+        channel: discord.TextChannel,
+        lo: datetime,
+        hi: datetime,
+        best: List[Any],
+        wanted: int,
+    ) -> List[discord.Message]:
+        """Read the Messages of the Member in one Channel in one window. `best`
+            is a heap of the times of the `wanted` best Messages found so far
+            in the window, by any Channel.
+        """
+
+        def beaten(when: datetime) -> bool:
+            return 0 < wanted <= len(best) and wrap(when) < best[0]
+
+        async with sem:
+            # The first Message this Channel could give, in reading order.
+            if oldest_first:
+                start = max(lo, channel.created_at)
+            else:
+                start = min(hi, last_active(channel) or hi)
+            if beaten(start):
+                return []
+
+            out = []
+            try:
+                async for msg in channel.history(
+                    limit=None, after=lo, before=hi, oldest_first=oldest_first
+                ):
+                    if beaten(msg.created_at):
+                        # Everything after this is further away still.
+                        break
+                    if msg.author.id == member.id:
+                        out.append(msg)
+                        if wanted > 0:
+                            heapq.heappush(best, wrap(msg.created_at))
+                            if len(best) > wanted:
+                                heapq.heappop(best)
+            except discord.HTTPException:
+                pass
+            return out
+
+    found = 0
+    span = window
+    # The end of the range which has not been read yet.
+    edge = floor if oldest_first else ceiling
+    while (edge < ceiling if oldest_first else edge > floor) and (
+        limit <= 0 or found < limit
+    ):
+        if oldest_first:
+            lo, hi = edge, min(edge + span, ceiling)
+            edge = hi
+        else:
+            lo, hi = max(edge - span, floor), edge
+            edge = lo
+
+        # Skip Channels which did not exist yet, or fell silent before this.
+        best: List[Any] = []
+        wanted = limit - found if limit > 0 else 0
+        batches = await asyncio.gather(
+            *(
+                scan(c, lo, hi, best, wanted)
+                for c in channels
+                if c.created_at < hi and (last_active(c) or hi) >= lo
             )
-            if msg.author == member
         )
-        for channel in member.guild.text_channels
-    )
-    return aitermux(*iters, key=(lambda o: o.created_at), limit=limit, reverse=True)
+
+        in_window = 0
+        for msg in heapq.merge(
+            *batches, key=(lambda m: m.created_at), reverse=not oldest_first
+        ):
+            yield msg
+            found += 1
+            in_window += 1
+            if 0 < limit <= found:
+                return
+
+        if limit <= 0 or in_window < limit - found:
+            span *= 2
 
 
 async def read_messages(
@@ -16,16 +16,18 @@ from asyncio import sleep
 from contextlib import contextmanager
 from datetime import datetime as dt
 import json
+import os
 from pathlib import Path
+from tempfile import NamedTemporaryFile
 from typing import Dict, Iterable, Iterator, List, Tuple, Union
 from uuid import UUID
 
 from discord import Embed
-import requests
 
 from ..exceptions import WhitelistError
 from ..grasslands import Peacock
 from .fmt import bold, escape, italic, mono, underline, userline
+from .http import http
 from petal.config import cfg
 from petal.types import PetalClientABC
 
@@ -90,6 +92,23 @@ SUSPEND: str = bold(mono("#!# SUSPENDED #!#"))
 # ) or
 
 
+def atomic_write(path: Path, text: str):
+    """Write a File by way of a temporary sibling, so that a crash part way
+        through never leaves it truncated.
+    """
+    with NamedTemporaryFile(
+        "w", dir=path.parent or ".", prefix=path.name, suffix=".tmp", delete=False
+    ) as fd:
+        fd.write(text)
+        fd.flush()
+        os.fsync(fd.fileno())
+    try:
+        os.replace(fd.name, path)
+    except OSError:
+        os.unlink(fd.name)
+        raise
+
+
 def find(data: type_db, *params: str) -> Iterator[type_entry_db]:
     return (
         entry
@@ -125,9 +144,9 @@ class IDMC(object):
         return sep.join(format(i, "x") for i in uuid)
 
     @classmethod
-    def from_name(cls, name: str):
+    async def from_name(cls, name: str):
         """Given a Minecraft Username, get its UUID."""
-        response = requests.get(
+        response = await http.get(
             f"https://api.mojang.com/users/profiles/minecraft/{name.lower()}"
         )
         log.f("WLME_RESP", str(response))
@@ -182,17 +201,17 @@ def make_lists(data: type_db, refresh: bool = False) -> Tuple[type_db, type_db]:
     return wl, op
 
 
-def new_entry(
+async def new_entry(
     uuid_discord: int, *, uuid_mc: str = None, name_mc: str = None
 ) -> type_entry_db:
     if uuid_mc is None and name_mc is None:
         raise TypeError("Entry requires either Username or UUID.")
     elif uuid_mc is None:
         # print(id_from_name(name_mc))
-        uuid_mc = IDMC.from_name(name_mc)
+        uuid_mc = await IDMC.from_name(name_mc)
 
     new = PLAYERDEFAULT.copy()
-    hist = requests.get(
+    hist = await http.get(
         f"https://api.mojang.com/user/profiles/{uuid_mc.replace('-', '')}/names"
     )
 
@@ -219,7 +238,7 @@ def try_int(inp: str) -> Union[int, str]:
 async def refresh_entry(old: type_entry_db) -> type_entry_db:
     await sleep(1)
     try:
-        new = new_entry(try_int(old["discord"]), uuid_mc=old["uuid"])
+        new = await new_entry(try_int(old["discord"]), uuid_mc=old["uuid"])
         new["approved"] = [try_int(a) for a in old["approved"]]
         new["submitted"] = old["submitted"]
         new["suspended"] = old["suspended"] or 0
@@ -258,11 +277,9 @@ class Interface(object):
 
         return data
 
-    def db_write(self, data: type_db):
+    def db_write(self, text: str):
         try:
-            with self.path_db.open("w") as fd:
-                # Save all the things.
-                json.dump(data, fd, indent=2)
+            atomic_write(self.path_db, text)
 
         except OSError as e:
             # Cannot write file: Well this was all rather pointless.
@@ -273,22 +290,20 @@ class Interface(object):
         wl, op = make_lists(data)
 
         try:
-            with self.path_wl.open("w") as fd:
-                json.dump(wl, fd, indent=2)
+            atomic_write(self.path_wl, json.dumps(wl, indent=2))
 
         except OSError as e:
             log.err(f"OSError on WL save: {e}")
             raise WhitelistError("Cannot write Whitelist file.") from e
 
         try:
-            with self.path_op.open("w") as fd:
-                json.dump(op, fd, indent=2)
+            atomic_write(self.path_op, json.dumps(op, indent=2))
 
         except OSError as e:
             log.err(f"OSError on OP save: {e}")
             raise WhitelistError("Cannot write Operators file.") from e
 
-    def whitelist_rebuild(self, refreshall=False, refreshnet=False) -> int:
+    async def whitelist_rebuild(self, refreshall=False, refreshnet=False) -> int:
         """Export the local database into the whitelist file itself. If Mojang
             ever changes the format of the server whitelist file, this is the
             function that will need to be updated.
@@ -318,7 +333,7 @@ class Interface(object):
 
                 if refreshnet:
                     # Stage 3, optional: Rebuild username history.
-                    name_history = requests.get(
+                    name_history = await http.get(
                         "https://api.mojang.com/user/profiles/{}/names".format(
                             applicant["uuid"].replace("-", "")
                         )
@@ -376,6 +391,92 @@ class Interface(object):
         return 1
 
 
+class PlayerDB(object):
+    """The PlayerDB, held in memory, with hash indexes on the fields that are
+        searched: Discord ID, dashless Mojang UUID, and lowercased past names.
+
+    The File is read once, and read again only if its modification time
+        changes. It is written only when the data has been marked as changed.
+    """
+
+    def __init__(self, interface: Interface):
+        self.interface: Interface = interface
+
+        self.data: type_db = None
+        self._mtime: float = None
+        # Set when the data may differ from the File.
+        self.dirty: bool = False
+        # Set when the data may differ from the indexes.
+        self.stale: bool = False
+
+        self._pos: Dict[int, int] = {}
+        self._by_discord: Dict[str, List[type_entry_db]] = {}
+        self._by_uuid: Dict[str, List[type_entry_db]] = {}
+        self._by_name: Dict[str, List[type_entry_db]] = {}
+
+    def _stat(self) -> float:
+        try:
+            return self.interface.path_db.stat().st_mtime
+        except OSError:
+            return None
+
+    def load(self) -> type_db:
+        """Return the resident data, reading the File if it has not been read
+            yet, or if it was changed by something else since.
+        """
+        mtime = self._stat()
+        if self.data is None or mtime != self._mtime:
+            self.data = self.interface.db_read()
+            self._mtime = mtime
+            self.dirty = False
+            self.reindex()
+        return self.data
+
+    def reindex(self):
+        self.stale = False
+        self._pos = {}
+        self._by_discord = {}
+        self._by_uuid = {}
+        self._by_name = {}
+
+        for i, entry in enumerate(self.data):
+            self._pos[id(entry)] = i
+            self._by_discord.setdefault(str(entry.get("discord")), []).append(entry)
+            self._by_uuid.setdefault(
+                entry["uuid"].lower().replace("-", ""), []
+            ).append(entry)
+            for name in {n.lower() for n in entry["altname"]}:
+                self._by_name.setdefault(name, []).append(entry)
+
+    def find(self, *params: str) -> Iterator[type_entry_db]:
+        """Yield each Entry matching any Parameter, in File order. This is
+            equivalent to `find()`, but does not scan the data.
+        """
+        found: Dict[int, type_entry_db] = {}
+        for p in params:
+            for entry in (
+                *self._by_discord.get(p, ()),
+                *self._by_uuid.get(p.lower().replace("-", ""), ()),
+                *self._by_name.get(p.lower(), ()),
+            ):
+                found[id(entry)] = entry
+
+        return iter(sorted(found.values(), key=lambda e: self._pos.get(id(e), -1)))
+
+    def save(self) -> bool:
+        """Write the data to the File if it has been marked as changed. Return
+            True if it was written.
+        """
+        if self.data is None or not self.dirty:
+            return False
+
+        self.interface.db_write(json.dumps(self.data, indent=2))
+        self.dirty = False
+        self._mtime = self._stat()
+        self.reindex()
+        return True
+
+
 class Minecraft(object):
     suspensions = minecraft_suspension
 
@@ -384,7 +485,9 @@ class Minecraft(object):
         self.interface = Interface(self.client)
 
         self._ctxs: int = 0
-        self._db = None
+        # Number of open Contexts yielding the whole, writable, data.
+        self._writers: int = 0
+        self.players = PlayerDB(self.interface)
 
     def card(
         self,
@@ -441,7 +544,7 @@ class Minecraft(object):
             db.extend(entries)
 
     def export(self):
-        with self.db() as db:
+        with self.db(readonly=True) as db:
             self.interface.export(db)
 
     async def rebuild(self):
@@ -450,32 +553,50 @@ class Minecraft(object):
             # self.interface.db_write(self._db)
 
     def user_has_op(self, user, op: int) -> bool:
-        with self.db(str(user.id)) as db:
-            allow = any(e["operator"] >= op for e in db)
-        return allow
+        # Read-only, so this does not need to go through the Context Manager.
+        self.players.load()
+        return any(e["operator"] >= op for e in self.players.find(str(user.id)))
 
     @contextmanager
-    def db(self, *params: str) -> type_db:
+    def db(self, *params: str, readonly: bool = False) -> type_db:
         """Context Manager: Yield the Users Database, potentially filtered. Data
             within the yielded List is mutable, and changes made to Entries will
             be saved to the File after the Context Manager closes.
 
         If no Parameters were provided, the initially-yielded List will be what
-            is written to the File, and can thus be used to add new Entries.
+            is written to the File, and can thus be used to add new Entries. If
+            Parameters were provided, only the Entries found are checked for
+            changes. Either way, nothing is checked if `readonly` is set, and
+            the File is only written once the outermost Context closes.
         """
         self._ctxs += 1
+        view: type_db = None
+        before: str = None
         try:
-            if self._db is None:
-                self._db = self.interface.db_read()
-
-            if params:
-                yield find(self._db, *params)
+            if self._ctxs == 1:
+                data = self.players.load()
             else:
-                yield self._db
+                data = self.players.data
+                if self.players.stale or self._writers:
+                    # An enclosing Context has changed, or may be changing,
+                    #   Entries; Make sure the indexes reflect that before
+                    #   searching them.
+                    self.players.reindex()
+
+            view = list(self.players.find(*params)) if params else data
+            if not readonly:
+                before = json.dumps(view)
+                if not params:
+                    self._writers += 1
+            yield view
 
         finally:
+            if before is not None:
+                if not params:
+                    self._writers -= 1
+                if json.dumps(view) != before:
+                    self.players.dirty = True
+                    self.players.stale = True
             self._ctxs -= 1
-            self.interface.db_write(self._db)
-
-            if self._ctxs < 1:
-                self._db = None
+            if self._ctxs == 0:
+                self.players.save()
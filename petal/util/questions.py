@@ -5,6 +5,7 @@ from typing import Optional
 
 import discord
 
+from petal.checks import all_checks, Messages
 from petal.menu import Menu
 from petal.types import PetalClientABC
 
@@ -29,10 +30,7 @@ class ChatReply(Question):
         try:
             reply: discord.Message = await client.wait_for(
                 "message",
-                check=(
-                    lambda msg: msg.author.id == user.id
-                    and msg.channel.id == channel.id
-                ),
+                check=all_checks(Messages.by_user(user), Messages.in_channel(channel)),
                 timeout=self.timeout,
             )
         except TimeoutError:
@@ -0,0 +1,116 @@
+"""Matching of event announcements to game subscriptions.
+
+Every subscription is indexed by its code and by the significant words of its
+    name, so that matching a post only looks up each of its words once, rather
+    than comparing the post against every subscription in turn.
+"""
+
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, NamedTuple, Set, Tuple
+
+# Words too common in names to say anything about which game is meant.
+STOP_WORDS = frozenset(
+    ("a", "an", "and", "by", "for", "from", "of", "on", "or", "the", "to", "with")
+)
+
+TAG = re.compile(r"\[([^\[\]\s]+)\]")
+WORD = re.compile(r"[\w'+#]+")
+# Codes may contain punctuation, so they are matched against whole words of the
+#   post, with only the punctuation around them removed.
+TRIM = "\"'()*,.:;!?`"
+
+# How strongly each sort of match suggests a subscription.
+BY_TAG = 3
+BY_CODE = 2
+BY_NAME = 1
+
+
+def tokens(text: str) -> List[str]:
+    return WORD.findall(text.lower())
+
+
+class Candidate(NamedTuple):
+    """A subscription which may be meant by a post, with why it matched. The
+        fraction is how much of the name appeared in the post.
+    """
+
+    rank: int
+    fraction: float
+    code: str
+    name: str
+
+
+class SubscriptionIndex(object):
+    def __init__(self, subs: Iterable[dict] = ()):
+        self.names: Dict[str, str] = {}
+        self.codes: Dict[str, str] = {}
+        self.words: Dict[str, List[str]] = {}
+        self.sizes: Dict[str, int] = {}
+        # Collection order, used to break ties the way the old search did.
+        self.order: Dict[str, int] = {}
+        self.loaded: bool = False
+        self.rebuild(subs)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def rebuild(self, subs: Iterable[dict]):
+        """Replace the index with one built from subscription documents. The
+            new index is swapped in whole, so a search never sees half of it.
+        """
+        names: Dict[str, str] = {}
+        codes: Dict[str, str] = {}
+        words: Dict[str, List[str]] = defaultdict(list)
+        sizes: Dict[str, int] = {}
+        order: Dict[str, int] = {}
+
+        for i, sub in enumerate(subs):
+            code, name = str(sub["code"]), str(sub.get("name", sub["code"]))
+            names[code] = name
+            codes.setdefault(code.lower(), code)
+            order[code] = i
+
+            significant: Set[str] = {w for w in tokens(name) if w not in STOP_WORDS}
+            sizes[code] = len(significant)
+            for word in significant:
+                words[word].append(code)
+
+        self.names, self.codes, self.words = names, codes, dict(words)
+        self.sizes, self.order = sizes, order
+        self.loaded = True
+
+    def search(self, post: str) -> List[Candidate]:
+        """Find every subscription which a post may refer to, best first.
+
+        An explicit `[code]` tag ranks highest, then a code on its own as a
+            word, then words from the name, by how much of it appears.
+        """
+        best: Dict[str, Tuple[int, float]] = {}
+
+        for tag in TAG.findall(post):
+            code = self.codes.get(tag.lower())
+            if code is not None:
+                best[code] = (BY_TAG, 1)
+
+        for word in post.lower().split():
+            code = self.codes.get(word.strip(TRIM))
+            if code is not None and code not in best:
+                best[code] = (BY_CODE, 1)
+
+        hits: Dict[str, int] = defaultdict(int)
+        for word in set(tokens(post)):
+            for code in self.words.get(word, ()):
+                hits[code] += 1
+
+        for code, n in hits.items():
+            if code not in best:
+                best[code] = (BY_NAME, n / self.sizes[code])
+
+        return sorted(
+            (
+                Candidate(rank, fraction, code, self.names[code])
+                for code, (rank, fraction) in best.items()
+            ),
+            key=lambda c: (-c.rank, -c.fraction, self.order[c.code]),
+        )
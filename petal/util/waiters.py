@@ -0,0 +1,128 @@
+"""Indexed waiting for Messages and Reactions.
+
+`discord.Client.wait_for` tries the Predicate of every pending wait against
+    every event of its type, so each Message costs one call per Menu and
+    prompt waiting anywhere. A WaiterRegistry instead files each wait under
+    the Channel, User and Message IDs its Check declares (see `checks.Check`),
+    and an event only tries the waits filed under its own IDs, or under none.
+"""
+
+import asyncio
+from itertools import product
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from ..checks import KEYS
+
+
+def _message_ids(m) -> Tuple[Optional[int], ...]:
+    return m.channel.id, m.author.id, None
+
+
+def _reaction_ids(r, u) -> Tuple[Optional[int], ...]:
+    return r.message.channel.id, u.id, r.message.id
+
+
+# For each event which can be indexed, how to find its Channel, User and
+#   Message IDs, and which of those it has.
+EVENTS = {
+    "message": (_message_ids, ("channel", "user")),
+    "reaction_add": (_reaction_ids, KEYS),
+    "reaction_remove": (_reaction_ids, KEYS),
+}
+
+Slot = Tuple[str, Optional[int], Optional[int], Optional[int]]
+
+
+class Waiter(object):
+    __slots__ = ("future", "check", "slots")
+
+    def __init__(self, future: asyncio.Future, check: Callable[..., bool]):
+        self.future: asyncio.Future = future
+        self.check: Callable[..., bool] = check
+        self.slots: List[Slot] = []
+
+
+class WaiterRegistry(object):
+    def __init__(self):
+        self.slots: Dict[Slot, Dict[Waiter, None]] = {}
+        self.pending: Dict[str, int] = dict.fromkeys(EVENTS, 0)
+        self.tried: int = 0
+
+    def __len__(self) -> int:
+        return sum(self.pending.values())
+
+    @staticmethod
+    def handles(event: str) -> bool:
+        return event in EVENTS
+
+    def _file(self, event: str, waiter: Waiter):
+        key = getattr(waiter.check, "key", {})
+        indexed = EVENTS[event][1]
+        # A wait is filed once for every combination of the IDs it accepts. An
+        #   ID which the event does not have cannot narrow it down, so it is
+        #   left to the Check itself.
+        choices: List[Iterable[Optional[int]]] = [
+            key[name] if name in key and name in indexed else (None,) for name in KEYS
+        ]
+        for ids in product(*choices):
+            slot: Slot = (event, *ids)
+            self.slots.setdefault(slot, {})[waiter] = None
+            waiter.slots.append(slot)
+        self.pending[event] += 1
+
+    def _unfile(self, event: str, waiter: Waiter):
+        for slot in waiter.slots:
+            filed = self.slots.get(slot)
+            if filed is not None:
+                filed.pop(waiter, None)
+                if not filed:
+                    del self.slots[slot]
+        waiter.slots.clear()
+        self.pending[event] -= 1
+
+    async def wait_for(
+        self, event: str, check: Callable[..., bool] = None, timeout: float = None
+    ) -> Any:
+        """Wait for an event which passes a Check, as `Client.wait_for` would.
+            Raise `asyncio.TimeoutError` if none arrives in time.
+        """
+        waiter = Waiter(
+            asyncio.get_event_loop().create_future(), check or (lambda *_: True)
+        )
+        self._file(event, waiter)
+        try:
+            return await asyncio.wait_for(waiter.future, timeout)
+        finally:
+            self._unfile(event, waiter)
+
+    def dispatch(self, event: str, args: tuple):
+        """Resolve every wait on this event whose Check passes."""
+        if not self.pending.get(event):
+            return
+
+        find, indexed = EVENTS[event]
+        try:
+            ids = find(*args)
+        except AttributeError:
+            # Without its IDs, it can only be matched by unindexed waits.
+            ids = (None, None, None)
+        choices = [
+            (ids[i], None) if name in indexed else (None,)
+            for i, name in enumerate(KEYS)
+        ]
+
+        found: Dict[Waiter, None] = {}
+        for ids in product(*choices):
+            found.update(self.slots.get((event, *ids), {}))
+
+        for waiter in found:
+            if waiter.future.done():
+                continue
+            self.tried += 1
+            try:
+                passed = waiter.check(*args)
+            except Exception as e:
+                waiter.future.set_exception(e)
+            else:
+                if passed:
+                    waiter.future.set_result(args[0] if len(args) == 1 else args)
@@ -0,0 +1,164 @@
+"""Word filter matching.
+
+Every filtered word is compiled into one Aho-Corasick automaton, so that a
+    message is scanned once, in time linear in its length, no matter how many
+    words are filtered. Both the words and the messages are normalized first,
+    so that case, accents and simple character substitutions do not evade it.
+"""
+
+import unicodedata
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+# Substitutions which only ever stand in for letters. Punctuation is left out,
+#   as it usually ends a word rather than being part of one.
+LEET = str.maketrans(
+    {
+        "0": "o",
+        "1": "i",
+        "3": "e",
+        "4": "a",
+        "5": "s",
+        "7": "t",
+        "8": "b",
+        "@": "a",
+        "$": "s",
+    }
+)
+
+
+class Hit(NamedTuple):
+    """One match. The start and end are offsets into the original text."""
+
+    word: str
+    start: int
+    end: int
+
+
+class WordFilter(object):
+    def __init__(
+        self,
+        words: Iterable[str],
+        *,
+        leet: bool = True,
+        unicode: bool = True,
+        whole_words: bool = True,
+    ):
+        self.leet: bool = leet
+        self.unicode: bool = unicode
+        self.whole_words: bool = whole_words
+
+        # The automaton: Transitions, failure links, and the words (with their
+        #   normalized lengths) recognized on reaching each state.
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[Tuple[str, int], ...]] = [()]
+
+        self.words: List[str] = list(dict.fromkeys(str(w) for w in words if w))
+        for word in self.words:
+            self._add(word)
+        self._link()
+
+    @classmethod
+    def from_config(cls, config) -> "WordFilter":
+        opts = config.doc.get("wordFilterOptions") or {}
+        return cls(
+            config.doc.get("wordFilter") or [],
+            leet=opts.get("leet", True),
+            unicode=opts.get("unicode", True),
+            whole_words=opts.get("wholeWords", True),
+        )
+
+    def __bool__(self) -> bool:
+        return bool(self.words)
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def normalize(self, text: str) -> Tuple[str, Optional[List[int]]]:
+        """Fold the case of text, and optionally strip its accents and undo
+            substitutions. Return the normalized text and, if its length has
+            changed, a List mapping each of its characters to an offset into
+            the original text.
+        """
+        if text.isascii() or not self.unicode:
+            norm = text.casefold()
+            if len(norm) != len(text):
+                return self._normalize_slow(text)
+            return (norm.translate(LEET) if self.leet else norm), None
+        return self._normalize_slow(text)
+
+    def _normalize_slow(self, text: str) -> Tuple[str, List[int]]:
+        chars: List[str] = []
+        offsets: List[int] = []
+
+        for i, c in enumerate(text):
+            if self.unicode:
+                c = "".join(
+                    d
+                    for d in unicodedata.normalize("NFKD", c)
+                    if not unicodedata.combining(d)
+                )
+            for d in c.casefold():
+                chars.append(d)
+                offsets.append(i)
+
+        norm = "".join(chars)
+        return (norm.translate(LEET) if self.leet else norm), offsets
+
+    def _add(self, word: str):
+        norm, _ = self.normalize(word)
+        state = 0
+        for c in norm:
+            nxt = self._goto[state].get(c)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][c] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            state = nxt
+        self._out[state] += ((word, len(norm)),)
+
+    def _link(self):
+        # Breadth-first, so that every failure link points to a state which
+        #   has already been linked.
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for c, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and c not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(c, 0)
+                self._out[nxt] += self._out[self._fail[nxt]]
+
+    def scan(self, text: str) -> List[Hit]:
+        """Find every filtered word in text."""
+        if not self.words:
+            return []
+
+        norm, offsets = self.normalize(text)
+        goto, fail, out = self._goto, self._fail, self._out
+        last = len(norm) - 1
+        hits: List[Hit] = []
+
+        state = 0
+        for i, c in enumerate(norm):
+            while state and c not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(c, 0)
+
+            for word, length in out[state]:
+                start = i - length + 1
+                if self.whole_words and (
+                    (start > 0 and norm[start - 1].isalnum())
+                    or (i < last and norm[i + 1].isalnum())
+                ):
+                    continue
+
+                if offsets is None:
+                    hits.append(Hit(word, start, i + 1))
+                else:
+                    hits.append(Hit(word, offsets[start], offsets[i] + 1))
+
+        return hits
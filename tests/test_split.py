@@ -0,0 +1,70 @@
+"""Differential tests of `etc.split` against the `shlex` version it replaced."""
+
+import random
+import shlex
+
+import pytest
+
+from petal.etc import split
+
+
+def shlex_split(line):
+    """The `split()` of before, built on `shlex.shlex`."""
+    tokens = shlex.shlex(line, posix=False)
+    tokens.quotes += "`"
+    tokens.whitespace_split = True
+    tokens.whitespace += ","
+    tokens.commenters = ";"
+
+    original = shlex.shlex(line, posix=False)
+    original.quotes += "`"
+    original.whitespace_split = True
+    original.whitespace = ""
+    original.commenters = ";"
+
+    return list(tokens), original.read_token()
+
+
+def outcome(func, line):
+    try:
+        return func(line)
+    except ValueError as e:
+        return ValueError, str(e)
+
+
+# Weighted toward the characters that the tokenizer treats specially.
+ALPHABET = "abc1-_!@é " + " \t\r\n,;" * 2 + "'\"`" * 2
+
+
+def fuzzed(seed: int, count: int, length: int):
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield "".join(rng.choice(ALPHABET) for _ in range(rng.randrange(length)))
+
+
+@pytest.mark.parametrize(
+    "line",
+    [
+        "",
+        "help",
+        "help -s commands; @person, this is where to see the list",
+        "say 'one two' \"three, four\" `five;six`",
+        "a,b,,c",
+        "; only a comment",
+        ";first\nsecond line",
+        "'quoted' start",
+        "word'with'quotes",
+        "semi;colon\nnext",
+        "unclosed 'quote",
+        "'",
+        "\n\t ,",
+    ],
+)
+def test_known_lines(line):
+    assert outcome(split, line) == outcome(shlex_split, line)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_fuzzed_lines(seed):
+    for line in fuzzed(seed, 500, 40):
+        assert outcome(split, line) == outcome(shlex_split, line), repr(line)